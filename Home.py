@@ -1,3 +1,4 @@
+import uuid
 from typing import List, Dict
 
 import pandas as pd  # Bibliothek zur Datenanalyse (z. B. für das Arbeiten mit DataFrames)
@@ -7,19 +8,35 @@ from langchain_ollama import OllamaLLM
 
 # Import von benutzerdefinierten Funktionen
 from backend.dbpedia_handler import *  # Funktionen für DBpedia-Abfragen (z. B. Symptome/Krankheiten)
+from backend import config
+from backend.llm_cache import CachedLLM, llm_cache  # Persistenter Cache für LLM-Antworten
+from backend.llm_scheduler import ScheduledLLM, QUESTION, ASSESSMENT, SPECULATIVE, DeadlineExceeded, llm_scheduler  # Gemeinsame Warteschlange für Ollama
 from backend.medline_handler import get_article  # Funktion zum Abrufen eines Medline-Artikels.
 from backend.Entropy import *  # Funktionen zur Berechnung der Entropie von Symptomen
-from backend.wikipedia_handler import get_symptom_text
+from backend.retrieval import SectionRetriever, build_query  # Auswahl relevanter Abschnitte für die LLM-Prompts
+from backend.pipeline import build_diagnosis_pipeline  # Memoisierte Stufen des Diagnoseablaufs
+from backend.symptom_catalog import get_catalog  # Gemeinsamer Symptomkatalog mit Integer-IDs
+from backend.symptom_search import get_search_index  # Fehlertolerante Suche über die Symptom-Labels
+from backend.query_cache import query_cache  # Statistik des SPARQL-Caches für das Diagnose-Panel
+from backend.tracing import tracer  # Latenzen, Payload-Größen und Wiederholungen der einzelnen Stufen
+from backend.speculation import Generation, speculate, take, cancel_all  # Spekulative Vorgenerierung der LLM-Fragen
 
 # Zugriff auf den Session-Status, um Daten während der Interaktion zu speichern.
 s_state = st.session_state
 
+# Prozessweiter Symptomkatalog (Label <-> URI <-> ID); im Session-Status werden nur IDs gespeichert.
+catalog = get_catalog()
+
 # Setzt den Titel der Streamlit-Anwendung.
 st.image("img/logo.png", width=150)
 
 col1, col2 = st.columns(2)
 
 if col1.button("New Query"):
+    # Laufende Hintergrund-Generierungen abbrechen, bevor der Zustand gelöscht wird.
+    cancel_all(st.session_state.get("speculations", {}))
+    if "question_generation" in st.session_state:
+        st.session_state.question_generation.cancel()
     for key in st.session_state.keys():
         del st.session_state[key]
     s_state.status = "User Input"
@@ -31,26 +48,31 @@ col2.checkbox("LLM Active", key="llm_active")
 if "status" not in s_state:
     s_state.status = "User Input"  # Startzustand: Benutzer gibt Symptome ein.
 
+# Ohne Katalog (z. B. DBpedia nicht erreichbar) kann nichts gesucht werden. Ein leerer Katalog wird nicht
+# gespeichert, der nächste Lauf versucht es erneut; auch die Pipeline darf nicht auf ihm aufbauen.
+if len(catalog) == 0:
+    st.error("The symptom catalog could not be loaded. Please try again later.")
+    st.stop()
+
+# Pipeline der Diagnoseschritte; jede Stufe wird nur neu berechnet, wenn sich ihre Eingaben ändern.
+if "pipeline" not in s_state:
+    s_state.pipeline = build_diagnosis_pipeline(catalog)
+pipeline = s_state.pipeline
+pipeline.begin_run()
+
 # Zustand "User Input" (Symptomeingabe durch den Nutzer).
 if s_state.status == "User Input":
     # Initialisierung der Liste für Symptome, falls diese noch nicht existiert.
     if "symptom_list" not in s_state:
         s_state.symptom_list = []
-
-    # Initialisierung des Wörterbuchs mit Symptomen, falls noch nicht vorhanden.
-    if "symptom_dict" not in s_state:
-        s_state.symptom_dict = get_all_symptoms()
-
-    # Abrufen aller möglichen Symptome, die noch nicht hinzugefügt wurden.
-    s_state.symptom_dict_pos = get_all_possible_symptoms(
-        [s_state.symptom_dict[symptom] for symptom in s_state.symptom_list])
+    pipeline.set_inputs(symptom_list=s_state.symptom_list)
 
     # Trennlinie in der Benutzeroberfläche
     st.divider()
     st.subheader("Symptom Input")  # Unterüberschrift für die Symptomeingabe.
 
     # Anzeige der Symptome mit Möglichkeit, sie zu löschen.
-    for i, symptom in enumerate(s_state.symptom_list):
+    for i, symptom in enumerate(catalog.labels(s_state.symptom_list)):
         with st.container(border=True):  # Umrahmt jedes Symptom.
             col1, col2 = st.columns(2)  # Zwei Spalten für das Symptom und den Löschbutton.
             col1.write(symptom)  # Zeigt das Symptom an.
@@ -58,24 +80,29 @@ if s_state.status == "User Input":
                 del s_state.symptom_list[i]
                 st.rerun()  # Aktualisiert die App, um die Änderung anzuzeigen.
 
-    # Dropdown-Menü zur Auswahl eines neuen Symptoms aus der verfügbaren Liste.
-    selected_symptom = st.selectbox(
-        "Symptom",
-        sorted(set(s_state.symptom_dict_pos.keys()).difference(set(s_state.symptom_list)))
-    )
+    # Suche über die möglichen Symptome mit dem serverseitigen Index; an den Browser wird nur die kurze
+    # Trefferliste geschickt.
+    search_query = st.text_input("Search Symptom")
+    matches = get_search_index().search(search_query, allowed=pipeline.get("possible symptom ids"),
+                                        exclude=s_state.symptom_list)
+
+    # Dropdown-Menü zur Auswahl eines neuen Symptoms aus den Treffern.
+    selected_symptom = st.selectbox("Symptom", catalog.labels(matches))
 
     # Hinzufügen des ausgewählten Symptoms zur Liste.
-    if st.button("Add Symptom"):
-        s_state.symptom_list.append(selected_symptom)
-        st.rerun()
+    if st.button("Add Symptom") and selected_symptom is not None:
+        if selected_symptom in catalog:
+            s_state.symptom_list.append(catalog.id_of_label(selected_symptom))
+            st.rerun()
+        else:
+            st.warning(f"Unknown symptom: {selected_symptom}")
 
     # Wenn Symptome vorhanden sind, abrufen möglicher Krankheiten basierend auf den Symptomen.
     if len(s_state.symptom_list) > 0:
-        s_state.possible_diseases = get_diseases_by_symptoms(
-            [s_state.symptom_dict[x] for x in s_state.symptom_list]
-        )
+        s_state.possible_diseases = pipeline.get("candidates")
         print(f"Diseases found: {len(s_state.possible_diseases)}")
         if st.button("Finish Input"):  # Wechselt zum nächsten Schritt nach der Symptomeingabe.
+            s_state.entered_symptoms = list(s_state.symptom_list)
             s_state.status = "Symptom Questions"  # Übergang zum Zustand der Symptomfragen.
             st.rerun()
 
@@ -89,52 +116,37 @@ if s_state.status == "Symptom Questions":
         s_state.no_symptom_list = []
 
     # Anzeige der bekannten und ausgeschlossenen Symptome.
-    st.write(f"Already known symptoms: {', '.join(s_state.symptom_list)}")
-    st.write(f"Already excluded symptoms: {', '.join(s_state.no_symptom_list)}")
+    st.write(f"Already known symptoms: {', '.join(catalog.labels(s_state.symptom_list))}")
+    st.write(f"Already excluded symptoms: {', '.join(catalog.labels(s_state.no_symptom_list))}")
 
-    # Berechnung der Entropie für alle Symptome der gefundenen Krankheiten.
-    disease_list = get_diseases_for_symptoms([s_state.symptom_dict[x] for x in s_state.symptom_list])
-    disease_symptom_pairs = get_disease_symptom_pairs(disease_list)
-    entropy_values = calculate_entropy_for_all_symptoms(disease_symptom_pairs)
+    # Die Entropie wird nur beim ersten Aufruf berechnet und danach mit jeder Antwort inkrementell aktualisiert
+    # (Stufe "entropy" der Pipeline, arbeitet auf den Symptom-IDs des Katalogs).
+    pipeline.set_inputs(entered_symptoms=s_state.entered_symptoms, symptom_list=s_state.symptom_list,
+                        no_symptom_list=s_state.no_symptom_list)
 
-    # Entfernt Symptome, die bereits in den Listen vorhanden sind.
-    filtered_entropy_values = {
-        key: value
-        for key, value in entropy_values.items()
-        if key not in [s_state.symptom_dict[symptom] for symptom in s_state.no_symptom_list]
-    }
-
-    # Sortiert die verbleibenden Einträge nach Entropiewerten in absteigender Reihenfolge.
-    sorted_filtered_entropy_values = sorted(filtered_entropy_values.items(), key=lambda x: x[1], reverse=True)
-
-    print(sorted_filtered_entropy_values)
-
-    # Entfernen und Überprüfen der Symptome für die Krankheiten.
-    count_distinct_diseases = remove_and_check_symptoms(disease_symptom_pairs,
-                                                        [s_state.symptom_dict[symptom] for symptom in
-                                                         s_state.no_symptom_list])
+    # Symptom mit der höchsten Entropie, das noch nicht ausgeschlossen wurde,
+    # und Anzahl der unterscheidbaren Krankheiten ohne die ausgeschlossenen Symptome.
+    next_symptom_id, count_distinct_diseases = pipeline.get("next question")
 
     # Überprüfung, ob es noch Symptome gibt, die abgefragt werden müssen.
-    if count_distinct_diseases > 1 and (count_distinct_diseases > 5 or len(s_state.no_symptom_list) < 5):
-        symptom_with_highest_entropy = sorted_filtered_entropy_values[0]
-        symptom = next(key for key, value in s_state.symptom_dict.items() if value == symptom_with_highest_entropy[0])
+    if next_symptom_id is not None and count_distinct_diseases > 1 and (
+            count_distinct_diseases > 5 or len(s_state.no_symptom_list) < 5):
+        symptom = catalog.label(next_symptom_id)
 
         with st.container(border=True):
             st.write(f"Do you have: {symptom}?")  # Fragt den Nutzer nach dem Symptom.
 
             # Wenn "Ja", fügt das Symptom der Liste hinzu.
             if st.button("Yes"):
-                s_state.symptom_list.append(symptom)
+                s_state.symptom_list.append(next_symptom_id)
                 st.rerun()
 
             # Wenn "Nein", schließt das Symptom aus.
             if st.button("No"):
-                s_state.no_symptom_list.append(symptom)
+                s_state.no_symptom_list.append(next_symptom_id)
                 st.rerun()
     else:  # Wenn keine weiteren Fragen übrig sind, wechselt zum Plausibilitäts-Check.
-        s_state.possible_diseases = get_diseases_by_symptoms(
-            [s_state.symptom_dict[x] for x in s_state.symptom_list]
-        )
+        s_state.possible_diseases = pipeline.get("candidates")
         print("Starting Plausibility Check for diseases:", s_state.possible_diseases)
         s_state.status = "Plausibility Check"
         st.rerun()
@@ -144,8 +156,10 @@ if s_state.status == "Plausibility Check":
     st.divider()
     st.subheader("Plausibility Check")
 
+    pipeline.set_inputs(symptom_list=s_state.symptom_list)
+
     if "disease_decision" not in s_state:
-        s_state.disease_list = get_diseases_for_symptoms([s_state.symptom_dict[x] for x in s_state.symptom_list])
+        s_state.disease_list = pipeline.get("disease list")
         print('Checking for ', s_state.disease_list)
         s_state.disease_decision = dict()
 
@@ -156,26 +170,50 @@ if s_state.status == "Plausibility Check":
 
     # Abrufen des Wikipedia Signs and Symptoms Kapitels.
 
-    if "disease_symptom_texts" not in s_state or "wiki_page_ids" not in s_state:
-        s_state.wiki_page_ids = [get_wikiPageID_of_disease(x) for x in list(s_state.possible_diseases.values())]
-        s_state.disease_symptom_texts = [get_symptom_text(x) for x in s_state.wiki_page_ids]
+    # Alle Wiki-Page-IDs werden mit einer (gebündelten) Abfrage statt einer Abfrage pro Krankheit geladen.
+    s_state.wiki_page_ids = pipeline.get("wiki page ids")
+    # Die Wikipedia-Seiten werden parallel abgerufen; Fehler werden pro Seite zurückgegeben.
+    s_state.disease_symptom_texts = pipeline.get("symptom texts")
 
     if s_state.get("llm_active", False):
+        # Nur erfolgreich abgerufene Symptombeschreibungen als (Titel, Text) an das LLM übergeben.
+        disease_symptom_description = [(x.title, x.text) for x in s_state["disease_symptom_texts"] if x.error is None]
+
+        # BM25-Index über die Abschnitte; in die Prompts kommen nur die relevantesten Ausschnitte.
+        if "section_retriever" not in s_state:
+            s_state.section_retriever = SectionRetriever(disease_symptom_description)
+
+        def relevant_descriptions(chat_history):
+            return s_state.section_retriever.retrieve(
+                build_query(catalog.labels(s_state.symptom_list), catalog.labels(s_state.no_symptom_list), chat_history))
+
         def format_chat_history(history: List[Dict]) -> str:
             if not history:
                 return "No previous questions."
             return "\n".join([f"Q: {h['question']}\nA: {h['answer']}" for h in history])
 
+        def show_llm_error(e):
+            # Zeitüberschreitung in der LLM-Warteschlange oder Fehler des LLM-Servers: Hinweis statt Traceback.
+            print(f"\nError during LLM request: {str(e)}")
+            if isinstance(e, DeadlineExceeded):
+                st.warning("The language model is busy right now. Please try again.")
+            else:
+                st.warning("The language model could not be reached. Please try again.")
+            if st.button("Retry"):
+                st.rerun()
 
         if "llm" not in s_state:
-            s_state.llm = OllamaLLM(model="gemma2:27b")
+            # Antworten auf identische Prompts werden aus dem persistenten Cache wiedergegeben.
+            # Alle Sitzungen teilen sich einen Scheduler vor dem Ollama-Server (Priorität und faire Verteilung).
+            ollama = OllamaLLM(model="gemma2:27b")
+            session_id = uuid.uuid4().hex
+            s_state.llm = CachedLLM(ScheduledLLM(ollama, session_id, QUESTION))
+            s_state.speculative_llm = CachedLLM(ScheduledLLM(ollama, session_id, SPECULATIVE))
+            s_state.assessment_llm = CachedLLM(ScheduledLLM(ollama, session_id, ASSESSMENT))
 
         if "chat_history" not in s_state:
             s_state.chat_history = []
 
-        if "awaiting_answer" not in s_state:
-            s_state.awaiting_answer = False
-
         if "question" not in s_state:
             s_state.question = ""
 
@@ -207,48 +245,65 @@ if s_state.status == "Plausibility Check":
         with st.expander("Chat History"):
             st.write(s_state.chat_history)
 
+        def format_question_prompt(chat_history):
+            return question_prompt_template.format(
+                disease_symptom_description=relevant_descriptions(chat_history),
+                known_symptoms=", ".join(catalog.labels(s_state.symptom_list)),
+                excluded_symptoms=", ".join(catalog.labels(s_state.no_symptom_list)),
+                chat_history=format_chat_history(chat_history)
+            )
+
         if len(s_state.chat_history) < 5:  # Added maximum questions limit
             try:
-                if not s_state.awaiting_answer:
+                # Die aktuelle Frage wird nur generiert, wenn sie nicht schon spekulativ vorbereitet wurde.
+                if "question_generation" not in s_state or s_state.question_generation.error is not None:
                     print("Invoke LLM")
-                    s_state.question = s_state["llm"].invoke(question_prompt_template.format(
-                        disease_symptom_description=s_state["disease_symptom_texts"],
-                        known_symptoms=", ".join(s_state.symptom_list),
-                        excluded_symptoms=", ".join(s_state.no_symptom_list),
-                        chat_history=format_chat_history(s_state["chat_history"])
-                    ))
-
-                    s_state.awaiting_answer = True
+                    s_state.question_generation = Generation(s_state["llm"], format_question_prompt(s_state["chat_history"]))
 
                 with st.container(border=True):
-                    st.write(s_state["question"])
+                    # Bereits generierte Tokens erscheinen sofort, der Rest wird live gestreamt.
+                    if s_state.question_generation.done and s_state.question_generation.error is None:
+                        s_state.question = s_state.question_generation.result()
+                        st.write(s_state.question)
+                    else:
+                        s_state.question = st.write_stream(s_state.question_generation.stream())
+
+                    # Während der Nutzer liest, wird die nächste Frage für jede mögliche Antwort vorbereitet.
+                    if "speculations" not in s_state and len(s_state.chat_history) + 1 < 5:
+                        s_state.speculations = speculate(s_state["speculative_llm"], {
+                            answer: format_question_prompt(
+                                s_state["chat_history"] + [{"question": s_state["question"], "answer": answer}])
+                            for answer in ("yes", "no", "I don't know")
+                        })
+
                     col1, col2, col3 = st.columns(3)
+                    answer = None
                     if col1.button("Yes"):
-                        s_state["chat_history"].append({
-                            "question": s_state["question"],
-                            "answer": "yes"
-                        })
-                        s_state.awaiting_answer = False
-                        st.rerun()
+                        answer = "yes"
                     if col2.button("No"):
-                        s_state["chat_history"].append({
-                            "question": s_state["question"],
-                            "answer": "no"
-                        })
-                        s_state.awaiting_answer = False
-                        st.rerun()
+                        answer = "no"
                     if col3.button("I don't know"):
+                        answer = "I don't know"
+
+                    if answer is not None:
                         s_state["chat_history"].append({
                             "question": s_state["question"],
-                            "answer": "I don't know"
+                            "answer": answer
                         })
-                        s_state.awaiting_answer = False
+                        # Die vorbereitete Frage zur gewählten Antwort übernehmen (jetzt mit der Priorität
+                        # einer interaktiven Frage), die anderen abbrechen und aus der Warteschlange nehmen.
+                        del s_state["question_generation"]
+                        if "speculations" in s_state:
+                            chosen = take(s_state.pop("speculations"), answer, QUESTION)
+                            if chosen is not None:
+                                s_state.question_generation = chosen
                         st.rerun()
 
-
-
             except IndexError as e:
                 print(f"\nError during diagnosis: {str(e)}")
+            except Exception as e:
+                # Die fehlgeschlagene Frage wird beim nächsten Durchlauf neu generiert.
+                show_llm_error(e)
 
         else:
             # Modern prompt template using ChatPromptTemplate
@@ -276,12 +331,15 @@ if s_state.status == "Plausibility Check":
                 template=assessment_template
             )
 
-            st.write_stream(s_state["llm"].stream(assessment_prompt_template.format(
-                disease_symptom_description=s_state["disease_symptom_texts"],
-                known_symptoms=", ".join(s_state.symptom_list),
-                excluded_symptoms=", ".join(s_state.no_symptom_list),
-                chat_history=format_chat_history(s_state["chat_history"])
-            )))
+            try:
+                st.write_stream(s_state["assessment_llm"].stream(assessment_prompt_template.format(
+                    disease_symptom_description=relevant_descriptions(s_state["chat_history"]),
+                    known_symptoms=", ".join(catalog.labels(s_state.symptom_list)),
+                    excluded_symptoms=", ".join(catalog.labels(s_state.no_symptom_list)),
+                    chat_history=format_chat_history(s_state["chat_history"])
+                )))
+            except Exception as e:
+                show_llm_error(e)
     else:
         with st.container(border=True):
             st.write("Does the following list of symptoms match your condition?")
@@ -300,9 +358,9 @@ if s_state.status == "Plausibility Check":
                     s_state.current_index += 1
                 st.rerun()
 
-        if "An error occurred" not in s_state["disease_symptom_texts"][s_state.current_index][1]:  # Wenn eine Medline-ID gefunden wurde, Artikel und Symptome anzeigen.
+        if s_state["disease_symptom_texts"][s_state.current_index].error is None:  # Wenn ein Symptom-Kapitel gefunden wurde, dieses anzeigen.
             st.write(f"Possible Disease: {list(s_state.possible_diseases.keys())[s_state.current_index]}")
-            st.markdown(s_state["disease_symptom_texts"][s_state.current_index][1])  # Anzeige der Symptome im Artikel.
+            st.markdown(s_state["disease_symptom_texts"][s_state.current_index].text)  # Anzeige der Symptome im Artikel.
         else:
             # Wenn keine Medline-ID gefunden wird, wird die Krankheit ohne Medline-ID angezeigt.
             st.write(f"Possible Disease: {list(s_state.possible_diseases.keys())[s_state.current_index]}")
@@ -313,8 +371,30 @@ if s_state.status == "Display Results":
     st.subheader("Results")
 
     # Anzeige der ausgewählten Symptome.
-    st.write(f"Selected Symptoms: {', '.join(s_state.symptom_list)}")
+    st.write(f"Selected Symptoms: {', '.join(catalog.labels(s_state.symptom_list))}")
 
     # Anzeige der möglichen Krankheiten.
     st.write("Disease Symptom Answers:")
     st.write(s_state.disease_decision)
+
+# Optionales Diagnose-Panel (HEALTHCARE_DEBUG_PANEL=1): Latenzen der Stufen, Caches und Warteschlange.
+if config.DEBUG_PANEL:
+    with st.expander("Diagnostics"):
+        stage_stats = tracer.get_stats()
+        if stage_stats:
+            st.dataframe(pd.DataFrame([
+                {"stage": name, "calls": x["count"], "errors": x["errors"],
+                 "avg ms": x["avg"] * 1000, "p50 ms": x["p50"] * 1000, "p95 ms": x["p95"] * 1000,
+                 "max ms": x["max"] * 1000, "payload KiB": x["payload"] / 1024, "retries": x["retries"]}
+                for name, x in stage_stats.items()
+            ]))
+        st.write("Recent spans:")
+        st.dataframe(pd.DataFrame([
+            {"stage": x.stage, "ms": x.duration * 1000, "payload": x.payload, "retries": x.retries, "error": x.error}
+            for x in tracer.recent()[:50]
+        ]))
+        st.write("Pipeline (this run):", pipeline.report())
+        st.write("Query cache:", query_cache.get_stats())
+        st.write("LLM cache:", llm_cache.get_stats())
+        st.write("LLM scheduler:", llm_scheduler.get_stats())
+        st.code(tracer.prometheus_text(), language="text")
@@ -1,8 +1,10 @@
 import math
-import time
 
-from SPARQLWrapper import SPARQLWrapper, JSON
+from backend import local_handler
+from backend.dbpedia_handler import query_dbpedia
+from backend.tracing import traced
 
+@traced("entropy/diseases_for_symptoms")
 def get_diseases_for_symptoms(symptoms_list):
     """
     Finds diseases associated with the given symptoms via the DBpedia SPARQL endpoint.
@@ -13,8 +15,12 @@ def get_diseases_for_symptoms(symptoms_list):
     Returns:
     - list: A list of diseases in the "dbr:" format.
     """
-    # Set up the SPARQL endpoint
-    sparql = SPARQLWrapper("https://dbpedia.org/sparql")
+    # Answer from the offline snapshot if it is configured
+    if local_handler.is_active():
+        diseases = local_handler.get_diseases_for_symptoms(symptoms_list)
+        if not diseases:
+            print("No results found for the given symptoms")
+        return diseases
 
     # Create conditions for the symptoms in the SPARQL query
     symptom_conditions = "\n".join([f"?disease dbo:symptom+ <{symptom}> ." for symptom in symptoms_list])
@@ -27,18 +33,8 @@ def get_diseases_for_symptoms(symptoms_list):
     }}
     """
 
-    # Configure and execute the query
-    sparql.setQuery(query)
-    sparql.setReturnFormat(JSON)
-    results = None
-    for attempt in range(3):
-        try:
-            results = sparql.query().convert()["results"]["bindings"]
-            break
-        except Exception as e:
-            print(f"Attempt {attempt + 1} failed: {e}")
-            if attempt == 2:
-                raise
+    # Execute the query (retries are handled by the shared SPARQL client)
+    results = query_dbpedia(query, "diseases for symptoms")
 
     if not results:
         print("No results found for the given symptoms")
@@ -57,6 +53,7 @@ def get_diseases_for_symptoms(symptoms_list):
 
 
 
+@traced("entropy/disease_symptom_pairs")
 def get_disease_symptom_pairs(disease_list):
     """
     Finds symptoms associated with the given diseases.
@@ -67,8 +64,11 @@ def get_disease_symptom_pairs(disease_list):
     Returns:
     - dict: A dictionary that associates each disease (as a label) with its list of symptoms.
     """
-    # Set up the SPARQL endpoint
-    sparql = SPARQLWrapper("https://dbpedia.org/sparql")
+    # Answer from the offline snapshot if it is configured
+    if local_handler.is_active():
+        disease_symptom_pairs = local_handler.get_disease_symptom_pairs(disease_list)
+        print(f"Number of diseases found: {len(disease_symptom_pairs)}")
+        return disease_symptom_pairs
 
     # Create conditions for the diseases in the SPARQL query
     disease_conditions = " ".join([f"<{disease}>" for disease in disease_list])
@@ -84,20 +84,8 @@ def get_disease_symptom_pairs(disease_list):
     }}
     """
 
-    sparql.setQuery(query)
-    sparql.setReturnFormat(JSON)
-
-    results = None
-
-    for attempt in range(3):
-        try:
-            results = sparql.query().convert()["results"]["bindings"]
-        except Exception as e:
-            print(f"Attempt {attempt + 1} failed for entropy query: {e}")
-            time.sleep(1)  # Add a small delay between retry attempts
-
-    if results is None:
-        raise Exception("Failed to execute query after 3 attempts")
+    # Execute the query (retries are handled by the shared SPARQL client)
+    results = query_dbpedia(query, "entropy")
 
     # Extract diseases and symptoms into a dictionary
     disease_symptom_pairs = {}
@@ -115,6 +103,22 @@ def get_disease_symptom_pairs(disease_list):
     return disease_symptom_pairs
 
 
+def binary_entropy(count, total_diseases):
+    """
+    Calculates the entropy of a symptom that occurs in `count` of `total_diseases` diseases.
+    """
+    p_positive = count / total_diseases  # Probability that a disease has this symptom
+    p_negative = 1 - p_positive  # Probability that a disease does not have this symptom
+
+    if p_positive == 0 or p_negative == 0:
+        return 0  # No uncertainty if a symptom always/never occurs
+
+    return - (
+        p_positive * math.log2(p_positive) +
+        p_negative * math.log2(p_negative)
+    )
+
+
 def calculate_entropy_for_all_symptoms(disease_symptom_pairs):
     """
     Calculates the entropy for each symptom across all diseases.
@@ -136,16 +140,7 @@ def calculate_entropy_for_all_symptoms(disease_symptom_pairs):
     # Calculate the entropy for each symptom
     entropies = {}
     for symptom, count in symptom_counts.items():
-        p_positive = count / total_diseases  # Probability that a disease has this symptom
-        p_negative = 1 - p_positive  # Probability that a disease does not have this symptom
-
-        if p_positive == 0 or p_negative == 0:
-            entropies[symptom] = 0  # No uncertainty if a symptom always/never occurs
-        else:
-            entropies[symptom] = - (
-                p_positive * math.log2(p_positive) +
-                p_negative * math.log2(p_negative)
-            )
+        entropies[symptom] = binary_entropy(count, total_diseases)
 
     # Sort the entropy values alphabetically by symptom
     return {k: v for k, v in sorted(entropies.items())}
@@ -174,6 +169,116 @@ def remove_and_check_symptoms(disease_symptom_pairs, no_symptom_list):
     
     return distinct_count
 
+
+class EntropyTracker:
+    """
+    Incremental version of `calculate_entropy_for_all_symptoms` and `remove_and_check_symptoms`
+    for the question loop.
+
+    The tracker keeps the symptom counts over the live candidate set. Confirming a symptom
+    removes the diseases without it and only touches the counts of their symptoms; excluding
+    a symptom only touches the diseases that have it. The entropies and the distinct disease
+    count are the same as those of the two functions on the remaining diseases.
+
+    Args:
+    - disease_symptom_pairs (dict): A dictionary associating diseases with their symptoms.
+    - no_symptom_list (list): Symptoms that are already excluded.
+    """
+
+    def __init__(self, disease_symptom_pairs, no_symptom_list=()):
+        self.rows = {disease: list(symptoms) for disease, symptoms in disease_symptom_pairs.items()}
+        self.excluded = set(no_symptom_list)
+
+        self.symptom_counts = {}
+        self.diseases_by_symptom = defaultdict(set)  # Only contains live candidates
+        self.signatures = {}  # Sorted symptoms without the excluded ones, as in remove_and_check_symptoms
+        self.signature_counts = defaultdict(int)
+
+        for disease, symptoms in self.rows.items():
+            for symptom in symptoms:
+                self.symptom_counts[symptom] = self.symptom_counts.get(symptom, 0) + 1
+                self.diseases_by_symptom[symptom].add(disease)
+            signature = tuple(sorted(x for x in symptoms if x not in self.excluded))
+            self.signatures[disease] = signature
+            self.signature_counts[signature] += 1
+
+    @property
+    def candidates(self):
+        return self.signatures.keys()
+
+    def candidate_pairs(self):
+        """
+        Returns the disease-symptom pairs of the live candidates.
+        """
+        return {disease: self.rows[disease] for disease in self.signatures}
+
+    def _remove_disease(self, disease):
+        for symptom in self.rows[disease]:
+            self.symptom_counts[symptom] -= 1
+            if self.symptom_counts[symptom] == 0:
+                del self.symptom_counts[symptom]
+                del self.diseases_by_symptom[symptom]
+            else:
+                self.diseases_by_symptom[symptom].discard(disease)
+        self._drop_signature(self.signatures.pop(disease))
+
+    def _drop_signature(self, signature):
+        self.signature_counts[signature] -= 1
+        if self.signature_counts[signature] == 0:
+            del self.signature_counts[signature]
+
+    def confirm(self, symptom):
+        """
+        The patient has the symptom: keeps only the diseases that have it.
+        """
+        having = self.diseases_by_symptom.get(symptom, set())
+        for disease in [x for x in self.signatures if x not in having]:
+            self._remove_disease(disease)
+
+    def exclude(self, symptom):
+        """
+        The patient does not have the symptom: it is no longer asked and ignored when
+        counting distinct diseases.
+        """
+        if symptom in self.excluded:
+            return
+        self.excluded.add(symptom)
+        for disease in self.diseases_by_symptom.get(symptom, ()):
+            signature = self.signatures[disease]
+            self._drop_signature(signature)
+            signature = tuple(x for x in signature if x != symptom)
+            self.signatures[disease] = signature
+            self.signature_counts[signature] += 1
+
+    def entropies(self):
+        """
+        Returns the same result as `calculate_entropy_for_all_symptoms` on the live candidates.
+        """
+        total_diseases = len(self.signatures)
+        return {k: binary_entropy(v, total_diseases) for k, v in sorted(self.symptom_counts.items())}
+
+    def count_distinct_diseases(self):
+        """
+        Returns the same result as `remove_and_check_symptoms` on the live candidates.
+        """
+        return len(self.signature_counts)
+
+    def next_question(self):
+        """
+        Returns the not yet excluded symptom with the highest entropy (ties broken by symptom),
+        or None if there is no symptom left.
+        """
+        total_diseases = len(self.signatures)
+        best = None
+        best_entropy = None
+        for symptom, count in self.symptom_counts.items():
+            if symptom in self.excluded:
+                continue
+            entropy = binary_entropy(count, total_diseases)
+            if best is None or entropy > best_entropy or (entropy == best_entropy and symptom < best):
+                best, best_entropy = symptom, entropy
+        return best
+
 # Example usage
 if __name__ == "__main__":
     # List of symptoms of interest
@@ -1,3 +1,8 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
 from SPARQLWrapper import SPARQLWrapper, JSON
 
 def get_all_diseases_and_symptoms():
@@ -31,46 +36,131 @@ def get_all_diseases_and_symptoms():
     return disease_symptom_map
 
 def find_matching_diseases(disease_symptom_map):
-    matches = []
+    """
+    Finds all pairs of diseases with identical symptom sets.
+
+    Diseases are grouped by their symptom set in a single pass (O(n)), only diseases of
+    the same group are paired.
+
+    Args:
+    - disease_symptom_map (dict): Disease -> set of symptoms.
+
+    Returns:
+    - list: (disease1, disease2, symptoms1) tuples, disease1 coming before disease2 in the map.
+    """
     disease_list = list(disease_symptom_map.items())
 
-    for i, (disease1, symptoms1) in enumerate(disease_list):
-        for j, (disease2, symptoms2) in enumerate(disease_list):
-            if i < j and symptoms1 == symptoms2:
-                matches.append((disease1, disease2, symptoms1))
+    groups = defaultdict(list)
+    for i, (_, symptoms) in enumerate(disease_list):
+        groups[frozenset(symptoms)].append(i)
+
+    pairs = sorted((i, j) for group in groups.values() for a, i in enumerate(group) for j in group[a + 1:])
+    return [(disease_list[i][0], disease_list[j][0], disease_list[i][1]) for i, j in pairs]
+
+
+# Data shared with the worker processes of find_subset_relations
+_subset_data = None
+
+
+def _init_subset_worker(disease_list):
+    global _subset_data
+    _subset_data = _build_subset_index(disease_list)
+
+
+def _build_subset_index(disease_list):
+    sizes = [len(symptoms) for _, symptoms in disease_list]
+    postings = defaultdict(list)  # symptom -> ascending disease indices
+    for i, (_, symptoms) in enumerate(disease_list):
+        for symptom in symptoms:
+            postings[symptom].append(i)
+    counts = {symptom: len(diseases) for symptom, diseases in postings.items()}
+    return disease_list, sizes, counts, postings
 
-    return matches
 
-def find_subset_relations(disease_symptom_map):
+def _find_subsets_in_range(start, stop, data=None):
+    disease_list, sizes, counts, postings = data or _subset_data
+    negated_sizes = [-size for size in sizes]
+    by_size = {}  # symptom -> (posting list by descending size, negated sizes), built on first use
     subset_matches = []
-    disease_list = list(disease_symptom_map.items())
 
-    for i, (disease1, symptoms1) in enumerate(disease_list):
-        for j, (disease2, symptoms2) in enumerate(disease_list):
-            if i < j:
-                # Checks if symptoms1 is a proper subset of symptoms2
-                if symptoms1.issubset(symptoms2) and symptoms1 != symptoms2:
-                    subset_matches.append((disease1, disease2, symptoms1, symptoms2))
+    for i in range(start, stop):
+        disease1, symptoms1 = disease_list[i]
+        size1 = sizes[i]
+
+        if symptoms1:
+            # A proper superset comes later in the map, contains the rarest symptom of the
+            # subset and is strictly larger. The later diseases end the posting list in index
+            # order, the larger ones start it in size order; the shorter of the two is scanned.
+            rarest = min(symptoms1, key=counts.__getitem__)
+            by_index = postings[rarest]
+            view = by_size.get(rarest)
+            if view is None:
+                ordered = sorted(by_index, key=negated_sizes.__getitem__)
+                view = by_size[rarest] = (ordered, [negated_sizes[j] for j in ordered])
+            later = bisect_right(by_index, i)
+            larger = bisect_left(view[1], -size1)
+            if larger < len(by_index) - later:
+                candidates = sorted(j for j in islice(view[0], larger) if j > i)
+            else:
+                candidates = islice(by_index, later, None)
+        else:
+            candidates = range(i + 1, len(disease_list))
+
+        for j in candidates:
+            if sizes[j] > size1 and symptoms1.issubset(disease_list[j][1]):
+                subset_matches.append((disease1, disease_list[j][0], symptoms1, disease_list[j][1]))
 
     return subset_matches
 
-# Example usage
-all_diseases_symptoms = get_all_diseases_and_symptoms()
-matching_diseases = find_matching_diseases(all_diseases_symptoms)
 
-subset_relations = find_subset_relations(all_diseases_symptoms)
+def find_subset_relations(disease_symptom_map, processes=None, chunk_size=2000):
+    """
+    Finds all pairs where the symptoms of a disease are a proper subset of the symptoms
+    of a later disease in the map.
+
+    Candidates are taken from an inverted index (symptom -> diseases): a superset has to
+    contain the rarest symptom of the subset, come later in the map and be strictly larger.
+    Its posting list is kept in index order and in size order, and only the later or the
+    larger diseases are scanned, whichever are fewer.
+
+    Args:
+    - disease_symptom_map (dict): Disease -> set of symptoms.
+    - processes (int): If set, the diseases are sharded into chunks of `chunk_size` and
+      processed by a pool of that many worker processes.
+    - chunk_size (int): Number of diseases per shard.
+
+    Returns:
+    - list: (disease1, disease2, symptoms1, symptoms2) tuples in the order of the map.
+    """
+    disease_list = list(disease_symptom_map.items())
+
+    if not processes or processes <= 1 or len(disease_list) <= chunk_size:
+        return _find_subsets_in_range(0, len(disease_list), _build_subset_index(disease_list))
+
+    chunks = [(start, min(start + chunk_size, len(disease_list))) for start in range(0, len(disease_list), chunk_size)]
+    with ProcessPoolExecutor(processes, initializer=_init_subset_worker, initargs=(disease_list,)) as executor:
+        results = executor.map(_find_subsets_in_range, *zip(*chunks))
+        return [match for chunk in results for match in chunk]
+
+
+if __name__ == "__main__":
+    # Example usage
+    all_diseases_symptoms = get_all_diseases_and_symptoms()
+    matching_diseases = find_matching_diseases(all_diseases_symptoms)
+
+    subset_relations = find_subset_relations(all_diseases_symptoms)
 
-print("Diseases with identical symptoms:")
-for disease1, disease2, symptoms in matching_diseases:
-    # Display symptoms as a list
-    symptom_list = ", ".join(symptoms)
-    print(f"{disease1} and {disease2} have the symptoms: {symptom_list}")
+    print("Diseases with identical symptoms:")
+    for disease1, disease2, symptoms in matching_diseases:
+        # Display symptoms as a list
+        symptom_list = ", ".join(symptoms)
+        print(f"{disease1} and {disease2} have the symptoms: {symptom_list}")
 
-print(f"Number of matches found: {len(matching_diseases)}")
-print(f"Total number of diseases: {len(all_diseases_symptoms)}")
+    print(f"Number of matches found: {len(matching_diseases)}")
+    print(f"Total number of diseases: {len(all_diseases_symptoms)}")
 
-#print("\nDiseases where the symptoms are a proper subset of another disease:")
-#for disease1, disease2, symptoms1, symptoms2 in subset_relations:
-#    print(f"{disease1} has the symptoms {', '.join(symptoms1)} as a subset of {disease2} (with additional symptoms: {', '.join(symptoms2 - symptoms1)})")
+    #print("\nDiseases where the symptoms are a proper subset of another disease:")
+    #for disease1, disease2, symptoms1, symptoms2 in subset_relations:
+    #    print(f"{disease1} has the symptoms {', '.join(symptoms1)} as a subset of {disease2} (with additional symptoms: {', '.join(symptoms2 - symptoms1)})")
 
-print(f"\nNumber of subset relations: {len(subset_relations)}")
+    print(f"\nNumber of subset relations: {len(subset_relations)}")
@@ -0,0 +1,87 @@
+from collections import deque
+
+
+def build_closure(symptoms):
+    """
+    Materializes the transitive `dbo:symptom+` relation.
+
+    Args:
+    - symptoms (list): For every node ID the IDs of its direct symptoms.
+
+    Returns:
+    - list: For every node a dict mapping each reachable node to the length of the
+      shortest `dbo:symptom` path to it (1 for direct symptoms). A node that lies on a
+      cycle reaches itself, exactly like the SPARQL property path does.
+    """
+    closure = []
+    for node in range(len(symptoms)):
+        depths = {}
+        queue = deque((x, 1) for x in symptoms[node])
+        while queue:
+            target, depth = queue.popleft()
+            if target in depths:
+                continue
+            depths[target] = depth
+            queue.extend((x, depth + 1) for x in symptoms[target] if x not in depths)
+        closure.append(depths)
+    return closure
+
+
+def find_cycles(symptoms):
+    """
+    Finds all cycles of the `dbo:symptom` relation (iterative Tarjan SCC).
+
+    Args:
+    - symptoms (list): For every node ID the IDs of its direct symptoms.
+
+    Returns:
+    - list: The strongly connected components that contain a cycle, each as a sorted
+      list of node IDs. Self-loops are reported as single-node components.
+    """
+    index = {}
+    lowlink = {}
+    on_stack = set()
+    stack = []
+    cycles = []
+    counter = 0
+
+    for root in range(len(symptoms)):
+        if root in index:
+            continue
+
+        work = [(root, 0)]
+        while work:
+            node, child = work.pop()
+            if child == 0:
+                index[node] = lowlink[node] = counter
+                counter += 1
+                stack.append(node)
+                on_stack.add(node)
+
+            successors = symptoms[node]
+            if child < len(successors):
+                work.append((node, child + 1))
+                target = successors[child]
+                if target not in index:
+                    work.append((target, 0))
+                elif target in on_stack:
+                    lowlink[node] = min(lowlink[node], index[target])
+                continue
+
+            # All successors are done: propagate the lowlink to the parent
+            if work:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[node])
+
+            if lowlink[node] == index[node]:
+                component = []
+                while True:
+                    x = stack.pop()
+                    on_stack.discard(x)
+                    component.append(x)
+                    if x == node:
+                        break
+                if len(component) > 1 or node in symptoms[node]:
+                    cycles.append(sorted(component))
+
+    return cycles
@@ -0,0 +1,65 @@
+import os
+
+# Root directory of the repository; local data files are resolved relative to it.
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.environ.get("HEALTHCARE_DATA_DIR", os.path.join(BASE_DIR, "data"))
+
+# Public DBpedia SPARQL endpoint used by all live queries.
+DBPEDIA_ENDPOINT = os.environ.get("HEALTHCARE_DBPEDIA_ENDPOINT", "https://dbpedia.org/sparql")
+
+# Which backend answers the knowledge-graph queries:
+#   "sparql" - always query the live DBpedia endpoint
+#   "local"  - answer from the offline snapshot (fails if it is missing or cannot be loaded)
+#   "auto"   - use the snapshot if it exists, otherwise SPARQL
+KNOWLEDGE_BACKEND = os.environ.get("HEALTHCARE_KNOWLEDGE_BACKEND", "auto").lower()
+
+# Location of the offline snapshot written by `python -m backend.snapshot_builder`.
+SNAPSHOT_PATH = os.environ.get("HEALTHCARE_SNAPSHOT_PATH", os.path.join(DATA_DIR, "dbpedia_snapshot.json.gz"))
+
+# Timeout in seconds for a single SPARQL request and the number of attempts for retryable errors.
+SPARQL_TIMEOUT = float(os.environ.get("HEALTHCARE_SPARQL_TIMEOUT", "30"))
+SPARQL_MAX_ATTEMPTS = int(os.environ.get("HEALTHCARE_SPARQL_MAX_ATTEMPTS", "3"))
+
+# Result cache in front of the SPARQL queries (in-process LRU + on-disk SQLite tier).
+QUERY_CACHE_ENABLED = os.environ.get("HEALTHCARE_QUERY_CACHE", "1") != "0"
+QUERY_CACHE_PATH = os.environ.get("HEALTHCARE_QUERY_CACHE_PATH", os.path.join(DATA_DIR, "query_cache.sqlite"))
+QUERY_CACHE_MAX_ENTRIES = int(os.environ.get("HEALTHCARE_QUERY_CACHE_MAX_ENTRIES", "512"))
+
+# Concurrency limit and per-request timeout in seconds for the Wikipedia fetches.
+WIKIPEDIA_MAX_WORKERS = int(os.environ.get("HEALTHCARE_WIKIPEDIA_MAX_WORKERS", "8"))
+WIKIPEDIA_TIMEOUT = float(os.environ.get("HEALTHCARE_WIKIPEDIA_TIMEOUT", "15"))
+
+# Offline store of Wikipedia symptom sections written by `python -m backend.wikipedia_dump`.
+WIKIPEDIA_STORE_PATH = os.environ.get("HEALTHCARE_WIKIPEDIA_STORE_PATH", os.path.join(DATA_DIR, "wikipedia_sections.sqlite"))
+
+# MedlinePlus article cache: location, age in seconds after which an article is revalidated,
+# request timeout in seconds and request rate (per second) of the prefetch crawler.
+MEDLINE_STORE_PATH = os.environ.get("HEALTHCARE_MEDLINE_STORE_PATH", os.path.join(DATA_DIR, "medline_articles.sqlite"))
+MEDLINE_MAX_AGE = float(os.environ.get("HEALTHCARE_MEDLINE_MAX_AGE", str(30 * 24 * 60 * 60)))
+MEDLINE_TIMEOUT = float(os.environ.get("HEALTHCARE_MEDLINE_TIMEOUT", "15"))
+MEDLINE_CRAWL_RATE = float(os.environ.get("HEALTHCARE_MEDLINE_CRAWL_RATE", "2"))
+
+# Offline MedlinePlus index written by `python -m backend.medline_bulk`.
+MEDLINE_BULK_PATH = os.environ.get("HEALTHCARE_MEDLINE_BULK_PATH", os.path.join(DATA_DIR, "medline_bulk.sqlite"))
+
+# Retrieval of symptom-section chunks for the LLM prompts: number of chunks beyond the one kept per
+# disease and token budget.
+RETRIEVAL_TOP_K = int(os.environ.get("HEALTHCARE_RETRIEVAL_TOP_K", "12"))
+RETRIEVAL_TOKEN_BUDGET = int(os.environ.get("HEALTHCARE_RETRIEVAL_TOKEN_BUDGET", "1500"))
+
+# Persistent cache of LLM responses: location and maximum size of the stored responses in bytes.
+LLM_CACHE_ENABLED = os.environ.get("HEALTHCARE_LLM_CACHE", "1") != "0"
+LLM_CACHE_PATH = os.environ.get("HEALTHCARE_LLM_CACHE_PATH", os.path.join(DATA_DIR, "llm_cache.sqlite"))
+LLM_CACHE_MAX_BYTES = int(os.environ.get("HEALTHCARE_LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Scheduler in front of the Ollama server: concurrent requests and the maximum time in seconds
+# a request may wait in the queue.
+LLM_MAX_CONCURRENCY = int(os.environ.get("HEALTHCARE_LLM_MAX_CONCURRENCY", "2"))
+LLM_QUEUE_DEADLINE = float(os.environ.get("HEALTHCARE_LLM_QUEUE_DEADLINE", "120"))
+
+# Tracing: optional file the Prometheus metrics are written to (e.g. for the node_exporter
+# textfile collector), the minimum interval between two writes in seconds, and whether
+# Home.py shows the diagnostics panel.
+TRACING_METRICS_PATH = os.environ.get("HEALTHCARE_METRICS_PATH") or None
+TRACING_METRICS_INTERVAL = float(os.environ.get("HEALTHCARE_METRICS_INTERVAL", "15"))
+DEBUG_PANEL = os.environ.get("HEALTHCARE_DEBUG_PANEL", "0") != "0"
@@ -1,24 +1,38 @@
-from SPARQLWrapper import SPARQLWrapper, JSON
-import time
+from backend import config, local_handler
+from backend.query_cache import query_cache
+from backend.sparql_client import client
+from backend.tracing import span
 
 
-def query_dbpedia(sparql, query, query_type="generic"):
-    sparql.setQuery(query)
-    sparql.setReturnFormat(JSON)
+def query_dbpedia(query, query_type="generic", timeout=None, use_cache=True):
+    """
+    Runs a SELECT query against DBpedia through the shared SPARQL client and returns the bindings.
 
-    for attempt in range(3):
-        try:
-            results = sparql.query().convert()["results"]["bindings"]
-            return results
-        except Exception as e:
-            print(f"Attempt {attempt + 1} failed for {query_type} query: {e}")
-            time.sleep(1)  # Add a small delay between retry attempts
+    Results are served from the shared query cache if possible. The returned bindings may be
+    shared with other callers and must not be modified. Cache hits are traced as the stage
+    "dbpedia/<type>/cached", so that "dbpedia/<type>" only measures the calls to DBpedia.
+    """
+    with span(f"dbpedia/{query_type}") as s:
+        if not use_cache or not config.QUERY_CACHE_ENABLED:
+            results = client.query(query, query_type, timeout)
+        else:
+            computed = []
 
-    raise Exception(f"Failed to execute {query_type} query after 3 attempts")
+            def compute():
+                computed.append(True)
+                return client.query(query, query_type, timeout)
+
+            results = query_cache.get_or_compute(query, query_type, compute)
+            if not computed:
+                s.stage += "/cached"
+        s.attributes["rows"] = len(results)
+        return results
 
 
 def get_all_symptoms():
-    sparql = SPARQLWrapper("https://dbpedia.org/sparql")
+    if local_handler.is_active():
+        return local_handler.get_all_symptoms()
+
     query = """
         SELECT DISTINCT ?symptom ?label
         WHERE {
@@ -29,7 +43,7 @@ def get_all_symptoms():
     """
 
     try:
-        results = query_dbpedia(sparql, query, "all symptoms")
+        results = query_dbpedia(query, "all symptoms")
         label_resource_dict = {
             x["label"]["value"]: x["symptom"]["value"]
             for x in results}
@@ -46,7 +60,8 @@ def get_all_possible_symptoms(input_symptoms):
     Otherwise, it searches for diseases containing all the input symptoms
     and returns all symptoms of the remaining diseases, excluding the input symptoms.
     """
-    sparql = SPARQLWrapper("https://dbpedia.org/sparql")
+    if local_handler.is_active():
+        return local_handler.get_all_possible_symptoms(input_symptoms)
 
     if not input_symptoms:  # Check if the input list is empty
         query = """
@@ -83,7 +98,7 @@ def get_all_possible_symptoms(input_symptoms):
         """
 
     try:
-        results = query_dbpedia(sparql, query, "possible symptoms")
+        results = query_dbpedia(query, "possible symptoms")
 
         # Create a dictionary of symptoms excluding the input symptoms
         symptom_dict = {x["label"]["value"]: x["symptom"]["value"]
@@ -100,9 +115,11 @@ def get_all_possible_symptoms(input_symptoms):
 
 
 def get_diseases_by_symptoms(symptom_list):
+    if local_handler.is_active():
+        return local_handler.get_diseases_by_symptoms(symptom_list)
+
     symptom_triples = "\n".join([f"?disease dbo:symptom+ <{x}>." for x in symptom_list])
 
-    sparql = SPARQLWrapper("https://dbpedia.org/sparql")
     query = f"""
         SELECT DISTINCT ?disease ?label
         WHERE {{
@@ -113,7 +130,7 @@ def get_diseases_by_symptoms(symptom_list):
     """
 
     try:
-        results = query_dbpedia(sparql, query, "diseases by symptoms")
+        results = query_dbpedia(query, "diseases by symptoms")
         label_resource_dict = {x["label"]["value"]: x["disease"]["value"] for x in results}
         return {k: v for k, v in sorted(label_resource_dict.items(), key=lambda x: x[1])}
     except Exception as e:
@@ -122,7 +139,9 @@ def get_diseases_by_symptoms(symptom_list):
 
 
 def get_symptoms_of_disease(disease_uri, symptom_label_list, no_symptom_label_list):
-    sparql = SPARQLWrapper("https://dbpedia.org/sparql")
+    if local_handler.is_active():
+        return local_handler.get_symptoms_of_disease(disease_uri, symptom_label_list, no_symptom_label_list)
+
     query = f"""
         SELECT DISTINCT ?symptom ?label
         WHERE {{
@@ -133,7 +152,7 @@ def get_symptoms_of_disease(disease_uri, symptom_label_list, no_symptom_label_li
     """
 
     try:
-        results = query_dbpedia(sparql, query, "symptoms of disease")
+        results = query_dbpedia(query, "symptoms of disease")
         label_resource_dict = {
             x["label"]["value"]: x["symptom"]["value"]
             for x in results}
@@ -145,7 +164,9 @@ def get_symptoms_of_disease(disease_uri, symptom_label_list, no_symptom_label_li
 
 
 def get_medline_id_of_disease(disease_uri):
-    sparql = SPARQLWrapper("https://dbpedia.org/sparql")
+    if local_handler.is_active():
+        return local_handler.get_medline_id_of_disease(disease_uri)
+
     query = f"""
         SELECT ?medlineId
         WHERE {{
@@ -154,7 +175,7 @@ def get_medline_id_of_disease(disease_uri):
     """
 
     try:
-        results = query_dbpedia(sparql, query, "medline ID")
+        results = query_dbpedia(query, "medline ID")
         return results[0]["medlineId"]["value"] if results else None
     except Exception as e:
         print(f"Error retrieving Medline ID: {e}")
@@ -162,7 +183,9 @@ def get_medline_id_of_disease(disease_uri):
 
 
 def get_wikiPageID_of_disease(disease_uri):
-    sparql = SPARQLWrapper("https://dbpedia.org/sparql")
+    if local_handler.is_active():
+        return local_handler.get_wikiPageID_of_disease(disease_uri)
+
     query = f"""
         SELECT ?wikiPageID
         WHERE {{
@@ -171,13 +194,134 @@ def get_wikiPageID_of_disease(disease_uri):
     """
 
     try:
-        results = query_dbpedia(sparql, query, "wiki page ID")
+        results = query_dbpedia(query, "wiki page ID")
         return int(results[0]["wikiPageID"]["value"]) if results else None
     except Exception as e:
         print(f"Error retrieving Wiki Page ID: {e}")
         return None
 
 
+# DBpedia rejects overly long queries, so VALUES lists are split into chunks of this size.
+VALUES_CHUNK_SIZE = 50
+
+
+def _chunks(items, size=VALUES_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _values(disease_uris):
+    return " ".join(f"<{x}>" for x in disease_uris)
+
+
+def get_symptoms_of_diseases(disease_uris, symptom_label_list, no_symptom_label_list):
+    """
+    Batch version of `get_symptoms_of_disease`. If the query of a chunk fails, its diseases
+    are looked up one by one.
+
+    Returns:
+    - dict: Disease URI -> symptom dict as returned by `get_symptoms_of_disease`, in input order.
+    """
+    if local_handler.is_active():
+        return local_handler.get_symptoms_of_diseases(disease_uris, symptom_label_list, no_symptom_label_list)
+
+    disease_uris = list(dict.fromkeys(disease_uris))
+    symptoms = {x: {} for x in disease_uris}
+    for chunk in _chunks(disease_uris):
+        query = f"""
+            SELECT DISTINCT ?disease ?symptom ?label
+            WHERE {{
+                VALUES ?disease {{ {_values(chunk)} }}
+                ?disease dbo:symptom+ ?symptom.
+                ?symptom rdfs:label ?label.
+                filter langMatches(lang(?label), "en")
+            }}
+        """
+
+        try:
+            for x in query_dbpedia(query, "symptoms of diseases"):
+                symptoms[x["disease"]["value"]][x["label"]["value"]] = x["symptom"]["value"]
+        except Exception as e:
+            # The other chunks are not affected; this one is looked up disease by disease
+            print(f"Error retrieving symptoms of diseases, retrying one by one: {e}")
+            for x in chunk:
+                symptoms[x] = get_symptoms_of_disease(x, [], [])
+
+    return {
+        disease: {k: v for k, v in sorted(label_resource_dict.items(), key=lambda x: x[1]) if
+                  k not in symptom_label_list + no_symptom_label_list}
+        for disease, label_resource_dict in symptoms.items()
+    }
+
+
+def get_medline_ids_of_diseases(disease_uris):
+    """
+    Batch version of `get_medline_id_of_disease`. If the query of a chunk fails, its diseases
+    are looked up one by one.
+
+    Returns:
+    - dict: Disease URI -> MedlinePlus ID or None, in input order.
+    """
+    if local_handler.is_active():
+        return local_handler.get_medline_ids_of_diseases(disease_uris)
+
+    disease_uris = list(dict.fromkeys(disease_uris))
+    medline_ids = {x: None for x in disease_uris}
+    for chunk in _chunks(disease_uris):
+        query = f"""
+            SELECT ?disease ?medlineId
+            WHERE {{
+                VALUES ?disease {{ {_values(chunk)} }}
+                ?disease dbo:medlinePlus ?medlineId.
+            }}
+        """
+
+        try:
+            for x in query_dbpedia(query, "medline IDs"):
+                if medline_ids[x["disease"]["value"]] is None:
+                    medline_ids[x["disease"]["value"]] = x["medlineId"]["value"]
+        except Exception as e:
+            print(f"Error retrieving Medline IDs, retrying one by one: {e}")
+            for x in chunk:
+                medline_ids[x] = get_medline_id_of_disease(x)
+
+    return medline_ids
+
+
+def get_wikiPageIDs_of_diseases(disease_uris):
+    """
+    Batch version of `get_wikiPageID_of_disease`. If the query of a chunk fails, its diseases
+    are looked up one by one.
+
+    Returns:
+    - dict: Disease URI -> wiki page ID or None, in input order.
+    """
+    if local_handler.is_active():
+        return local_handler.get_wikiPageIDs_of_diseases(disease_uris)
+
+    disease_uris = list(dict.fromkeys(disease_uris))
+    wiki_page_ids = {x: None for x in disease_uris}
+    for chunk in _chunks(disease_uris):
+        query = f"""
+            SELECT ?disease ?wikiPageID
+            WHERE {{
+                VALUES ?disease {{ {_values(chunk)} }}
+                ?disease dbo:wikiPageID ?wikiPageID.
+            }}
+        """
+
+        try:
+            for x in query_dbpedia(query, "wiki page IDs"):
+                if wiki_page_ids[x["disease"]["value"]] is None:
+                    wiki_page_ids[x["disease"]["value"]] = int(x["wikiPageID"]["value"])
+        except Exception as e:
+            print(f"Error retrieving Wiki Page IDs, retrying one by one: {e}")
+            for x in chunk:
+                wiki_page_ids[x] = get_wikiPageID_of_disease(x)
+
+    return wiki_page_ids
+
+
 if __name__ == "__main__":
     symptom_dict = get_all_symptoms()
     symptom_list = [symptom_dict["Fever"], symptom_dict["Fatigue"]]
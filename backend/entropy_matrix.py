@@ -0,0 +1,118 @@
+from functools import lru_cache
+
+import numpy as np
+
+from backend.Entropy import binary_entropy
+
+
+@lru_cache(maxsize=256)
+def _entropy_table(total_diseases, max_count):
+    """
+    Entropy for every possible symptom count, computed with `binary_entropy`.
+
+    Looking the values up instead of calling np.log2 keeps the results bit-identical to
+    `calculate_entropy_for_all_symptoms`.
+    """
+    return np.array([binary_entropy(count, total_diseases) for count in range(max_count + 1)], dtype=np.float64)
+
+
+class DiseaseSymptomMatrix:
+    """
+    Matrix-backed variant of `calculate_entropy_for_all_symptoms` and `remove_and_check_symptoms`.
+
+    The disease-symptom pairs are stored as a uint8 disease x symptom matrix (the cells
+    count how often a symptom is listed for a disease, so duplicates behave exactly like in
+    the list based functions). Candidate sets are boolean masks over the rows.
+
+    Args:
+    - disease_symptom_pairs (dict): A dictionary associating diseases with their symptoms.
+    """
+
+    def __init__(self, disease_symptom_pairs):
+        self.diseases = list(disease_symptom_pairs)
+        # Columns are sorted by symptom, the same order calculate_entropy_for_all_symptoms returns
+        self.symptoms = sorted({s for symptoms in disease_symptom_pairs.values() for s in symptoms})
+        self.disease_index = {d: i for i, d in enumerate(self.diseases)}
+        self.symptom_index = {s: i for i, s in enumerate(self.symptoms)}
+
+        rows = [self.disease_index[d] for d, symptoms in disease_symptom_pairs.items() for _ in symptoms]
+        columns = [self.symptom_index[s] for symptoms in disease_symptom_pairs.values() for s in symptoms]
+        self.matrix = np.zeros((len(self.diseases), len(self.symptoms)), dtype=np.uint8)
+        np.add.at(self.matrix, (np.array(rows, dtype=np.intp), np.array(columns, dtype=np.intp)), 1)
+
+    def candidate_mask(self, candidates=None):
+        """
+        Converts an iterable of diseases to a row mask; None selects every disease.
+        """
+        mask = np.zeros(len(self.diseases), dtype=bool)
+        if candidates is None:
+            mask[:] = True
+        else:
+            mask[[self.disease_index[d] for d in candidates if d in self.disease_index]] = True
+        return mask
+
+    def _entropy_dict(self, counts, total_diseases):
+        present = np.flatnonzero(counts)
+        if total_diseases == 0 or len(present) == 0:
+            return {}
+        table = _entropy_table(total_diseases, int(counts.max()))
+        values = table[counts[present]]
+        return dict(zip([self.symptoms[i] for i in present], values.tolist()))
+
+    def entropies(self, candidates=None):
+        """
+        Returns the same result as `calculate_entropy_for_all_symptoms` for the candidate diseases.
+        """
+        mask = self.candidate_mask(candidates)
+        counts = self.matrix[mask].sum(axis=0, dtype=np.int64)
+        return self._entropy_dict(counts, int(mask.sum()))
+
+    def count_distinct_diseases(self, no_symptom_list, candidates=None):
+        """
+        Returns the same result as `remove_and_check_symptoms` for the candidate diseases.
+
+        The rows of the masked matrix (excluded symptom columns removed) are hashed by viewing
+        each row as one opaque byte string and counting the unique values.
+        """
+        mask = self.candidate_mask(candidates)
+        keep = np.ones(len(self.symptoms), dtype=bool)
+        keep[[self.symptom_index[s] for s in no_symptom_list if s in self.symptom_index]] = False
+
+        masked = np.ascontiguousarray(self.matrix[np.ix_(mask, keep)])
+        if masked.shape[0] == 0:
+            return 0
+        if masked.shape[1] == 0:
+            return 1
+        return len(np.unique(masked.view(np.dtype((np.void, masked.shape[1])))))
+
+    def entropies_batch(self, candidate_sets):
+        """
+        Scores many candidate sets (e.g. one per session) with a single matrix product.
+
+        Args:
+        - candidate_sets (list): One iterable of diseases per session.
+
+        Returns:
+        - list: One `calculate_entropy_for_all_symptoms` result per candidate set.
+        """
+        masks = np.array([self.candidate_mask(x) for x in candidate_sets], dtype=np.int64).reshape(
+            len(candidate_sets), len(self.diseases))
+        counts = masks @ self.matrix.astype(np.int64)
+        totals = masks.sum(axis=1)
+        return [self._entropy_dict(counts[i], int(totals[i])) for i in range(len(candidate_sets))]
+
+    def score_sessions(self, sessions):
+        """
+        Scores many sessions at once.
+
+        Args:
+        - sessions (list): (candidate diseases, no_symptom_list) tuples.
+
+        Returns:
+        - list: (entropy dict, distinct disease count) per session.
+        """
+        entropies = self.entropies_batch([candidates for candidates, _ in sessions])
+        return [
+            (entropy, self.count_distinct_diseases(no_symptom_list, candidates))
+            for entropy, (candidates, no_symptom_list) in zip(entropies, sessions)
+        ]
@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from backend import config
+from backend.tracing import span, text_size, tracer
+
+# Fields of OllamaLLM that change the generated text and are therefore part of the cache key.
+GENERATION_PARAMS = (
+    "temperature", "top_k", "top_p", "seed", "num_ctx", "num_predict", "repeat_penalty",
+    "repeat_last_n", "mirostat", "mirostat_eta", "mirostat_tau", "tfs_z", "stop", "format",
+)
+
+
+def generation_params(llm, **kwargs):
+    params = {name: getattr(llm, name, None) for name in GENERATION_PARAMS}
+    params.update(kwargs)
+    return {name: value for name, value in params.items() if value is not None}
+
+
+class LLMCache:
+    """
+    SQLite store of LLM responses, keyed by model, prompt and generation parameters.
+
+    Responses are stored as the list of streamed chunks, so cached streams can be replayed
+    chunk by chunk. When the stored responses exceed `max_bytes`, the least recently used
+    entries are evicted; a single response larger than `max_bytes` is not stored. Errors of the store are reported but never fail a generation.
+
+    Args:
+    - path (str): Location of the SQLite file.
+    - max_bytes (int): Maximum total size of the stored responses.
+    """
+
+    def __init__(self, path, max_bytes=config.LLM_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._db = None
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "too_large": 0}
+
+    def _connection(self):
+        if self._db is None and self.path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self._db = sqlite3.connect(self.path, check_same_thread=False)
+                self._db.execute("""
+                    CREATE TABLE IF NOT EXISTS llm_cache (
+                        key TEXT PRIMARY KEY,
+                        model TEXT,
+                        chunks TEXT,
+                        size INTEGER,
+                        last_used REAL
+                    )
+                """)
+                self._db.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_used ON llm_cache (last_used)")
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"LLM cache disabled: {e}")
+                self.path = None
+                self._db = None
+        return self._db
+
+    @staticmethod
+    def key(model, prompt, params):
+        payload = json.dumps([model, prompt, params], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        Returns the cached list of chunks or None.
+        """
+        with self._lock:
+            db = self._connection()
+            row = None
+            if db is not None:
+                try:
+                    row = db.execute("SELECT chunks FROM llm_cache WHERE key = ?", (key,)).fetchone()
+                    if row is not None:
+                        db.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+                        db.commit()
+                except sqlite3.Error as e:
+                    print(f"LLM cache read failed: {e}")
+                    row = None
+
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["hits"] += 1
+            return json.loads(row[0])
+
+    def put(self, key, model, chunks):
+        value = json.dumps(chunks)
+        with self._lock:
+            # Storing it would evict every other entry
+            if len(value) > self.max_bytes:
+                self._stats["too_large"] += 1
+                return
+            db = self._connection()
+            if db is None:
+                return
+            try:
+                db.execute("INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?)",
+                           (key, model, value, len(value), time.time()))
+                self._stats["stores"] += 1
+                self._evict(db, key)
+                db.commit()
+            except sqlite3.Error as e:
+                print(f"LLM cache write failed: {e}")
+
+    def _evict(self, db, keep):
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in db.execute("SELECT key, size FROM llm_cache WHERE key != ? ORDER BY last_used",
+                                    (keep,)).fetchall():
+            db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self._stats["evictions"] += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self):
+        with self._lock:
+            db = self._connection()
+            if db is not None:
+                db.execute("DELETE FROM llm_cache")
+                db.commit()
+
+    def get_stats(self):
+        """
+        Returns the hit/miss counters and the hit rate.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+# Process-wide cache used by CachedLLM
+llm_cache = LLMCache(config.LLM_CACHE_PATH if config.LLM_CACHE_ENABLED else None)
+
+
+class CachedLLM:
+    """
+    Wraps a LangChain LLM (e.g. OllamaLLM) and answers repeated prompts from the cache.
+
+    `invoke` and `stream` share the cache entries. A stream is only stored once it was
+    consumed completely, so cancelled generations are never cached. All other attributes
+    are taken from the wrapped LLM.
+
+    Args:
+    - llm: The wrapped LLM.
+    - cache (LLMCache): The response store.
+    """
+
+    def __init__(self, llm, cache=llm_cache):
+        self.llm = llm
+        self.cache = cache
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+    def _key(self, prompt, kwargs):
+        return self.cache.key(getattr(self.llm, "model", type(self.llm).__name__), prompt,
+                              generation_params(self.llm, **kwargs))
+
+    def invoke(self, prompt, **kwargs):
+        key = self._key(prompt, kwargs)
+        chunks = self.cache.get(key)
+        if chunks is not None:
+            response = "".join(chunks)
+            tracer.observe("llm/cached", 0.0, text_size(response))
+            return response
+
+        with span("llm/invoke") as s:
+            response = self.llm.invoke(prompt, **kwargs)
+            s.add_payload(text_size(response))
+        self.cache.put(key, getattr(self.llm, "model", None), [response])
+        return response
+
+    def stream(self, prompt, **kwargs):
+        key = self._key(prompt, kwargs)
+        chunks = self.cache.get(key)
+        if chunks is not None:
+            tracer.observe("llm/cached", 0.0, text_size(*chunks))
+            yield from chunks
+            return
+
+        chunks = []
+        # The generator is consumed by the caller, so the span must not become the current one
+        with span("llm/stream", activate=False) as s:
+            start = time.perf_counter()
+            for chunk in self.llm.stream(prompt, **kwargs):
+                if not chunks:
+                    tracer.observe("llm/first_token", time.perf_counter() - start)
+                chunks.append(chunk)
+                s.add_payload(text_size(chunk))
+                yield chunk
+        self.cache.put(key, getattr(self.llm, "model", None), chunks)
@@ -0,0 +1,351 @@
+import contextlib
+import contextvars
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import CancelledError, Future
+
+from backend import config
+
+# Priorities, lower runs first: interactive questions, final assessments, speculative pre-generation.
+QUESTION = 0
+ASSESSMENT = 1
+SPECULATIVE = 2
+PRIORITY_NAMES = {QUESTION: "question", ASSESSMENT: "assessment", SPECULATIVE: "speculative"}
+
+# Number of recent wait times kept for the percentiles.
+WAIT_SAMPLES = 1000
+
+
+class DeadlineExceeded(TimeoutError):
+    """
+    Raised when a request did not start before its deadline.
+    """
+
+
+class _Job:
+    def __init__(self, session_id, priority, fn, deadline):
+        self.session_id = session_id
+        self.priority = priority
+        self.fn = fn
+        self.deadline = deadline
+        self.enqueued_at = time.monotonic()
+        self.future = Future()
+
+
+class LLMScheduler:
+    """
+    Process-wide queue for the requests to the LLM server.
+
+    At most `max_workers` requests run at the same time. Waiting requests are taken by
+    priority; within a priority the sessions take turns (round robin), so one session with
+    many requests cannot starve the others. Requests that did not start before their
+    deadline fail with DeadlineExceeded as soon as the deadline passes, even while all
+    workers are busy.
+
+    Args:
+    - max_workers (int): Number of concurrent requests.
+    - deadline (float): Default maximum queue time in seconds, None for no limit.
+    """
+
+    def __init__(self, max_workers=config.LLM_MAX_CONCURRENCY, deadline=config.LLM_QUEUE_DEADLINE):
+        self.max_workers = max_workers
+        self.deadline = deadline
+        self._queues = {}  # priority -> OrderedDict(session_id -> deque of jobs)
+        lock = threading.RLock()
+        self._condition = threading.Condition(lock)
+        # Wakes up the thread that expires queued requests when an earlier deadline is queued
+        self._expiry = threading.Condition(lock)
+        self._expirer = None
+        self._workers = []
+        self._running = 0
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self._stats = {"submitted": 0, "completed": 0, "failed": 0, "expired": 0, "cancelled": 0}
+
+    def submit(self, session_id, priority, fn, deadline=None):
+        """
+        Queues `fn` and returns a Future with its result.
+
+        Args:
+        - session_id: Identifies the session the request belongs to.
+        - priority (int): QUESTION, ASSESSMENT or SPECULATIVE.
+        - fn (callable): Function that performs the request.
+        - deadline (float): Maximum queue time in seconds, defaults to the scheduler's.
+        """
+        deadline = self.deadline if deadline is None else deadline
+        job = _Job(session_id, priority, fn, None if deadline is None else time.monotonic() + deadline)
+        with self._condition:
+            sessions = self._queues.setdefault(priority, OrderedDict())
+            sessions.setdefault(session_id, deque()).append(job)
+            self._stats["submitted"] += 1
+            if len(self._workers) < self.max_workers:
+                worker = threading.Thread(target=self._work, daemon=True)
+                self._workers.append(worker)
+                worker.start()
+            if job.deadline is not None:
+                if self._expirer is None:
+                    self._expirer = threading.Thread(target=self._expire_jobs, daemon=True)
+                    self._expirer.start()
+                self._expiry.notify()
+            self._condition.notify()
+        return job.future
+
+    def reprioritize(self, future, priority):
+        """
+        Moves a queued request to another priority (at the back of its session's line).
+
+        Returns:
+        - bool: False if the request is not queued (anymore).
+        """
+        with self._condition:
+            for sessions in self._queues.values():
+                for session_id, jobs in sessions.items():
+                    job = next((x for x in jobs if x.future is future), None)
+                    if job is None:
+                        continue
+                    jobs.remove(job)
+                    if not jobs:
+                        del sessions[session_id]
+                    job.priority = priority
+                    self._queues.setdefault(priority, OrderedDict()).setdefault(session_id, deque()).append(job)
+                    self._condition.notify()
+                    return True
+        return False
+
+    def _next_job(self):
+        for priority in sorted(self._queues):
+            sessions = self._queues[priority]
+            while sessions:
+                session_id, jobs = next(iter(sessions.items()))
+                job = jobs.popleft()
+                # The session moves to the back of the line of its priority
+                del sessions[session_id]
+                if jobs:
+                    sessions[session_id] = jobs
+                # Cancelled requests never take a worker
+                if job.future.cancelled():
+                    self._stats["cancelled"] += 1
+                    continue
+                return job
+        return None
+
+    def _work(self):
+        while True:
+            with self._condition:
+                job = self._next_job()
+                while job is None:
+                    self._condition.wait()
+                    job = self._next_job()
+                self._running += 1
+            try:
+                self._run(job)
+            finally:
+                with self._condition:
+                    self._running -= 1
+
+    def _expire_jobs(self):
+        while True:
+            with self._condition:
+                now = time.monotonic()
+                expired = []
+                next_deadline = None
+                for sessions in self._queues.values():
+                    for session_id in list(sessions):
+                        jobs = sessions[session_id]
+                        for job in [x for x in jobs if x.deadline is not None]:
+                            if job.deadline > now:
+                                next_deadline = min(job.deadline, next_deadline or job.deadline)
+                            elif not job.future.cancelled():
+                                jobs.remove(job)
+                                expired.append(job)
+                        if not jobs:
+                            del sessions[session_id]
+                if not expired:
+                    self._expiry.wait(None if next_deadline is None else next_deadline - now)
+                    continue
+            for job in expired:
+                self._expire(job)
+
+    def _expire(self, job):
+        now = time.monotonic()
+        if not job.future.set_running_or_notify_cancel():
+            self._count("cancelled")
+            return
+        with self._condition:
+            self._waits.append(now - job.enqueued_at)
+            self._stats["expired"] += 1
+        job.future.set_exception(DeadlineExceeded(
+            f"LLM request waited {now - job.enqueued_at:.1f}s in the queue"))
+
+    def _run(self, job):
+        # A worker can take a job before the expiring thread gets to it
+        if job.deadline is not None and time.monotonic() > job.deadline:
+            self._expire(job)
+            return
+        now = time.monotonic()
+        if not job.future.set_running_or_notify_cancel():
+            self._count("cancelled")
+            return
+        with self._condition:
+            self._waits.append(now - job.enqueued_at)
+
+        try:
+            job.future.set_result(job.fn())
+            self._count("completed")
+        except BaseException as e:
+            self._count("failed")
+            job.future.set_exception(e)
+
+    def _count(self, name):
+        with self._condition:
+            self._stats[name] += 1
+
+    def get_stats(self):
+        """
+        Returns the queue depth per priority, the number of running requests, the request
+        counters and the queue wait times in seconds (over the last requests).
+        """
+        with self._condition:
+            stats = dict(self._stats)
+            stats["running"] = self._running
+            stats["queue_depth"] = {
+                PRIORITY_NAMES.get(priority, priority): sum(
+                    1 for jobs in sessions.values() for job in jobs if not job.future.cancelled())
+                for priority, sessions in sorted(self._queues.items())
+            }
+            waits = sorted(self._waits)
+        stats["wait_avg"] = sum(waits) / len(waits) if waits else 0.0
+        stats["wait_p95"] = waits[int(0.95 * (len(waits) - 1))] if waits else 0.0
+        stats["wait_max"] = waits[-1] if waits else 0.0
+        return stats
+
+
+# Process-wide scheduler shared by all sessions
+llm_scheduler = LLMScheduler()
+
+_DONE = object()
+
+_current_control = contextvars.ContextVar("current_request_control", default=None)
+
+
+class RequestControl:
+    """
+    Cancels or re-prioritizes the requests a background task queues through ScheduledLLM.
+
+    The control applies to the requests queued while it is bound (see `bind`). `cancel()`
+    removes them from the queue and stops their streams; `promote()` moves them to a higher
+    priority, e.g. once a speculative generation turns out to be the one the user waits for.
+    """
+
+    def __init__(self):
+        self.priority = None
+        self.cancelled = False
+        self._requests = []  # (scheduler, future, on_cancel)
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def bind(self):
+        token = _current_control.set(self)
+        try:
+            yield self
+        finally:
+            _current_control.reset(token)
+
+    @staticmethod
+    def current():
+        return _current_control.get()
+
+    def submit(self, scheduler, session_id, priority, fn, on_cancel=None):
+        """
+        Queues `fn` like `scheduler.submit`, at the promoted priority if it is higher.
+
+        Raises CancelledError if the control was already cancelled.
+        """
+        with self._lock:
+            if self.cancelled:
+                raise CancelledError()
+            if self.priority is not None:
+                priority = min(priority, self.priority)
+            future = scheduler.submit(session_id, priority, fn)
+            self._requests.append((scheduler, future, on_cancel))
+        return future
+
+    def promote(self, priority):
+        with self._lock:
+            self.priority = priority if self.priority is None else min(priority, self.priority)
+            for scheduler, future, _ in self._requests:
+                scheduler.reprioritize(future, self.priority)
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            requests, self._requests = self._requests, []
+        for _, future, on_cancel in requests:
+            future.cancel()
+            if on_cancel is not None:
+                on_cancel()
+
+
+class ScheduledLLM:
+    """
+    Wraps a LangChain LLM so that every request goes through the scheduler.
+
+    A stream occupies its worker until it is consumed completely or closed. Requests queued
+    under a bound RequestControl can be cancelled or promoted through it. All other
+    attributes are taken from the wrapped LLM.
+
+    Args:
+    - llm: The wrapped LLM.
+    - session_id: Identifies the session for fair sharing.
+    - priority (int): QUESTION, ASSESSMENT or SPECULATIVE.
+    - scheduler (LLMScheduler): The scheduler to queue the requests in.
+    """
+
+    def __init__(self, llm, session_id, priority=QUESTION, scheduler=llm_scheduler):
+        self.llm = llm
+        self.session_id = session_id
+        self.priority = priority
+        self.scheduler = scheduler
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+    def invoke(self, prompt, **kwargs):
+        return self.scheduler.submit(self.session_id, self.priority,
+                                     lambda: self.llm.invoke(prompt, **kwargs)).result()
+
+    def stream(self, prompt, **kwargs):
+        chunks = queue.Queue()
+        stop = threading.Event()
+
+        def run():
+            for chunk in self.llm.stream(prompt, **kwargs):
+                if stop.is_set():
+                    break
+                chunks.put(chunk)
+
+        def cancel():
+            # Wakes up the consumer even if the request never started
+            stop.set()
+            chunks.put(_DONE)
+
+        control = RequestControl.current()
+        if control is not None:
+            future = control.submit(self.scheduler, self.session_id, self.priority, run, cancel)
+        else:
+            future = self.scheduler.submit(self.session_id, self.priority, run)
+        future.add_done_callback(lambda _: chunks.put(_DONE))
+        try:
+            while True:
+                chunk = chunks.get()
+                if chunk is _DONE:
+                    break
+                yield chunk
+            # A cancelled stream must not look complete (CachedLLM would store it)
+            if stop.is_set():
+                raise CancelledError()
+            future.result()
+        finally:
+            stop.set()
+            future.cancel()
@@ -0,0 +1,171 @@
+"""
+Local query engine answering the DBpedia handler functions from the offline snapshot.
+
+All functions have the same signatures and return the same structures as their SPARQL
+counterparts in `dbpedia_handler.py` and `Entropy.py`.
+"""
+import os
+import threading
+
+from backend import config
+from backend.snapshot import KnowledgeGraph
+from backend.symptom_index import iter_bits
+
+_graph = None
+_graph_lock = threading.Lock()
+_load_failed = False
+
+
+def get_graph():
+    """
+    Returns the process-wide snapshot, loading it on first use.
+
+    Returns None if the configuration selects the SPARQL backend or, with "auto", if the
+    snapshot cannot be loaded, in which case the callers fall back to the live endpoint.
+    With "local" a missing or broken snapshot raises instead.
+    """
+    global _graph, _load_failed
+
+    if _graph is not None or _load_failed or config.KNOWLEDGE_BACKEND == "sparql":
+        return _graph
+
+    with _graph_lock:
+        if _graph is None and not _load_failed:
+            if not os.path.exists(config.SNAPSHOT_PATH):
+                if config.KNOWLEDGE_BACKEND == "local":
+                    raise FileNotFoundError(
+                        f"Snapshot {config.SNAPSHOT_PATH} not found, build it with "
+                        f"`python -m backend.snapshot_builder` or use HEALTHCARE_KNOWLEDGE_BACKEND=auto")
+                _load_failed = True
+            else:
+                try:
+                    graph = KnowledgeGraph.load(config.SNAPSHOT_PATH)
+                    # Build the inverted indexes up front instead of on the first user click
+                    graph.direct_index, graph.transitive_index
+                    _graph = graph
+                except Exception as e:
+                    if config.KNOWLEDGE_BACKEND == "local":
+                        raise
+                    print(f"Error loading snapshot, falling back to SPARQL: {e}")
+                    _load_failed = True
+    return _graph
+
+
+def is_active():
+    return get_graph() is not None
+
+
+def _label_dict(graph, resource_ids):
+    return {label: graph.resources[i] for i in resource_ids for label in graph.labels[i]}
+
+
+def get_all_symptoms():
+    graph = get_graph()
+    return _label_dict(graph, graph.symptom_ids)
+
+
+def get_all_possible_symptoms(input_symptoms):
+    graph = get_graph()
+
+    if not input_symptoms:
+        return _label_dict(graph, graph.symptom_ids)
+
+    input_ids = [graph.ids.get(x) for x in input_symptoms]
+    if None in input_ids:
+        return {}
+
+    index = graph.direct_index
+    symptom_ids = iter_bits(index.symptoms_of(index.diseases_with_all(input_ids)))
+
+    symptom_dict = _label_dict(graph, symptom_ids)
+    return {k: v for k, v in symptom_dict.items() if k not in input_symptoms}
+
+
+def _diseases_with_symptoms(graph, symptom_list):
+    """
+    Returns the IDs of all resources that reach every given symptom via `dbo:symptom+`.
+    """
+    symptom_ids = [graph.ids.get(x) for x in symptom_list]
+    if None in symptom_ids:
+        return []
+    index = graph.transitive_index
+    return index.disease_list(index.diseases_with_all(symptom_ids))
+
+
+def get_diseases_by_symptoms(symptom_list):
+    graph = get_graph()
+    return _label_dict(graph, _diseases_with_symptoms(graph, symptom_list))
+
+
+def get_symptoms_of_disease(disease_uri, symptom_label_list, no_symptom_label_list):
+    graph = get_graph()
+    disease = graph.ids.get(disease_uri)
+    if disease is None:
+        return {}
+    label_resource_dict = _label_dict(graph, graph.transitive_symptoms(disease))
+    return {k: v for k, v in label_resource_dict.items() if k not in symptom_label_list + no_symptom_label_list}
+
+
+def get_medline_id_of_disease(disease_uri):
+    graph = get_graph()
+    return graph.medline_ids.get(graph.ids.get(disease_uri))
+
+
+def get_wikiPageID_of_disease(disease_uri):
+    graph = get_graph()
+    return graph.wiki_page_ids.get(graph.ids.get(disease_uri))
+
+
+def get_symptoms_of_diseases(disease_uris, symptom_label_list, no_symptom_label_list):
+    return {x: get_symptoms_of_disease(x, symptom_label_list, no_symptom_label_list) for x in disease_uris}
+
+
+def get_medline_ids_of_diseases(disease_uris):
+    return {x: get_medline_id_of_disease(x) for x in disease_uris}
+
+
+def get_wikiPageIDs_of_diseases(disease_uris):
+    return {x: get_wikiPageID_of_disease(x) for x in disease_uris}
+
+
+def get_diseases_for_symptoms(symptoms_list):
+    # Like the SPARQL query without symptom conditions
+    if not symptoms_list:
+        return []
+    graph = get_graph()
+    return [graph.resources[i] for i in _diseases_with_symptoms(graph, symptoms_list)]
+
+
+def get_disease_symptom_pairs(disease_list):
+    graph = get_graph()
+    disease_symptom_pairs = {}
+    for disease_uri in dict.fromkeys(disease_list):
+        disease = graph.ids.get(disease_uri)
+        if disease is None:
+            continue
+        symptoms = [graph.resources[i] for i in graph.transitive_symptoms(disease)]
+        for label in graph.labels[disease]:
+            disease_symptom_pairs.setdefault(label, []).extend(symptoms)
+    return disease_symptom_pairs
+
+
+def get_direct_symptoms_of_disease(disease_uri):
+    """
+    Returns the URIs of the direct `dbo:symptom` objects of a disease.
+    """
+    graph = get_graph()
+    disease = graph.ids.get(disease_uri)
+    if disease is None:
+        return []
+    return [graph.resources[i] for i in graph.direct_symptoms(disease)]
+
+
+def get_transitive_symptoms_of_disease(disease_uri):
+    """
+    Returns all symptoms reachable via `dbo:symptom+` as a dict of URI -> path depth.
+    """
+    graph = get_graph()
+    disease = graph.ids.get(disease_uri)
+    if disease is None:
+        return {}
+    return {graph.resources[i]: graph.symptom_depth(disease, i) for i in graph.transitive_symptoms(disease)}
@@ -0,0 +1,196 @@
+"""
+Offline MedlinePlus index built from the MedlinePlus health topic XML export
+(mplus_topics_YYYY-MM-DD.xml, https://medlineplus.gov/xml.html).
+
+Every English health topic is stored with the same two fields `get_article` extracts from
+the article pages: the full text and the symptoms section. A topic is stored under its own ID
+and under the ID of the encyclopedia articles (ency/article/<id>.htm) it links whose title
+matches the topic, which is the kind of ID `dbo:medlinePlus` refers to. Topics also link
+unrelated articles (lab tests, other conditions), so an encyclopedia article that matches no
+topic or several topics is not stored and `get_article` fetches it live.
+
+Usage:
+    python -m backend.medline_bulk <mplus_topics.xml> [store path]
+"""
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+from lxml import etree, html
+
+from backend import config
+
+_ENCY_URL = re.compile(r"/ency/article/(\d+)\.htm")
+_WORD = re.compile(r"\w+")
+
+
+def _normalize_title(title):
+    return " ".join(_WORD.findall((title or "").casefold()))
+
+
+def extract_fields(summary_html):
+    """
+    Extracts the full text and the symptoms section from the HTML summary of a topic.
+
+    The summaries head the section with a question ("What are the symptoms of asthma?")
+    rather than "Symptoms", so the first heading mentioning symptoms is used.
+
+    Returns:
+    - tuple: (full text, symptoms text or None), joined like in `parse_article`.
+    """
+    fragment = html.fragment_fromstring(summary_html, create_parent="div")
+    article_text = " ".join(fragment.xpath('.//text()'))
+
+    symptoms_text = None
+    for heading in fragment.iter("h2", "h3", "h4"):
+        if "symptom" not in heading.text_content().lower():
+            continue
+        texts = heading.xpath('.//text()')
+        for sibling in heading.itersiblings():
+            if sibling.tag in ("h2", "h3", "h4"):
+                break
+            texts.extend(sibling.xpath('.//text()'))
+        symptoms_text = " ".join(texts).strip()
+        break
+
+    return article_text, symptoms_text
+
+
+def iter_health_topics(xml_path):
+    """
+    Yields (topic ID, title, encyclopedia article IDs, summary HTML) for every English topic.
+
+    Only encyclopedia articles whose link title matches the title of the topic or one of its
+    other names (`also-called`) are returned.
+
+    Processed elements and their preceding siblings are removed from the tree, so memory
+    stays bounded independent of the size of the export.
+    """
+    for _, elem in etree.iterparse(xml_path, events=("end",), tag="health-topic"):
+        if elem.get("language", "English") == "English":
+            summary = elem.findtext("full-summary") or ""
+            names = {_normalize_title(elem.get("title"))}
+            names.update(_normalize_title(x.text) for x in elem.iterfind("also-called"))
+            ency_ids = []
+            for site in elem.iterfind("site"):
+                match = _ENCY_URL.search(site.get("url", ""))
+                if not match or _normalize_title(site.get("title")) not in names:
+                    continue
+                if match.group(1) not in ency_ids:
+                    ency_ids.append(match.group(1))
+            yield elem.get("id"), elem.get("title"), ency_ids, summary
+
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+
+
+class BulkArticleStore:
+    """
+    SQLite index of the ingested MedlinePlus texts, keyed by MedlinePlus ID.
+
+    Args:
+    - path (str): Location of the SQLite file.
+    """
+
+    def __init__(self, path=config.MEDLINE_BULK_PATH):
+        self.path = path
+        self._db = None
+        self._lock = threading.Lock()
+
+    def _connection(self, create=False):
+        if self._db is None and (create or os.path.exists(self.path)):
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS medline_bulk (
+                    medline_id TEXT PRIMARY KEY,
+                    topic_id TEXT,
+                    title TEXT,
+                    article_text TEXT,
+                    symptoms_text TEXT
+                )
+            """)
+        return self._db
+
+    def get(self, medline_id):
+        """
+        Returns (article_text, symptoms_text) or None.
+        """
+        with self._lock:
+            try:
+                db = self._connection()
+                if db is None:
+                    return None
+                return db.execute("SELECT article_text, symptoms_text FROM medline_bulk WHERE medline_id = ?",
+                                  (str(medline_id),)).fetchone()
+            except sqlite3.Error as e:
+                # The articles are fetched from MedlinePlus instead
+                print(f"MedlinePlus bulk index read failed: {e}")
+                return None
+
+    def put_many(self, rows):
+        with self._lock:
+            db = self._connection(create=True)
+            db.executemany("INSERT OR REPLACE INTO medline_bulk VALUES (?, ?, ?, ?, ?)", rows)
+            db.commit()
+
+    def clear(self):
+        with self._lock:
+            db = self._connection(create=True)
+            db.execute("DELETE FROM medline_bulk")
+            db.commit()
+
+
+# Process-wide index used by get_article
+bulk_store = BulkArticleStore()
+
+
+def ingest(xml_path, store, batch_size=500):
+    """
+    Ingests a health topic XML export into the store, replacing its previous content, and
+    reports the throughput.
+
+    Encyclopedia articles matched by more than one topic are ambiguous and left out.
+
+    Returns:
+    - int: Number of ingested topics.
+    """
+    start = time.time()
+    topics = 0
+    batch = []
+    # Encyclopedia article ID -> row, None once a second topic matched it
+    ency_rows = {}
+    store.clear()
+    for topic_id, title, ency_ids, summary in iter_health_topics(xml_path):
+        article_text, symptoms_text = extract_fields(summary) if summary else ("", None)
+        batch.append((topic_id, topic_id, title, article_text, symptoms_text))
+        for ency_id in ency_ids:
+            row = (ency_id, topic_id, title, article_text, symptoms_text)
+            ency_rows[ency_id] = None if ency_id in ency_rows else row
+        topics += 1
+
+        if len(batch) >= batch_size:
+            store.put_many(batch)
+            batch = []
+        if topics % 200 == 0:
+            print(f"{topics} documents, {topics / (time.time() - start):.0f} docs/s")
+
+    store.put_many(batch)
+    ambiguous = sum(1 for row in ency_rows.values() if row is None)
+    store.put_many([row for row in ency_rows.values() if row is not None])
+    if ambiguous:
+        print(f"Skipped {ambiguous} encyclopedia articles matched by several topics")
+    elapsed = time.time() - start
+    print(f"Ingested {topics} documents in {elapsed:.1f}s ({topics / elapsed if elapsed else 0:.0f} docs/s)")
+    return topics
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    ingest(sys.argv[1], BulkArticleStore(sys.argv[2]) if len(sys.argv) > 2 else bulk_store)
@@ -1,36 +1,247 @@
+import os
+import sqlite3
+import sys
+import threading
+import time
+
 import requests
+from requests.adapters import HTTPAdapter
 from lxml import html
 
-def get_article(medline_id):
-    # Define the URL and the XPath
-    url = f"https://medlineplus.gov/ency/article/{medline_id}.htm"
+from backend import config
+from backend.medline_bulk import bulk_store
+from backend.tracing import traced, text_size
+
+# Pooled keep-alive session for all MedlinePlus requests
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_maxsize=10))
+
+
+def parse_article(content):
+    """
+    Extracts the article text and the "Symptoms" section from a MedlinePlus article page.
+
+    Returns:
+    - tuple: (article text, symptoms text or None)
+    """
     xpath_full_text = '//*[@id="d-article"]/div[2]'
     xpath_symptoms = '//section[.//h2[text()="Symptoms"]]'
 
-    # Send a request to fetch the page content
-    response = requests.get(url)
-    if response.status_code == 200:
-        # Parse the content
-        tree = html.fromstring(response.content)
+    # Parse the content
+    tree = html.fromstring(content)
+
+    # Find any section where the header text is "Symptoms"
+    symptoms_sections = tree.xpath(xpath_symptoms)
+
+    if symptoms_sections:
+        # Get the text of the first matching "Symptoms" section
+        symptoms_text = symptoms_sections[0].xpath('.//text()')
+        symptoms_text = " ".join(symptoms_text).strip()
+    else:
+        symptoms_text = None
+
+    # Extract the article text using XPath
+    article_text = tree.xpath(xpath_full_text + '//text()')
+
+    # Join the text elements into a single string
+    article_text = " ".join(article_text)
+
+    return article_text, symptoms_text
+
+
+class ArticleStore:
+    """
+    Persistent cache of extracted MedlinePlus articles, keyed by MedlinePlus ID.
+
+    Besides the extracted texts it keeps the ETag and Last-Modified headers, so stale
+    articles can be revalidated with a conditional request. Errors of the store are reported
+    but never fail a lookup; the articles are then fetched from MedlinePlus.
+
+    Args:
+    - path (str): Location of the SQLite file.
+    """
+
+    def __init__(self, path=config.MEDLINE_STORE_PATH):
+        self.path = path
+        self._db = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._db is None and self.path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self._db = sqlite3.connect(self.path, check_same_thread=False)
+                self._db.execute("""
+                    CREATE TABLE IF NOT EXISTS medline_articles (
+                        medline_id TEXT PRIMARY KEY,
+                        article_text TEXT,
+                        symptoms_text TEXT,
+                        etag TEXT,
+                        last_modified TEXT,
+                        fetched_at REAL
+                    )
+                """)
+            except (sqlite3.Error, OSError) as e:
+                print(f"MedlinePlus article cache disabled: {e}")
+                self.path = None
+                self._db = None
+        return self._db
+
+    def get(self, medline_id):
+        """
+        Returns (article_text, symptoms_text, etag, last_modified, fetched_at) or None.
+        """
+        with self._lock:
+            db = self._connection()
+            if db is None:
+                return None
+            try:
+                return db.execute(
+                    "SELECT article_text, symptoms_text, etag, last_modified, fetched_at "
+                    "FROM medline_articles WHERE medline_id = ?", (str(medline_id),)).fetchone()
+            except sqlite3.Error as e:
+                print(f"MedlinePlus article cache read failed: {e}")
+                return None
+
+    def put(self, medline_id, article_text, symptoms_text, etag=None, last_modified=None):
+        with self._lock:
+            db = self._connection()
+            if db is None:
+                return
+            try:
+                db.execute("INSERT OR REPLACE INTO medline_articles VALUES (?, ?, ?, ?, ?, ?)",
+                           (str(medline_id), article_text, symptoms_text, etag, last_modified, time.time()))
+                db.commit()
+            except sqlite3.Error as e:
+                print(f"MedlinePlus article cache write failed: {e}")
+
+    def touch(self, medline_id):
+        """
+        Marks a cached article as fresh again (after a 304 Not Modified).
+        """
+        with self._lock:
+            db = self._connection()
+            if db is None:
+                return
+            try:
+                db.execute("UPDATE medline_articles SET fetched_at = ? WHERE medline_id = ?",
+                           (time.time(), str(medline_id)))
+                db.commit()
+            except sqlite3.Error as e:
+                print(f"MedlinePlus article cache write failed: {e}")
+
 
-        # Find any section where the header text is "Symptoms"
-        symptoms_sections = tree.xpath(xpath_symptoms)
+# Process-wide article cache used by get_article
+article_store = ArticleStore()
 
-        if symptoms_sections:
-            # Get the text of the first matching "Symptoms" section
-            symptoms_text = symptoms_sections[0].xpath('.//text()')
-            symptoms_text = " ".join(symptoms_text).strip()
-        else:
-            symptoms_text = None
 
-        # Extract the article text using XPath
-        article_text = tree.xpath(xpath_full_text + '//text()')
+@traced("medline/article", payload=lambda result: text_size(*result))
+def get_article(medline_id, max_age=config.MEDLINE_MAX_AGE):
+    """
+    Returns the article text and the "Symptoms" section of a MedlinePlus article.
 
-        # Join the text elements into a single string
-        article_text = " ".join(article_text)
+    Articles are served from the local cache. Once an entry is older than `max_age` seconds
+    it is revalidated with If-None-Match/If-Modified-Since and only downloaded and parsed
+    again if it changed. If MedlinePlus cannot be reached, the stale entry is returned.
 
+    Returns:
+    - tuple: (article text, symptoms text), (None, None) if the article cannot be retrieved.
+    """
+    cached = article_store.get(medline_id)
+    if cached is not None and time.time() - cached[4] < max_age:
+        return cached[0], cached[1]
+
+    # The offline index built from the MedlinePlus XML export saves the request. It only holds
+    # articles clearly matching one health topic, all others are fetched live.
+    ingested = bulk_store.get(medline_id)
+    if ingested is not None:
+        return ingested[0], ingested[1]
+
+    # Define the URL
+    url = f"https://medlineplus.gov/ency/article/{medline_id}.htm"
+
+    headers = {}
+    if cached is not None:
+        if cached[2]:
+            headers["If-None-Match"] = cached[2]
+        if cached[3]:
+            headers["If-Modified-Since"] = cached[3]
+
+    # Send a request to fetch the page content
+    try:
+        response = _session.get(url, headers=headers, timeout=config.MEDLINE_TIMEOUT)
+    except requests.RequestException as e:
+        print(f"Failed to retrieve page: {e}")
+        return (cached[0], cached[1]) if cached is not None else (None, None)
+
+    if response.status_code == 304 and cached is not None:
+        article_store.touch(medline_id)
+        return cached[0], cached[1]
+
+    if response.status_code == 200:
+        article_text, symptoms_text = parse_article(response.content)
+        article_store.put(medline_id, article_text, symptoms_text,
+                          response.headers.get("ETag"), response.headers.get("Last-Modified"))
         return article_text, symptoms_text
 
     else:
         print(f"Failed to retrieve page, status code: {response.status_code}")
-        return None, None
+        return (cached[0], cached[1]) if cached is not None else (None, None)
+
+
+def get_all_medline_ids():
+    """
+    Returns all `dbo:medlinePlus` IDs of the disease graph (from the snapshot if available).
+    """
+    from backend import local_handler
+    from backend.dbpedia_handler import query_dbpedia
+
+    if local_handler.is_active():
+        return sorted(set(local_handler.get_graph().medline_ids.values()))
+
+    results = query_dbpedia("""
+        SELECT DISTINCT ?medlineId
+        WHERE {
+            ?disease dbo:symptom ?symptom.
+            ?disease dbo:medlinePlus ?medlineId.
+        }
+    """, "all medline IDs")
+    return sorted({x["medlineId"]["value"] for x in results})
+
+
+def prefetch_articles(medline_ids, rate=config.MEDLINE_CRAWL_RATE, max_age=config.MEDLINE_MAX_AGE):
+    """
+    Warms the article cache, sending at most `rate` requests per second to MedlinePlus.
+
+    Articles that are still fresh in the cache are skipped without a request.
+
+    Returns:
+    - dict: Number of articles that were fresh, fetched (or revalidated) and failed.
+    """
+    counts = {"fresh": 0, "fetched": 0, "failed": 0}
+    interval = 1 / rate if rate > 0 else 0
+    next_request = 0.0
+
+    for i, medline_id in enumerate(medline_ids):
+        cached = article_store.get(medline_id)
+        if cached is not None and time.time() - cached[4] < max_age:
+            counts["fresh"] += 1
+            continue
+
+        # Articles of the offline index are served without a request
+        if bulk_store.get(medline_id) is None:
+            time.sleep(max(0.0, next_request - time.monotonic()))
+            next_request = time.monotonic() + interval
+
+        article_text, _ = get_article(medline_id, max_age)
+        counts["fetched" if article_text is not None else "failed"] += 1
+        if (i + 1) % 100 == 0:
+            print(f"{i + 1}/{len(medline_ids)} articles: {counts}")
+
+    return counts
+
+
+if __name__ == "__main__":
+    ids = sys.argv[1:] or get_all_medline_ids()
+    print(f"Prefetching {len(ids)} MedlinePlus articles")
+    print(prefetch_articles(ids))
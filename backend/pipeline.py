@@ -0,0 +1,161 @@
+"""
+Session-scoped pipeline for the diagnostic flow of Home.py.
+
+Streamlit re-executes the whole script on every interaction. The pipeline keeps the result of
+every stage together with the fingerprint of its inputs, so a rerun only recomputes the
+stages whose inputs (the known and excluded symptoms) actually changed.
+
+    entered symptoms ──> entered diseases ──> symptom pairs ──> entropy ──> next question
+    symptom list ──────> possible symptoms ──> possible symptom ids
+                 ├─────> disease list
+                 └─────> candidates ──> wiki page ids ──> symptom texts
+"""
+from typing import Callable, NamedTuple, Optional, Tuple
+
+from backend.dbpedia_handler import get_all_possible_symptoms, get_diseases_by_symptoms, get_wikiPageIDs_of_diseases
+from backend.Entropy import EntropyTracker, get_diseases_for_symptoms, get_disease_symptom_pairs
+from backend.tracing import span
+from backend.wikipedia_handler import get_symptom_texts
+
+
+class Stage(NamedTuple):
+    compute: Callable
+    deps: Tuple[str, ...]
+    inputs: Tuple[str, ...]
+    update: Optional[Callable] = None
+
+
+class Pipeline:
+    """
+    Memoized stage graph.
+
+    A stage is computed from the values of its dependencies followed by the values of its
+    inputs. Its fingerprint consists of its input values and the fingerprints of its
+    dependencies; the cached value is reused as long as the fingerprint is unchanged. If only
+    the inputs changed and the stage has an `update` function, the cached value is updated
+    in place instead of recomputed (`update(value, old inputs, new inputs)`, returning None
+    forces a recomputation).
+    """
+
+    def __init__(self):
+        self._stages = {}
+        self._inputs = {}
+        self._results = {}  # stage -> (fingerprint, value)
+        self._run_status = {}
+        self.run_count = 0
+
+    def stage(self, name, compute, deps=(), inputs=(), update=None):
+        self._stages[name] = Stage(compute, tuple(deps), tuple(inputs), update)
+
+    def set_inputs(self, **inputs):
+        # Lists are stored as tuples, so later changes to the session lists are detected
+        for name, value in inputs.items():
+            self._inputs[name] = tuple(value) if isinstance(value, list) else value
+
+    def fingerprint(self, name):
+        stage = self._stages[name]
+        return (tuple(self._inputs.get(x) for x in stage.inputs),
+                tuple(self.fingerprint(x) for x in stage.deps))
+
+    def get(self, name):
+        """
+        Returns the value of a stage, computing its dependencies as needed.
+        """
+        stage = self._stages[name]
+        fingerprint = self.fingerprint(name)
+        cached = self._results.get(name)
+        if cached is not None and cached[0] == fingerprint:
+            self._run_status.setdefault(name, "hit")
+            return cached[1]
+
+        dep_values = [self.get(x) for x in stage.deps]
+        with span(f"pipeline/{name}"):
+            value = None
+            if cached is not None and stage.update is not None and cached[0][1] == fingerprint[1]:
+                value = stage.update(cached[1], cached[0][0], fingerprint[0])
+            if value is not None:
+                self._run_status.setdefault(name, "updated")
+            else:
+                value = stage.compute(*dep_values, *fingerprint[0])
+                self._run_status.setdefault(name, "computed")
+
+        self._results[name] = (fingerprint, value)
+        return value
+
+    def begin_run(self):
+        """
+        Starts a new script run and prints which stages the previous run served from the cache.
+        """
+        if self._run_status:
+            print(f"Pipeline run {self.run_count}: " + ", ".join(
+                f"{name} ({status})" for name, status in self._run_status.items()))
+        self.run_count += 1
+        self._run_status = {}
+
+    def report(self):
+        """
+        Returns stage -> "hit", "updated" or "computed" for the current run.
+        """
+        return dict(self._run_status)
+
+
+def _build_tracker(disease_symptom_pairs, entered_symptoms, symptom_list, no_symptom_list):
+    tracker = EntropyTracker(disease_symptom_pairs, no_symptom_list)
+    # Symptoms confirmed in the question loop (the entered ones already define the pairs)
+    for symptom in symptom_list[len(entered_symptoms):]:
+        tracker.confirm(symptom)
+    return tracker
+
+
+def _advance_tracker(tracker, old_inputs, new_inputs):
+    # Only answers appended to the lists can be applied incrementally
+    (old_entered, old_yes, old_no), (new_entered, new_yes, new_no) = old_inputs, new_inputs
+    if old_entered != new_entered or new_yes[:len(old_yes)] != old_yes or new_no[:len(old_no)] != old_no:
+        return None
+    for symptom in new_yes[len(old_yes):]:
+        tracker.confirm(symptom)
+    for symptom in new_no[len(old_no):]:
+        tracker.exclude(symptom)
+    return tracker
+
+
+def _next_question(tracker):
+    # The lookahead of `select_question` does not need fewer questions in Home's loop yet
+    # (see benchmarks/question_selection.py) and costs far more than the incremental tracker.
+    return tracker.next_question(), tracker.count_distinct_diseases()
+
+
+def _wiki_page_ids(candidates):
+    wiki_page_ids = get_wikiPageIDs_of_diseases(list(candidates.values()))
+    return [wiki_page_ids[x] for x in candidates.values()]
+
+
+def build_diagnosis_pipeline(catalog):
+    """
+    Creates the pipeline of Home.py on top of the symptom catalog.
+
+    Inputs:
+    - symptom_list: IDs of the known symptoms.
+    - no_symptom_list: IDs of the excluded symptoms.
+    - entered_symptoms: IDs of the symptoms entered before the question loop.
+    """
+    pipeline = Pipeline()
+    pipeline.stage("possible symptoms", lambda known: get_all_possible_symptoms(catalog.uris(known)),
+                   inputs=("symptom_list",))
+    pipeline.stage("possible symptom ids",
+                   lambda possible: frozenset(catalog.id_of_label(x) for x in possible if x in catalog),
+                   deps=("possible symptoms",))
+    pipeline.stage("candidates", lambda known: get_diseases_by_symptoms(catalog.uris(known)),
+                   inputs=("symptom_list",))
+    pipeline.stage("disease list", lambda known: get_diseases_for_symptoms(catalog.uris(known)),
+                   inputs=("symptom_list",))
+    pipeline.stage("entered diseases", lambda entered: get_diseases_for_symptoms(catalog.uris(entered)),
+                   inputs=("entered_symptoms",))
+    pipeline.stage("symptom pairs", lambda diseases: catalog.encode_pairs(get_disease_symptom_pairs(diseases)),
+                   deps=("entered diseases",))
+    pipeline.stage("entropy", _build_tracker, deps=("symptom pairs",),
+                   inputs=("entered_symptoms", "symptom_list", "no_symptom_list"), update=_advance_tracker)
+    pipeline.stage("next question", _next_question, deps=("entropy",))
+    pipeline.stage("wiki page ids", _wiki_page_ids, deps=("candidates",))
+    pipeline.stage("symptom texts", get_symptom_texts, deps=("wiki page ids",))
+    return pipeline
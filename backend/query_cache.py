@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from backend import config
+
+DAY = 24 * 60 * 60
+
+# Time to live per query type in seconds. The DBpedia data only changes with a new release,
+# so everything is kept for a week unless listed here.
+DEFAULT_TTL = 7 * DAY
+QUERY_TYPE_TTLS = {
+    "all symptoms": 7 * DAY,
+    "possible symptoms": 3 * DAY,
+    "diseases by symptoms": 3 * DAY,
+    "diseases for symptoms": 3 * DAY,
+    "entropy": 3 * DAY,
+}
+
+
+def normalize_query(query):
+    """
+    Collapses all whitespace, so that queries differing only in indentation share an entry.
+    """
+    return " ".join(query.split())
+
+
+class QueryCache:
+    """
+    Two-tier cache for query results.
+
+    The first tier is a bounded in-process LRU, the second a SQLite file that survives
+    restarts. Entries are keyed by the hash of the normalized query text and expire after
+    the TTL of their query type. Errors of the disk tier are reported but never fail a query.
+
+    Args:
+    - path (str): Location of the SQLite file, None disables the disk tier.
+    - max_entries (int): Capacity of the in-process LRU.
+    - ttls (dict): Query type -> TTL in seconds.
+    - default_ttl (float): TTL of query types not listed in `ttls`.
+    """
+
+    def __init__(self, path, max_entries=512, ttls=None, default_ttl=DEFAULT_TTL):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttls = QUERY_TYPE_TTLS if ttls is None else ttls
+        self.default_ttl = default_ttl
+
+        self._memory = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._db = None
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+
+    def _connection(self):
+        if self._db is None and self.path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self._db = sqlite3.connect(self.path, check_same_thread=False)
+                self._db.execute("""
+                    CREATE TABLE IF NOT EXISTS query_cache (
+                        key TEXT PRIMARY KEY,
+                        query_type TEXT,
+                        expires_at REAL,
+                        value TEXT
+                    )
+                """)
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Query cache disk tier disabled: {e}")
+                self.path = None
+                self._db = None
+        return self._db
+
+    @staticmethod
+    def key(query):
+        return hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()
+
+    def _remember(self, key, expires_at, value):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, query):
+        """
+        Returns the cached result or None.
+        """
+        key = self.key(query)
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return entry[1]
+                del self._memory[key]
+
+            db = self._connection()
+            if db is not None:
+                try:
+                    row = db.execute("SELECT expires_at, value FROM query_cache WHERE key = ?", (key,)).fetchone()
+                    if row is not None and row[0] > now:
+                        value = json.loads(row[1])
+                        self._remember(key, row[0], value)
+                        self._stats["disk_hits"] += 1
+                        return value
+                    if row is not None:
+                        db.execute("DELETE FROM query_cache WHERE key = ?", (key,))
+                        db.commit()
+                except sqlite3.Error as e:
+                    print(f"Query cache read failed: {e}")
+
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, query, query_type, value):
+        key = self.key(query)
+        expires_at = time.time() + self.ttls.get(query_type, self.default_ttl)
+
+        with self._lock:
+            self._remember(key, expires_at, value)
+            self._stats["stores"] += 1
+
+            db = self._connection()
+            if db is not None:
+                try:
+                    db.execute("INSERT OR REPLACE INTO query_cache VALUES (?, ?, ?, ?)",
+                               (key, query_type, expires_at, json.dumps(value)))
+                    db.commit()
+                except sqlite3.Error as e:
+                    print(f"Query cache write failed: {e}")
+
+    def get_or_compute(self, query, query_type, compute):
+        """
+        Returns the cached result of the query or computes, stores and returns it.
+
+        The cached objects are shared, callers must not modify them.
+        """
+        value = self.get(query)
+        if value is None:
+            value = compute()
+            self.put(query, query_type, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            db = self._connection()
+            if db is not None:
+                db.execute("DELETE FROM query_cache")
+                db.commit()
+
+    def get_stats(self):
+        """
+        Returns the hit/miss counters and the hit rate.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        stats["memory_entries"] = len(self._memory)
+        return stats
+
+
+# Process-wide cache used by query_dbpedia
+query_cache = QueryCache(config.QUERY_CACHE_PATH, config.QUERY_CACHE_MAX_ENTRIES)
@@ -0,0 +1,172 @@
+import math
+from collections import Counter, defaultdict
+
+from backend.Entropy import binary_entropy
+
+# Default number of questions planned ahead and the number of first questions that are
+# expanded at each lookahead level.
+LOOKAHEAD_DEPTH = 2
+BEAM_WIDTH = 8
+
+# How the candidates change with an answer:
+# - NARROW: "Yes" keeps the diseases with the symptom, "No" the diseases without it.
+# - EXCLUDE: "Yes" keeps the diseases with the symptom, "No" only excludes the symptom, so
+#   diseases that differ only in it are no longer distinct (the question loop of Home.py).
+NARROW = "narrow"
+EXCLUDE = "exclude"
+
+
+def _plogp(n):
+    return n * math.log2(n) if n else 0.0
+
+
+def _scored_questions(rows, candidates, excluded):
+    """
+    Returns (information gain, symptom, count) for every symptom that splits the candidates,
+    best first and ties broken by symptom.
+    """
+    total = len(candidates)
+    counts = Counter(s for d in candidates for s in rows[d] if s not in excluded)
+    scored = [(binary_entropy(c, total), s, c) for s, c in counts.items() if 0 < c < total]
+    scored.sort(key=lambda x: (-x[0], x[1]))
+    return scored
+
+
+def _scored_questions_exclude(rows, candidates, excluded):
+    """
+    Returns (information gain, symptom, count, entropy after "Yes", entropy after "No") for
+    every symptom that splits the candidates under the EXCLUDE rule, best first and ties
+    broken by symptom.
+
+    The entropy is that of the distinct diseases (diseases with the same symptoms apart from
+    the excluded ones form one class), weighted by the number of diseases per class.
+    """
+    total = len(candidates)
+    classes = Counter(rows[d] - excluded for d in candidates)
+    terms = {signature: _plogp(n) for signature, n in classes.items()}
+    base = sum(terms.values())
+    entropy = math.log2(total) - base / total
+
+    # One pass over the classes: per symptom the number of diseases having it, the sum of
+    # n*log2(n) over its classes and the change of that sum when the symptom is excluded
+    # (every class having it merges with the class lacking only it)
+    counts = defaultdict(int)
+    yes_terms = defaultdict(float)
+    merged = defaultdict(float)
+    for signature, n in classes.items():
+        term = terms[signature]
+        for symptom in signature:
+            counts[symptom] += n
+            yes_terms[symptom] += term
+            rest = signature - {symptom}
+            if rest in classes:
+                merged[symptom] += _plogp(n + classes[rest]) - term - terms[rest]
+
+    scored = []
+    for symptom, count in counts.items():
+        if count >= total:
+            continue
+        h_yes = math.log2(count) - yes_terms[symptom] / count
+        h_no = math.log2(total) - (base + merged[symptom]) / total
+        gain = entropy - count / total * h_yes - (total - count) / total * h_no
+        scored.append((gain, symptom, count, h_yes, h_no))
+    scored.sort(key=lambda x: (-x[0], x[1]))
+    return scored
+
+
+def _plan(rows, candidates, excluded, depth, beam_width):
+    """
+    Returns (expected information gain in bits over `depth` questions, best first symptom).
+    """
+    total = len(candidates)
+    if total <= 1:
+        return 0.0, None
+
+    scored = _scored_questions(rows, candidates, excluded)
+    if not scored:
+        return 0.0, None
+    if depth == 1:
+        return scored[0][0], scored[0][1]
+
+    best_value, best_symptom = -1.0, None
+    for gain, symptom, count in scored[:beam_width]:
+        # Upper bound: each branch can gain at most one bit per remaining question and at
+        # most its own entropy (log2 of its size under the uniform prior).
+        bound = gain
+        for size in (count, total - count):
+            bound += size / total * min(depth - 1, math.log2(size))
+        if bound <= best_value:
+            continue
+
+        yes = [d for d in candidates if symptom in rows[d]]
+        no = [d for d in candidates if symptom not in rows[d]]
+        value = gain
+        for branch in (yes, no):
+            value += len(branch) / total * _plan(rows, branch, excluded | {symptom}, depth - 1, beam_width)[0]
+
+        if value > best_value:
+            best_value, best_symptom = value, symptom
+
+    return best_value, best_symptom
+
+
+def _plan_exclude(rows, candidates, excluded, depth, beam_width):
+    """
+    Like `_plan` under the EXCLUDE rule.
+    """
+    total = len(candidates)
+    if total <= 1:
+        return 0.0, None
+
+    scored = _scored_questions_exclude(rows, candidates, excluded)
+    if not scored:
+        return 0.0, None
+    if depth == 1:
+        return scored[0][0], scored[0][1]
+
+    best_value, best_symptom = -math.inf, None
+    for gain, symptom, count, h_yes, h_no in scored[:beam_width]:
+        # Upper bound: a branch can gain at most its own entropy
+        p_yes = count / total
+        if gain + p_yes * h_yes + (1 - p_yes) * h_no <= best_value:
+            continue
+
+        yes = [d for d in candidates if symptom in rows[d]]
+        value = gain
+        value += p_yes * _plan_exclude(rows, yes, excluded | {symptom}, depth - 1, beam_width)[0]
+        value += (1 - p_yes) * _plan_exclude(rows, candidates, excluded | {symptom}, depth - 1, beam_width)[0]
+
+        if value > best_value:
+            best_value, best_symptom = value, symptom
+
+    return best_value, best_symptom
+
+
+def select_question(disease_symptom_pairs, excluded=(), depth=LOOKAHEAD_DEPTH, beam_width=BEAM_WIDTH,
+                    rule=EXCLUDE):
+    """
+    Selects the next symptom to ask about by expected information gain.
+
+    All candidate diseases are assumed equally likely and a symptom is assumed to be present
+    exactly if the disease lists it. The candidates change with the answers as described by
+    `rule`. Under NARROW with `depth=1` the gain of a question is the binary entropy of the
+    split it causes, i.e. the value `calculate_entropy_for_all_symptoms` reports. Under
+    EXCLUDE the gain is the expected decrease of the entropy of the distinct diseases, which
+    is what the question loop of Home.py stops on. With `depth=2` the question that maximizes
+    the expected gain of itself plus the best follow-up question is chosen. Only the
+    `beam_width` best questions by immediate gain are expanded, and questions whose upper
+    bound cannot beat the best plan are pruned.
+
+    Args:
+    - disease_symptom_pairs (dict): A dictionary associating the candidate diseases with their symptoms.
+    - excluded (iterable): Symptoms that must not be asked (e.g. already excluded ones).
+    - depth (int): Number of questions to plan ahead.
+    - beam_width (int): Number of questions expanded per lookahead level.
+    - rule (str): NARROW or EXCLUDE.
+
+    Returns:
+    - The selected symptom, or None if no symptom splits the candidates.
+    """
+    rows = {d: frozenset(symptoms) for d, symptoms in disease_symptom_pairs.items()}
+    plan = _plan_exclude if rule == EXCLUDE else _plan
+    return plan(rows, list(rows), frozenset(excluded), depth, beam_width)[1]
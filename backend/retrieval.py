@@ -0,0 +1,194 @@
+import math
+import re
+from collections import Counter
+
+from backend import config
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+# Words that carry no information about symptoms in the prompts and chat history.
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from has have how i in is it its may not of on or other
+such that the their there these this to was were which with you your yes no don know
+""".split())
+
+# Words per chunk and words shared by neighbouring chunks.
+CHUNK_WORDS = 120
+CHUNK_OVERLAP = 20
+# Smallest share of the token budget a disease's chunk is cut to before diseases are dropped.
+MIN_CHUNK_TOKENS = 32
+
+
+def tokenize(text):
+    return [t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def estimate_tokens(text):
+    """
+    Rough LLM token count (about four characters per token for English text).
+    """
+    return (len(text) + 3) // 4
+
+
+def chunk_text(text, chunk_words=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    """
+    Splits a section into paragraphs and long paragraphs into overlapping word windows.
+    """
+    chunks = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        words = paragraph.split()
+        if not words:
+            continue
+        step = max(chunk_words - overlap, 1)
+        for start in range(0, len(words), step):
+            chunks.append(" ".join(words[start:start + chunk_words]))
+            if start + chunk_words >= len(words):
+                break
+    return chunks
+
+
+def truncate_chunk(title, chunk, tokens):
+    """
+    Returns the longest word prefix of a chunk whose "title: chunk" line fits into `tokens`.
+    """
+    text = ""
+    for word in chunk.split():
+        longer = f"{text} {word}" if text else word
+        if estimate_tokens(f"{title}: {longer}") > tokens:
+            break
+        text = longer
+    return text
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a list of token lists.
+
+    Args:
+    - documents (list): One token list per document.
+    - k1 (float): Term frequency saturation.
+    - b (float): Length normalization.
+    """
+
+    def __init__(self, documents, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_frequencies = [Counter(tokens) for tokens in documents]
+        self.lengths = [len(tokens) for tokens in documents]
+        self.average_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+
+        document_frequencies = Counter(term for tf in self.term_frequencies for term in tf)
+        n = len(documents)
+        self.idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in document_frequencies.items()}
+
+    def scores(self, query_tokens):
+        terms = [t for t in set(query_tokens) if t in self.idf]
+        scores = []
+        for tf, length in zip(self.term_frequencies, self.lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / self.average_length) if self.average_length else self.k1
+            score = 0.0
+            for term in terms:
+                f = tf.get(term)
+                if f:
+                    score += self.idf[term] * f * (self.k1 + 1) / (f + norm)
+            scores.append(score)
+        return scores
+
+    def top_k(self, query_tokens, k):
+        """
+        Returns the indices of the k best documents with a positive score, best first.
+        """
+        scores = self.scores(query_tokens)
+        ranked = sorted((i for i, score in enumerate(scores) if score > 0), key=lambda i: (-scores[i], i))
+        return ranked[:k]
+
+
+def build_query(known_symptoms, excluded_symptoms, chat_history):
+    """
+    Combines the known and excluded symptoms and the previous questions into one query text.
+    """
+    parts = list(known_symptoms) + list(excluded_symptoms)
+    parts += [h["question"] for h in chat_history]
+    return " ".join(parts)
+
+
+class SectionRetriever:
+    """
+    Selects the chunks of the disease symptom descriptions that are relevant for a prompt.
+
+    The index is built once per set of descriptions and can be queried for every prompt.
+
+    Args:
+    - descriptions (list): (disease title, symptom section text) tuples.
+    """
+
+    def __init__(self, descriptions):
+        self.descriptions = list(descriptions)
+        self.chunks = []
+        # Description position -> index of its first chunk
+        self.first_chunks = {}
+        for position, (title, text) in enumerate(self.descriptions):
+            for chunk in chunk_text(text or ""):
+                self.first_chunks.setdefault(position, len(self.chunks))
+                self.chunks.append((position, title, chunk))
+        # The disease title is indexed with every chunk so that questions naming it match
+        self.index = BM25Index([tokenize(f"{title} {chunk}") for _, title, chunk in self.chunks])
+
+    def retrieve(self, query, top_k=config.RETRIEVAL_TOP_K, token_budget=config.RETRIEVAL_TOKEN_BUDGET):
+        """
+        Returns the best matching chunks as (title, text) tuples, in the same shape as the
+        full descriptions. Every disease keeps one chunk (its best match, or its first chunk if
+        no chunk matches the query), so no candidate drops out of the prompt. If these chunks
+        alone exceed the token budget, each is cut to an equal share of it; if the share would
+        be smaller than MIN_CHUNK_TOKENS, the lowest-ranked diseases (those without a match
+        last) are dropped. Further chunks are added best first as long as they fit into the
+        token budget. The chunks are merged per disease in their original order.
+
+        Args:
+        - query (str): Query text, see `build_query`.
+        - top_k (int): Maximum number of chunks in addition to one per disease.
+        - token_budget (int): Maximum estimated tokens of the selected chunks.
+
+        Returns:
+        - list: (title, text) tuples.
+        """
+        ranked = self.index.top_k(tokenize(query), top_k)
+        best = {}
+        for i in ranked:
+            best.setdefault(self.chunks[i][0], i)
+        # One chunk per disease, the diseases with the best matches first
+        floor = list(best.values()) + [i for position, i in self.first_chunks.items() if position not in best]
+        texts = {i: self.chunks[i][2] for i in floor}
+        used = sum(estimate_tokens("{1}: {2}".format(*self.chunks[i])) for i in floor)
+
+        if used > token_budget:
+            keep = min(len(floor), max(token_budget // MIN_CHUNK_TOKENS, 1))
+            share = token_budget // keep
+            print(f"Prompt context: one chunk per disease needs {used} tokens (budget {token_budget}), "
+                  f"cutting the chunks of {keep}/{len(floor)} diseases to {share} tokens")
+            floor = floor[:keep]
+            texts = {i: truncate_chunk(self.chunks[i][1], self.chunks[i][2], share) for i in floor}
+            floor = [i for i in floor if texts[i]]
+            used = sum(estimate_tokens(f"{self.chunks[i][1]}: {texts[i]}") for i in floor)
+
+        selected = list(floor)
+        for i in ranked:
+            if i in texts:
+                continue
+            _, title, chunk = self.chunks[i]
+            size = estimate_tokens(f"{title}: {chunk}")
+            if used + size > token_budget:
+                continue
+            selected.append(i)
+            texts[i] = chunk
+            used += size
+
+        merged = {}
+        for i in sorted(selected):
+            position, title, _ = self.chunks[i]
+            merged.setdefault(position, (title, []))[1].append(texts[i])
+        result = [(title, " ... ".join(chunks)) for _, (title, chunks) in sorted(merged.items())]
+
+        before = estimate_tokens(str(self.descriptions))
+        after = estimate_tokens(str(result))
+        print(f"Prompt context: {before} -> {after} tokens ({len(selected)}/{len(self.chunks)} chunks)")
+        return result
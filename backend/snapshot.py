@@ -0,0 +1,143 @@
+import gzip
+import json
+from functools import cached_property
+
+from backend.closure import build_closure, find_cycles
+from backend.symptom_index import SymptomIndex
+
+SNAPSHOT_FORMAT = 2
+
+
+class KnowledgeGraph:
+    """
+    In-memory copy of the DBpedia disease-symptom graph.
+
+    Every resource taking part in a `dbo:symptom` edge gets an integer ID. The IDs are
+    assigned in URI order, so sorting by ID is the same as sorting by URI.
+
+    Args:
+    - resources (list): Resource URIs, indexed by ID.
+    - labels (list): For every resource the list of its English labels.
+    - symptoms (list): For every resource the IDs of its direct `dbo:symptom` objects.
+    - medline_ids (dict): Resource ID -> `dbo:medlinePlus` value.
+    - wiki_page_ids (dict): Resource ID -> `dbo:wikiPageID` value.
+    - closure (list): Optional precomputed `dbo:symptom+` closure (see `closure.build_closure`).
+    - cycles (list): Optional precomputed cycles (see `closure.find_cycles`).
+    """
+
+    def __init__(self, resources, labels, symptoms, medline_ids, wiki_page_ids, closure=None, cycles=None):
+        self.resources = resources
+        self.ids = {uri: i for i, uri in enumerate(resources)}
+        self.labels = labels
+        self.symptoms = [tuple(x) for x in symptoms]
+        self.medline_ids = medline_ids
+        self.wiki_page_ids = wiki_page_ids
+
+        # Resources that have at least one symptom (the subjects of `dbo:symptom`) ...
+        self.disease_ids = [i for i, x in enumerate(self.symptoms) if x]
+        # ... and the resources that are used as a symptom (the objects of `dbo:symptom`).
+        self.symptom_ids = sorted({s for x in self.symptoms for s in x})
+
+        # Transitive closure of `dbo:symptom`: resource ID -> {reachable ID: path depth}
+        self.closure = closure if closure is not None else build_closure(self.symptoms)
+        self.cycles = cycles if cycles is not None else find_cycles(self.symptoms)
+        self._transitive = [tuple(sorted(x)) for x in self.closure]
+
+    def direct_symptoms(self, resource_id):
+        """
+        Returns the IDs of the direct `dbo:symptom` objects, sorted by ID.
+        """
+        return self.symptoms[resource_id]
+
+    def transitive_symptoms(self, resource_id):
+        """
+        Returns the IDs of all resources reachable via `dbo:symptom+`, sorted by ID.
+        """
+        return self._transitive[resource_id]
+
+    def symptom_depth(self, resource_id, symptom_id):
+        """
+        Returns the length of the shortest `dbo:symptom` path between two resources, or None.
+        """
+        return self.closure[resource_id].get(symptom_id)
+
+    @cached_property
+    def direct_index(self):
+        """
+        Inverted index over the direct `dbo:symptom` edges.
+        """
+        return SymptomIndex({d: self.symptoms[d] for d in self.disease_ids})
+
+    @cached_property
+    def transitive_index(self):
+        """
+        Inverted index over `dbo:symptom+`.
+        """
+        return SymptomIndex({d: self.transitive_symptoms(d) for d in self.disease_ids})
+
+    def to_dict(self):
+        return {
+            "format": SNAPSHOT_FORMAT,
+            "resources": self.resources,
+            "labels": self.labels,
+            "symptoms": [list(x) for x in self.symptoms],
+            "medline_ids": {str(k): v for k, v in self.medline_ids.items()},
+            "wiki_page_ids": {str(k): v for k, v in self.wiki_page_ids.items()},
+            # Flattened as [target, depth, target, depth, ...] per resource
+            "closure": [[v for item in sorted(x.items()) for v in item] for x in self.closure],
+            "cycles": self.cycles,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        # Format 1 snapshots have no stored closure, it is computed while loading
+        if data.get("format") not in (1, SNAPSHOT_FORMAT):
+            raise ValueError(f"Unsupported snapshot format: {data.get('format')}")
+        closure = None
+        if "closure" in data:
+            closure = [dict(zip(x[::2], x[1::2])) for x in data["closure"]]
+        return cls(
+            data["resources"],
+            data["labels"],
+            data["symptoms"],
+            {int(k): v for k, v in data["medline_ids"].items()},
+            {int(k): int(v) for k, v in data["wiki_page_ids"].items()},
+            closure,
+            data.get("cycles"),
+        )
+
+    @classmethod
+    def from_edges(cls, edges, labels, medline_ids, wiki_page_ids):
+        """
+        Builds the graph from URI based data as returned by DBpedia.
+
+        Args:
+        - edges (iterable): (disease URI, symptom URI) pairs of `dbo:symptom`.
+        - labels (dict): URI -> list of English labels.
+        - medline_ids (dict): URI -> `dbo:medlinePlus` value.
+        - wiki_page_ids (dict): URI -> `dbo:wikiPageID` value.
+        """
+        edges = list(edges)
+        resources = sorted({uri for edge in edges for uri in edge})
+        ids = {uri: i for i, uri in enumerate(resources)}
+
+        symptoms = [set() for _ in resources]
+        for disease, symptom in edges:
+            symptoms[ids[disease]].add(ids[symptom])
+
+        return cls(
+            resources,
+            [list(labels.get(uri, [])) for uri in resources],
+            [sorted(x) for x in symptoms],
+            {ids[uri]: v for uri, v in medline_ids.items() if uri in ids},
+            {ids[uri]: int(v) for uri, v in wiki_page_ids.items() if uri in ids},
+        )
+
+    def save(self, path):
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
@@ -0,0 +1,112 @@
+import os
+import sys
+import time
+
+from backend.config import SNAPSHOT_PATH
+from backend.dbpedia_handler import query_dbpedia
+from backend.snapshot import KnowledgeGraph
+
+# DBpedia returns at most 10000 rows per request, so every export query is paged.
+PAGE_SIZE = 10000
+# The export queries are much larger than the interactive ones.
+EXPORT_TIMEOUT = 120
+
+
+def query_all_pages(inner_query, order_by, query_type):
+    """
+    Runs a SELECT query page by page until the endpoint returns a short page.
+
+    The inner query is wrapped in an ordered sub-select, which keeps the pages stable
+    on Virtuoso even for large offsets.
+    """
+    rows = []
+    offset = 0
+    while True:
+        query = f"""
+            SELECT * WHERE {{
+                {{ {inner_query} ORDER BY {order_by} }}
+            }}
+            LIMIT {PAGE_SIZE} OFFSET {offset}
+        """
+        page = query_dbpedia(query, query_type, EXPORT_TIMEOUT, use_cache=False)
+        rows.extend(page)
+        print(f"{query_type}: {len(rows)} rows")
+        if len(page) < PAGE_SIZE:
+            return rows
+        offset += PAGE_SIZE
+
+
+def build_snapshot():
+    """
+    Exports the complete `dbo:symptom` graph from DBpedia.
+
+    Returns:
+    - KnowledgeGraph: The graph with all edges, English labels, MedlinePlus IDs and wiki page IDs.
+    """
+    edges = query_all_pages("""
+        SELECT DISTINCT ?disease ?symptom
+        WHERE {
+            ?disease dbo:symptom ?symptom.
+            FILTER isIRI(?symptom)
+        }
+    """, "?disease ?symptom", "symptom edges")
+
+    label_rows = query_all_pages("""
+        SELECT DISTINCT ?resource ?label
+        WHERE {
+            { ?resource dbo:symptom ?other. } UNION { ?other dbo:symptom ?resource. }
+            ?resource rdfs:label ?label.
+            FILTER langMatches(lang(?label), "en")
+        }
+    """, "?resource ?label", "labels")
+
+    medline_rows = query_all_pages("""
+        SELECT DISTINCT ?disease ?medlineId
+        WHERE {
+            ?disease dbo:symptom ?symptom.
+            ?disease dbo:medlinePlus ?medlineId.
+        }
+    """, "?disease ?medlineId", "medline IDs")
+
+    wiki_rows = query_all_pages("""
+        SELECT DISTINCT ?disease ?wikiPageID
+        WHERE {
+            ?disease dbo:symptom ?symptom.
+            ?disease dbo:wikiPageID ?wikiPageID.
+        }
+    """, "?disease ?wikiPageID", "wiki page IDs")
+
+    labels = {}
+    for x in label_rows:
+        labels.setdefault(x["resource"]["value"], []).append(x["label"]["value"])
+
+    # get_medline_id_of_disease / get_wikiPageID_of_disease only use the first value
+    medline_ids = {}
+    for x in medline_rows:
+        medline_ids.setdefault(x["disease"]["value"], x["medlineId"]["value"])
+
+    wiki_page_ids = {}
+    for x in wiki_rows:
+        wiki_page_ids.setdefault(x["disease"]["value"], x["wikiPageID"]["value"])
+
+    return KnowledgeGraph.from_edges(
+        ((x["disease"]["value"], x["symptom"]["value"]) for x in edges),
+        labels,
+        medline_ids,
+        wiki_page_ids,
+    )
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else SNAPSHOT_PATH
+    start = time.time()
+    graph = build_snapshot()
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    graph.save(path)
+
+    print(f"Resources: {len(graph.resources)}, diseases: {len(graph.disease_ids)}, "
+          f"symptoms: {len(graph.symptom_ids)}")
+    for cycle in graph.cycles:
+        print("Cycle in dbo:symptom between:", ", ".join(graph.resources[i] for i in cycle))
+    print(f"Snapshot written to {path} ({os.path.getsize(path) / 1024:.0f} KiB) in {time.time() - start:.1f}s")
@@ -0,0 +1,123 @@
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from backend import config
+from backend.tracing import current_span
+
+# Server side errors and rate limiting are worth retrying, anything else (e.g. a syntax error) is not.
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class SparqlQueryError(Exception):
+    pass
+
+
+class RetryableQueryError(SparqlQueryError):
+    pass
+
+
+class SparqlClient:
+    """
+    Shared SPARQL client with a pooled keep-alive HTTP session.
+
+    Each request has a timeout. Connection errors, timeouts and retryable status codes
+    are retried with exponential backoff and full jitter, everything else fails
+    immediately. Latencies are collected per query type.
+
+    Args:
+    - endpoint (str): URL of the SPARQL endpoint.
+    - timeout (float): Timeout in seconds per request.
+    - max_attempts (int): Number of attempts for retryable errors.
+    - backoff_base (float): Upper bound of the first backoff in seconds, doubled on every retry.
+    - backoff_max (float): Maximum backoff in seconds.
+    - pool_size (int): Maximum number of kept-alive connections.
+    """
+
+    def __init__(self, endpoint=config.DBPEDIA_ENDPOINT, timeout=config.SPARQL_TIMEOUT,
+                 max_attempts=config.SPARQL_MAX_ATTEMPTS, backoff_base=0.5, backoff_max=8.0, pool_size=10):
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["Accept"] = "application/sparql-results+json"
+
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _record(self, query_type, elapsed=None, retries=0, failed=False):
+        span = current_span()
+        if span is not None:
+            span.set_retries(retries)
+
+        with self._stats_lock:
+            stats = self._stats.setdefault(query_type, {
+                "count": 0, "errors": 0, "retries": 0, "total_time": 0.0, "max_time": 0.0, "last_time": 0.0})
+            stats["retries"] += retries
+            if failed:
+                stats["errors"] += 1
+            else:
+                stats["count"] += 1
+                stats["total_time"] += elapsed
+                stats["max_time"] = max(stats["max_time"], elapsed)
+                stats["last_time"] = elapsed
+
+    def query(self, query, query_type="generic", timeout=None):
+        """
+        Executes a SELECT query.
+
+        Returns:
+        - list: The result bindings.
+        """
+        for attempt in range(self.max_attempts):
+            start = time.perf_counter()
+            try:
+                # POST keeps long VALUES queries out of the URL
+                response = self.session.post(self.endpoint, data={"query": query},
+                                             timeout=timeout or self.timeout)
+                if response.status_code in RETRYABLE_STATUS_CODES:
+                    raise RetryableQueryError(f"HTTP {response.status_code}")
+                response.raise_for_status()
+                results = response.json()["results"]["bindings"]
+                span = current_span()
+                if span is not None:
+                    span.add_payload(len(response.content))
+            except (requests.ConnectionError, requests.Timeout, RetryableQueryError) as e:
+                print(f"Attempt {attempt + 1} failed for {query_type} query: {e}")
+                if attempt + 1 < self.max_attempts:
+                    time.sleep(self._backoff(attempt))
+                continue
+            except Exception:
+                self._record(query_type, retries=attempt, failed=True)
+                raise
+
+            elapsed = time.perf_counter() - start
+            self._record(query_type, elapsed, retries=attempt)
+            print(f"{query_type} query: {elapsed * 1000:.0f} ms, {len(results)} rows")
+            return results
+
+        self._record(query_type, retries=self.max_attempts - 1, failed=True)
+        raise SparqlQueryError(f"Failed to execute {query_type} query after {self.max_attempts} attempts")
+
+    def get_stats(self):
+        """
+        Returns the per query type statistics (count, errors, retries, total/max/last time in seconds).
+        """
+        with self._stats_lock:
+            return {k: dict(v) for k, v in self._stats.items()}
+
+
+# Process-wide client used by all DBpedia queries
+client = SparqlClient()
@@ -0,0 +1,124 @@
+import threading
+
+from backend.llm_scheduler import RequestControl
+
+
+class Generation:
+    """
+    Streams one LLM completion into a token buffer on a background thread.
+
+    The buffer can be replayed with `stream()` at any time: tokens that are already generated
+    are returned immediately, the rest as they arrive. `cancel()` removes the request from the
+    LLM scheduler's queue or, once it runs, stops consuming the LLM stream, which closes the
+    connection to the model server and ends the generation there. `promote()` moves the
+    request to a higher priority of the scheduler.
+
+    Args:
+    - llm: A LangChain LLM with a `stream(prompt)` method.
+    - prompt (str): The prompt to complete.
+    """
+
+    def __init__(self, llm, prompt):
+        self.prompt = prompt
+        self.done = False
+        self.error = None
+        self._tokens = []
+        self._condition = threading.Condition()
+        self._cancelled = threading.Event()
+        self._control = RequestControl()
+        self._thread = threading.Thread(target=self._run, args=(llm,), daemon=True)
+        self._thread.start()
+
+    def _run(self, llm):
+        try:
+            with self._control.bind():
+                for token in llm.stream(self.prompt):
+                    if self._cancelled.is_set():
+                        break
+                    with self._condition:
+                        self._tokens.append(token)
+                        self._condition.notify_all()
+        except Exception as e:
+            if not self._cancelled.is_set():
+                print(f"Error during generation: {e}")
+            self.error = e
+        finally:
+            with self._condition:
+                self.done = True
+                self._condition.notify_all()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+        self._control.cancel()
+
+    def promote(self, priority):
+        self._control.promote(priority)
+
+    def stream(self):
+        """
+        Yields all tokens of the completion, starting with the buffered ones.
+
+        Raises the error of the generation, if there was one, after the last token.
+        """
+        position = 0
+        while True:
+            with self._condition:
+                while position >= len(self._tokens) and not self.done:
+                    self._condition.wait()
+                tokens = self._tokens[position:]
+                finished = self.done and position + len(tokens) >= len(self._tokens)
+            position += len(tokens)
+            yield from tokens
+            if finished:
+                break
+        if self.error is not None:
+            raise self.error
+
+    def result(self):
+        """
+        Waits for the generation to finish and returns the complete text.
+        """
+        self._thread.join()
+        return "".join(self._tokens)
+
+
+def speculate(llm, prompts):
+    """
+    Starts one background generation per possible answer.
+
+    Args:
+    - llm: A LangChain LLM with a `stream(prompt)` method.
+    - prompts (dict): Answer -> prompt that would follow this answer.
+
+    Returns:
+    - dict: Answer -> Generation.
+    """
+    return {answer: Generation(llm, prompt) for answer, prompt in prompts.items()}
+
+
+def take(generations, answer, priority=None):
+    """
+    Returns the generation for the given answer and cancels all other branches.
+
+    Args:
+    - generations (dict): Answer -> Generation, as returned by `speculate`.
+    - answer (str): The answer the user gave.
+    - priority (int): Scheduler priority the chosen generation is promoted to, as the user
+      now waits for it (None keeps its priority).
+    """
+    for key, generation in generations.items():
+        if key != answer:
+            generation.cancel()
+    chosen = generations.get(answer)
+    if chosen is not None and priority is not None:
+        chosen.promote(priority)
+    return chosen
+
+
+def cancel_all(generations):
+    for generation in generations.values():
+        generation.cancel()
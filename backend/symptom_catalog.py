@@ -0,0 +1,97 @@
+import threading
+from types import MappingProxyType
+
+from backend.dbpedia_handler import get_all_symptoms
+
+
+class SymptomCatalog:
+    """
+    Immutable mapping between symptom labels, symptom URIs and small integer IDs.
+
+    Every label gets one ID (labels sorted alphabetically). A URI with several labels maps
+    to the ID of its first label, so IDs can be used wherever the URIs were used before.
+
+    Args:
+    - symptom_dict (dict): Label -> URI, as returned by `get_all_symptoms`.
+    """
+
+    __slots__ = ("_labels", "_uris", "_label_ids", "_uri_ids")
+
+    def __init__(self, symptom_dict):
+        labels = tuple(sorted(symptom_dict))
+        uris = tuple(symptom_dict[label] for label in labels)
+        uri_ids = {}
+        for symptom_id, uri in enumerate(uris):
+            uri_ids.setdefault(uri, symptom_id)
+
+        self._labels = labels
+        self._uris = uris
+        self._label_ids = MappingProxyType({label: i for i, label in enumerate(labels)})
+        self._uri_ids = MappingProxyType(uri_ids)
+
+    def __len__(self):
+        return len(self._labels)
+
+    def __contains__(self, label):
+        return label in self._label_ids
+
+    def label(self, symptom_id):
+        return self._labels[symptom_id]
+
+    def uri(self, symptom_id):
+        return self._uris[symptom_id]
+
+    def id_of_label(self, label):
+        return self._label_ids[label]
+
+    def id_of_uri(self, uri):
+        """
+        Returns the ID of the URI, None if the URI has no English label.
+        """
+        return self._uri_ids.get(uri)
+
+    def labels(self, symptom_ids):
+        return [self._labels[i] for i in symptom_ids]
+
+    def uris(self, symptom_ids):
+        return [self._uris[i] for i in symptom_ids]
+
+    def ids_of_labels(self, labels):
+        return [self._label_ids[label] for label in labels]
+
+    def encode_pairs(self, disease_symptom_pairs):
+        """
+        Replaces the symptom URIs of disease-symptom pairs by their IDs.
+
+        Symptoms without a label are dropped, they cannot be asked in the question loop.
+        """
+        uri_ids = self._uri_ids
+        return {
+            disease: [uri_ids[uri] for uri in symptoms if uri in uri_ids]
+            for disease, symptoms in disease_symptom_pairs.items()
+        }
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """
+    Returns the process-wide symptom catalog, building it on first use.
+
+    An empty catalog (e.g. because DBpedia could not be reached) is not kept, so the next
+    call tries again.
+    """
+    global _catalog
+
+    if _catalog is not None:
+        return _catalog
+
+    with _catalog_lock:
+        if _catalog is None:
+            catalog = SymptomCatalog(get_all_symptoms())
+            if len(catalog) == 0:
+                return catalog
+            _catalog = catalog
+    return _catalog
@@ -0,0 +1,62 @@
+def iter_bits(bitset):
+    """
+    Yields the positions of all set bits of an integer bitset in ascending order.
+    """
+    while bitset:
+        lowest = bitset & -bitset
+        yield lowest.bit_length() - 1
+        bitset ^= lowest
+
+
+class SymptomIndex:
+    """
+    Inverted index from symptoms to the diseases that have them.
+
+    Both directions are stored as Python integers used as bitsets: every symptom has a
+    bitset over the disease positions (posting list) and every disease has a bitset over
+    its symptoms (row). "Diseases having all of these symptoms" is then an AND over the
+    posting lists and "all symptoms of these diseases" an OR over their rows.
+
+    Args:
+    - rows (dict): Disease ID -> iterable of symptom IDs. Symptom IDs must be non-negative integers.
+    """
+
+    def __init__(self, rows):
+        self.disease_ids = list(rows)
+        self.positions = {d: i for i, d in enumerate(self.disease_ids)}
+        self.all_diseases = (1 << len(self.disease_ids)) - 1
+
+        self.rows = []
+        self.postings = {}
+        for position, disease in enumerate(self.disease_ids):
+            row = 0
+            for symptom in rows[disease]:
+                row |= 1 << symptom
+                self.postings[symptom] = self.postings.get(symptom, 0) | (1 << position)
+            self.rows.append(row)
+
+    def diseases_with_all(self, symptom_ids):
+        """
+        Returns the bitset of diseases that have every given symptom.
+        """
+        bitset = self.all_diseases
+        for symptom in symptom_ids:
+            bitset &= self.postings.get(symptom, 0)
+            if not bitset:
+                break
+        return bitset
+
+    def symptoms_of(self, disease_bitset):
+        """
+        Returns the bitset of all symptoms of the given diseases.
+        """
+        bitset = 0
+        for position in iter_bits(disease_bitset):
+            bitset |= self.rows[position]
+        return bitset
+
+    def disease_list(self, disease_bitset):
+        """
+        Converts a disease bitset back to disease IDs, in index order.
+        """
+        return [self.disease_ids[i] for i in iter_bits(disease_bitset)]
@@ -0,0 +1,145 @@
+import heapq
+import re
+import threading
+from bisect import bisect_left
+from collections import Counter
+from itertools import islice
+
+from backend.symptom_catalog import get_catalog
+
+# Minimum trigram similarity (Dice coefficient) of a match without a prefix hit.
+MIN_SIMILARITY = 0.3
+# Number of results shown in the symptom picker.
+SEARCH_RESULTS = 20
+# Score added per prefix bonus point, and the prefix length from which it is added in full.
+# Shorter prefixes match many labels and get a proportionally smaller bonus.
+PREFIX_WEIGHT = 0.15
+PREFIX_FULL_LENGTH = 4
+
+_WORD = re.compile(r"\w+")
+
+
+def normalize(text):
+    return " ".join(_WORD.findall(text.casefold()))
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SymptomSearchIndex:
+    """
+    Search index over the symptom labels for the symptom picker.
+
+    Labels are matched by prefix (of the whole label or of one of its words) and, for typo
+    tolerance, by the share of common character trigrams. Results are ranked by trigram
+    similarity plus a prefix bonus (whole label > first word > other word) that grows with
+    the length of the typed prefix, then alphabetically. A short prefix therefore only
+    decides between labels of similar similarity and does not push close typo matches of
+    the whole query down.
+
+    Args:
+    - labels (list): The labels, the position of a label is its ID (see SymptomCatalog).
+    """
+
+    def __init__(self, labels):
+        self.labels = list(labels)
+        self.normalized = [normalize(label) for label in self.labels]
+        self.trigram_counts = []
+        self.postings = {}
+        words = []
+        for symptom_id, text in enumerate(self.normalized):
+            grams = trigrams(text)
+            self.trigram_counts.append(len(grams))
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(symptom_id)
+            for position, word in enumerate(text.split()):
+                words.append((word, position, symptom_id))
+        words.sort()
+        self._words = [word for word, _, _ in words]
+        self._word_hits = [(position, symptom_id) for _, position, symptom_id in words]
+
+    @classmethod
+    def from_catalog(cls, catalog):
+        return cls(catalog.labels(range(len(catalog))))
+
+    def _prefix_hits(self, prefix):
+        # Word prefix -> best bonus per label (2 for the first word, 1 for any other word)
+        hits = {}
+        start = bisect_left(self._words, prefix)
+        for i in range(start, len(self._words)):
+            if not self._words[i].startswith(prefix):
+                break
+            position, symptom_id = self._word_hits[i]
+            hits[symptom_id] = max(hits.get(symptom_id, 0), 2 if position == 0 else 1)
+        return hits
+
+    def search(self, query, k=SEARCH_RESULTS, allowed=None, exclude=()):
+        """
+        Returns the IDs of the best matching labels.
+
+        Args:
+        - query (str): The text typed by the user.
+        - k (int): Maximum number of results.
+        - allowed (set): Only these IDs are returned (e.g. the currently possible symptoms), None for all.
+        - exclude (iterable): IDs that are never returned (e.g. the already selected symptoms).
+        """
+        exclude = set(exclude)
+
+        def accepted(symptom_id):
+            return symptom_id not in exclude and (allowed is None or symptom_id in allowed)
+
+        text = normalize(query)
+        if not text:
+            # IDs are in alphabetical order of the labels
+            if allowed is None or len(allowed) * 8 > len(self.labels):
+                ids = range(len(self.labels))
+            else:
+                ids = sorted(allowed)
+            return list(islice((x for x in ids if accepted(x)), k))
+
+        # The last word may still be incomplete, the previous words are matched by trigrams.
+        # One or two characters are too short for typo tolerance, only prefixes are matched.
+        last_word = text.split()[-1]
+        prefix_hits = self._prefix_hits(last_word)
+        query_grams = trigrams(text)
+        shared = Counter()
+        if len(text) >= 3:
+            for gram in query_grams:
+                shared.update(self.postings.get(gram, ()))
+
+        scored = []
+        for symptom_id in set(shared).union(prefix_hits):
+            if not accepted(symptom_id):
+                continue
+            similarity = 2 * shared[symptom_id] / (len(query_grams) + self.trigram_counts[symptom_id])
+            bonus = prefix_hits.get(symptom_id, 0) * PREFIX_WEIGHT * min(len(last_word) / PREFIX_FULL_LENGTH, 1)
+            if self.normalized[symptom_id].startswith(text):
+                bonus = 3 * PREFIX_WEIGHT * min(len(text) / PREFIX_FULL_LENGTH, 1)
+            if bonus or similarity >= MIN_SIMILARITY:
+                scored.append((-(similarity + bonus), self.normalized[symptom_id], symptom_id))
+        return [x[2] for x in heapq.nsmallest(k, scored)]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_search_index():
+    """
+    Returns the process-wide search index over the labels of the symptom catalog.
+    """
+    global _index
+
+    if _index is not None:
+        return _index
+
+    with _index_lock:
+        if _index is None:
+            index = SymptomSearchIndex.from_catalog(get_catalog())
+            # An empty catalog is not kept, see get_catalog
+            if not index.labels:
+                return index
+            _index = index
+    return _index
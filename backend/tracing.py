@@ -0,0 +1,264 @@
+"""
+Lightweight tracing of the pipeline stages.
+
+Stages are timed with spans:
+
+    with span("medline/article") as s:
+        ...
+        s.add_payload(len(content))
+
+or with the `traced` decorator. Per stage the tracer keeps a latency histogram, the error
+count, the payload size and the retry count; code further down (e.g. the SPARQL client)
+can annotate the active span with `current_span()`. The metrics are available as a dict
+(`get_stats`) and in the Prometheus text format (`prometheus_text`).
+"""
+import contextvars
+import functools
+import os
+import threading
+import time
+from collections import deque
+
+from backend import config
+
+# Upper bounds of the latency histogram buckets in seconds.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Number of finished spans kept for the diagnostics panel and of durations per stage kept
+# for the percentiles.
+RECENT_SPANS = 200
+SAMPLES = 500
+
+_current = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("stage", "started_at", "duration", "payload", "retries", "error", "attributes")
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.started_at = time.time()
+        self.duration = 0.0
+        self.payload = 0
+        self.retries = 0
+        self.error = None
+        self.attributes = {}
+
+    def add_payload(self, size):
+        self.payload += size
+
+    def set_retries(self, retries):
+        self.retries = retries
+
+
+def current_span():
+    """
+    Returns the innermost active span of the current thread/context, or None.
+    """
+    return _current.get()
+
+
+class _StageStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.payload = 0
+        self.retries = 0
+        self.buckets = [0] * len(BUCKETS)
+        self.samples = deque(maxlen=SAMPLES)
+
+
+class Tracer:
+    """
+    Collects the spans of all sessions of the process.
+
+    Args:
+    - metrics_path (str): If set, the Prometheus metrics are written to this file after a
+      span, at most every `metrics_interval` seconds.
+    - metrics_interval (float): Minimum seconds between two writes of the metrics file.
+    """
+
+    def __init__(self, metrics_path=None, metrics_interval=15):
+        self.metrics_path = metrics_path
+        self.metrics_interval = metrics_interval
+        self._stages = {}
+        self._recent = deque(maxlen=RECENT_SPANS)
+        self._lock = threading.Lock()
+        self._last_write = 0.0
+
+    def span(self, stage, activate=True):
+        """
+        Context manager timing one stage.
+
+        With `activate=False` the span is not made the current span; this is required when
+        the span is opened inside a generator that is consumed somewhere else.
+        """
+        return _SpanContext(self, stage, activate)
+
+    def record(self, span):
+        with self._lock:
+            stats = self._stages.get(span.stage)
+            if stats is None:
+                stats = self._stages[span.stage] = _StageStats()
+            stats.count += 1
+            stats.total += span.duration
+            stats.max = max(stats.max, span.duration)
+            stats.payload += span.payload
+            stats.retries += span.retries
+            stats.samples.append(span.duration)
+            if span.error is not None:
+                stats.errors += 1
+            for i, bound in enumerate(BUCKETS):
+                if span.duration <= bound:
+                    stats.buckets[i] += 1
+                    break
+            self._recent.append(span)
+
+            write = self.metrics_path and time.monotonic() - self._last_write >= self.metrics_interval
+            if write:
+                self._last_write = time.monotonic()
+        if write:
+            self.write_metrics(self.metrics_path)
+
+    def observe(self, stage, seconds, payload=0):
+        """
+        Records a duration measured elsewhere (e.g. the time to the first token).
+        """
+        span = Span(stage)
+        span.duration = seconds
+        span.payload = payload
+        self.record(span)
+
+    def get_stats(self):
+        """
+        Returns stage -> count, errors, average/p50/p95/max latency in seconds, payload and retries.
+        """
+        with self._lock:
+            stages = {name: (s.count, s.errors, s.total, s.max, s.payload, s.retries, sorted(s.samples))
+                      for name, s in self._stages.items()}
+        result = {}
+        for name, (count, errors, total, maximum, payload, retries, samples) in sorted(stages.items()):
+            result[name] = {
+                "count": count,
+                "errors": errors,
+                "avg": total / count if count else 0.0,
+                "p50": samples[int(0.5 * (len(samples) - 1))] if samples else 0.0,
+                "p95": samples[int(0.95 * (len(samples) - 1))] if samples else 0.0,
+                "max": maximum,
+                "payload": payload,
+                "retries": retries,
+            }
+        return result
+
+    def recent(self):
+        """
+        Returns the last finished spans, newest first.
+        """
+        with self._lock:
+            return list(reversed(self._recent))
+
+    def prometheus_text(self):
+        """
+        Returns all metrics in the Prometheus text exposition format.
+        """
+        with self._lock:
+            stages = sorted(self._stages.items())
+            lines = [
+                "# HELP healthcare_stage_duration_seconds Latency of the traced stages.",
+                "# TYPE healthcare_stage_duration_seconds histogram",
+            ]
+            for name, stats in stages:
+                cumulative = 0
+                for bound, count in zip(BUCKETS, stats.buckets):
+                    cumulative += count
+                    lines.append(f'healthcare_stage_duration_seconds_bucket{{stage="{name}",le="{bound:g}"}} {cumulative}')
+                lines.append(f'healthcare_stage_duration_seconds_bucket{{stage="{name}",le="+Inf"}} {stats.count}')
+                lines.append(f'healthcare_stage_duration_seconds_sum{{stage="{name}"}} {stats.total:.6f}')
+                lines.append(f'healthcare_stage_duration_seconds_count{{stage="{name}"}} {stats.count}')
+
+            for metric, help_text, attribute in (
+                    ("healthcare_stage_errors_total", "Failed calls of the traced stages.", "errors"),
+                    ("healthcare_stage_payload_bytes_total", "Payload size of the traced stages.", "payload"),
+                    ("healthcare_stage_retries_total", "Retries of the traced stages.", "retries")):
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} counter")
+                for name, stats in stages:
+                    lines.append(f'{metric}{{stage="{name}"}} {getattr(stats, attribute)}')
+        return "\n".join(lines) + "\n"
+
+    def write_metrics(self, path):
+        # Written to a temporary file first, so a scraper never reads a partial file
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            temporary = f"{path}.tmp"
+            with open(temporary, "w", encoding="utf-8") as f:
+                f.write(self.prometheus_text())
+            os.replace(temporary, path)
+        except OSError as e:
+            print(f"Writing the metrics failed: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._stages.clear()
+            self._recent.clear()
+
+
+class _SpanContext:
+    def __init__(self, tracer, stage, activate):
+        self.tracer = tracer
+        self.span = Span(stage)
+        self.activate = activate
+        self._token = None
+        self._start = None
+
+    def __enter__(self):
+        if self.activate:
+            self._token = _current.set(self.span)
+        self._start = time.perf_counter()
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        self.span.duration = time.perf_counter() - self._start
+        # A closed generator (e.g. a cancelled stream) is not an error
+        if exc_type is not None and not issubclass(exc_type, GeneratorExit):
+            self.span.error = exc_type.__name__
+        if self._token is not None:
+            _current.reset(self._token)
+        self.tracer.record(self.span)
+        return False
+
+
+# Process-wide tracer
+tracer = Tracer(config.TRACING_METRICS_PATH, config.TRACING_METRICS_INTERVAL)
+
+
+def span(stage, activate=True):
+    return tracer.span(stage, activate)
+
+
+def traced(stage, payload=None):
+    """
+    Decorator timing every call of a function as a span of the given stage.
+
+    Args:
+    - stage (str): Name of the stage.
+    - payload (callable): Computes the payload size from the return value.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with tracer.span(stage) as s:
+                result = fn(*args, **kwargs)
+                if payload is not None:
+                    s.add_payload(payload(result))
+                return result
+        return wrapper
+    return decorator
+
+
+def text_size(*texts):
+    """
+    Size of the given texts in bytes (None counts as empty).
+    """
+    return sum(len(x.encode("utf-8")) for x in texts if isinstance(x, str))
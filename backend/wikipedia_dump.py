@@ -0,0 +1,236 @@
+"""
+Offline store of the Wikipedia "Signs and symptoms" sections, built from a Wikipedia XML dump.
+
+The dump (e.g. enwiki-latest-pages-articles.xml.bz2) is stream-parsed with constant memory,
+only the pages referenced by `dbo:wikiPageID` in the disease graph are kept, and their
+symptom section is stored in a SQLite table keyed by the page ID.
+
+Usage:
+    python -m backend.wikipedia_dump <dump.xml.bz2> [store path]
+"""
+import bz2
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import xml.etree.ElementTree as ET
+from typing import List, NamedTuple
+
+from backend import config
+
+SECTION_TITLES = ["Signs and symptoms", "Symptoms"]
+
+
+class DumpSection(NamedTuple):
+    """
+    Section of a dumped page, shaped like a wikipediaapi section so `get_text` can render it.
+    """
+    title: str
+    text: str
+    sections: List["DumpSection"]
+
+
+_HEADING = re.compile(r"^(={2,6})\s*(.+?)\s*\1\s*$", re.M)
+_COMMENT = re.compile(r"<!--.*?-->", re.S)
+_REF = re.compile(r"<ref[^>/]*/>|<ref[^>]*>.*?</ref>", re.S | re.I)
+_TEMPLATE = re.compile(r"\{\{[^{}]*\}\}")
+_TABLE = re.compile(r"\{\|.*?\|\}", re.S)
+_FILE_LINK = re.compile(r"\[\[(?:File|Image):[^\[\]]*(?:\[\[[^\[\]]*\]\][^\[\]]*)*\]\]", re.I)
+_LINK = re.compile(r"\[\[(?:[^|\[\]]*\|)?([^\[\]]*)\]\]")
+_EXTERNAL_LINK = re.compile(r"\[https?://[^\s\]]+\s*([^\]]*)\]")
+_TAG = re.compile(r"</?[a-zA-Z][^>]*>")
+_EMPHASIS = re.compile(r"'{2,}")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+def wikitext_to_text(wikitext):
+    """
+    Converts wikitext to plain text (approximately what the TextExtracts API returns).
+    """
+    text = _COMMENT.sub("", wikitext)
+    text = _REF.sub("", text)
+    # Templates can be nested, remove them from the inside out
+    previous = None
+    while previous != text:
+        previous = text
+        text = _TEMPLATE.sub("", text)
+    text = _TABLE.sub("", text)
+    text = _FILE_LINK.sub("", text)
+    text = _LINK.sub(r"\1", text)
+    text = _EXTERNAL_LINK.sub(r"\1", text)
+    text = _TAG.sub("", text)
+    text = _EMPHASIS.sub("", text)
+    text = "\n".join(line.strip() for line in text.split("\n"))
+    return _BLANK_LINES.sub("\n\n", text).strip()
+
+
+def extract_symptom_section(wikitext):
+    """
+    Returns the "Signs and symptoms" (or "Symptoms") section of a page as a `DumpSection`
+    tree, or None if the page has no such section.
+    """
+    headings = [(len(m.group(1)), m.group(2), m.start(), m.end()) for m in _HEADING.finditer(wikitext)]
+
+    def build(index):
+        level, title, _, body_start = headings[index]
+        body_end = headings[index + 1][2] if index + 1 < len(headings) else len(wikitext)
+        # The section ends at the next heading of the same or a higher level
+        end = next((j for j in range(index + 1, len(headings)) if headings[j][0] <= level), len(headings))
+
+        subsections = []
+        j = index + 1
+        while j < end:
+            subsections.append(build(j))
+            j = next((k for k in range(j + 1, end) if headings[k][0] <= headings[j][0]), end)
+        return DumpSection(wikitext_to_text(title), wikitext_to_text(wikitext[body_start:body_end]), subsections)
+
+    for section_title in SECTION_TITLES:
+        for i, heading in enumerate(headings):
+            if wikitext_to_text(heading[1]) == section_title:
+                return build(i)
+    return None
+
+
+def _local_name(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def iter_dump_pages(dump_path):
+    """
+    Yields (page ID, title, wikitext) for all articles of a (bz2 compressed) XML dump.
+
+    Elements are cleared as soon as a page is processed, so memory stays constant.
+    """
+    opener = bz2.open if dump_path.endswith(".bz2") else open
+    with opener(dump_path, "rb") as f:
+        context = ET.iterparse(f, events=("start", "end"))
+        _, root = next(context)
+        for event, elem in context:
+            if event != "end" or _local_name(elem.tag) != "page":
+                continue
+
+            fields = {}
+            for child in elem:
+                name = _local_name(child.tag)
+                if name in ("id", "title", "ns", "redirect"):
+                    fields[name] = child.text if name != "redirect" else True
+                elif name == "revision":
+                    for revision_child in child:
+                        if _local_name(revision_child.tag) == "text":
+                            fields["text"] = revision_child.text or ""
+
+            if fields.get("ns") == "0" and "redirect" not in fields:
+                yield int(fields["id"]), fields.get("title"), fields.get("text", "")
+
+            # Drop the processed page and its (now empty) siblings from the tree
+            elem.clear()
+            root.clear()
+
+
+class SectionStore:
+    """
+    SQLite store of the rendered symptom sections, keyed by wiki page ID.
+
+    Args:
+    - path (str): Location of the SQLite file.
+    """
+
+    def __init__(self, path=config.WIKIPEDIA_STORE_PATH):
+        self.path = path
+        self._db = None
+        self._lock = threading.Lock()
+
+    def _connection(self, create=False):
+        if self._db is None and (create or os.path.exists(self.path)):
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS wikipedia_sections (
+                    page_id INTEGER PRIMARY KEY,
+                    title TEXT,
+                    text TEXT
+                )
+            """)
+        return self._db
+
+    def get(self, wiki_page_id):
+        """
+        Returns (title, rendered section text) or None.
+        """
+        with self._lock:
+            db = self._connection()
+            if db is None:
+                return None
+            return db.execute("SELECT title, text FROM wikipedia_sections WHERE page_id = ?",
+                              (int(wiki_page_id),)).fetchone()
+
+    def put_many(self, rows):
+        with self._lock:
+            db = self._connection(create=True)
+            db.executemany("INSERT OR REPLACE INTO wikipedia_sections VALUES (?, ?, ?)", rows)
+            db.commit()
+
+
+# Process-wide store used by wikipedia_handler
+section_store = SectionStore()
+
+
+def get_disease_wiki_page_ids():
+    """
+    Returns the wiki page IDs of all diseases in the graph (from the snapshot if available).
+    """
+    from backend import local_handler
+    from backend.dbpedia_handler import query_dbpedia
+
+    if local_handler.is_active():
+        return set(local_handler.get_graph().wiki_page_ids.values())
+
+    results = query_dbpedia("""
+        SELECT DISTINCT ?wikiPageID
+        WHERE {
+            ?disease dbo:symptom ?symptom.
+            ?disease dbo:wikiPageID ?wikiPageID.
+        }
+    """, "all wiki page IDs")
+    return {int(x["wikiPageID"]["value"]) for x in results}
+
+
+def ingest_dump(dump_path, store, wiki_page_ids, batch_size=500):
+    """
+    Stores the symptom sections of all given pages found in the dump.
+
+    Returns:
+    - int: Number of stored sections.
+    """
+    from backend.wikipedia_handler import get_text
+
+    start = time.time()
+    pages = stored = 0
+    batch = []
+    for page_id, title, wikitext in iter_dump_pages(dump_path):
+        pages += 1
+        if page_id in wiki_page_ids:
+            section = extract_symptom_section(wikitext)
+            if section is not None:
+                batch.append((page_id, title, get_text(section)))
+            if len(batch) >= batch_size:
+                store.put_many(batch)
+                stored += len(batch)
+                batch = []
+        if pages % 100000 == 0:
+            print(f"{pages} pages scanned, {stored + len(batch)} sections, {pages / (time.time() - start):.0f} pages/s")
+
+    store.put_many(batch)
+    stored += len(batch)
+    print(f"{pages} pages scanned, {stored} of {len(wiki_page_ids)} sections stored in {time.time() - start:.0f}s")
+    return stored
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    target = SectionStore(sys.argv[2]) if len(sys.argv) > 2 else section_store
+    ingest_dump(sys.argv[1], target, get_disease_wiki_page_ids())
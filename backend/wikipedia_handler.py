@@ -1,7 +1,8 @@
-from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import List, Dict, NamedTuple, Optional
 
+import requests
 import wikipediaapi
-import wikipedia
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnablePassthrough
@@ -9,6 +10,12 @@ from langchain_ollama import OllamaLLM
 from langchain.prompts import PromptTemplate
 from langchain.chains import LLMChain
 
+from backend import config
+from backend.llm_cache import CachedLLM
+from backend.llm_scheduler import ScheduledLLM, QUESTION, ASSESSMENT
+from backend.tracing import traced, text_size
+from backend.wikipedia_dump import section_store
+
 
 def get_text(section, section_level=1):
     full_text = f"{'#' * (section_level + 1)} {section.title}:\n"
@@ -19,22 +26,153 @@ def get_text(section, section_level=1):
     return full_text
 
 
+class SymptomText(NamedTuple):
+    """
+    Result of fetching the symptom section of one Wikipedia page.
+    """
+    wiki_page_id: Optional[int]
+    title: Optional[str]
+    text: Optional[str]
+    error: Optional[str] = None
+
+
+WIKIPEDIA_API = "https://en.wikipedia.org/w/api.php"
+# The MediaWiki API accepts at most 50 page IDs per query.
+PAGE_ID_CHUNK_SIZE = 50
+
+# Long-lived clients: one pooled HTTP session for the ID lookups and one wikipediaapi client for the sections.
+_session = requests.Session()
+_session.headers["User-Agent"] = "Chrome"
+wiki_wiki = wikipediaapi.Wikipedia('Chrome', 'en', timeout=config.WIKIPEDIA_TIMEOUT)
+
+
+def resolve_titles(wiki_page_ids, timeout=config.WIKIPEDIA_TIMEOUT):
+    """
+    Resolves Wikipedia page IDs to page titles with one API request per 50 IDs.
+
+    Returns:
+    - dict: Page ID -> title. Unknown page IDs are missing from the result.
+    """
+    page_ids = list(dict.fromkeys(int(x) for x in wiki_page_ids if x is not None))
+    titles = {}
+    for start in range(0, len(page_ids), PAGE_ID_CHUNK_SIZE):
+        chunk = page_ids[start:start + PAGE_ID_CHUNK_SIZE]
+        response = _session.get(WIKIPEDIA_API, params={
+            "action": "query",
+            "pageids": "|".join(str(x) for x in chunk),
+            "format": "json",
+        }, timeout=timeout)
+        response.raise_for_status()
+        for page in response.json()["query"]["pages"].values():
+            if "missing" not in page and "invalid" not in page:
+                titles[int(page["pageid"])] = page["title"]
+    return titles
+
+
+@traced("wikipedia/section", payload=lambda result: text_size(*result))
+def fetch_symptom_text(wikiPageId, title=None):
+    """
+    Fetches the "Signs and symptoms" (or "Symptoms") section of a Wikipedia page.
+
+    Args:
+    - wikiPageId (int): Wiki page ID of the disease.
+    - title (str): Page title if already known (see `resolve_titles`), saves one request.
+
+    Returns:
+    - tuple: (page title, rendered section text)
+
+    Raises an exception if the page or the section cannot be retrieved.
+    """
+    # Served from the offline dump store if it has the page, the live API is the fallback
+    stored = section_store.get(wikiPageId)
+    if stored is not None:
+        return stored
+
+    if title is None:
+        title = resolve_titles([wikiPageId]).get(int(wikiPageId))
+        if title is None:
+            raise LookupError(f"Wikipedia page {wikiPageId} does not exist")
+    print(title)
+    page = wiki_wiki.page(title)
+    for section_title in ["Signs and symptoms", "Symptoms"]:
+        section = page.section_by_title(section_title)
+        if section:
+            break
+    if not section:
+        raise LookupError(f"No symptoms section found on page {title}")
+    return title, get_text(section)
+
+
+@traced("wikipedia/symptom_text", payload=lambda result: text_size(*result))
 def get_symptom_text(wikiPageId):
     try:
-        temp = wikipedia.page(pageid=int(wikiPageId))
-        print(temp.title)
-        wiki_wiki = wikipediaapi.Wikipedia('Chrome', 'en')
-        page = wiki_wiki.page(temp.title)
-        for section_title in ["Signs and symptoms", "Symptoms"]:
-            section = page.section_by_title(section_title)
-            if section:
-                break
-        return temp.title, get_text(section)
+        return fetch_symptom_text(wikiPageId)
     except Exception as e:
         print(f"An error occurred: {e}")
         return "ERROR", f"An error occurred: {e}"
 
 
+@traced("wikipedia/symptom_texts", payload=lambda results: sum(text_size(x.title, x.text) for x in results))
+def get_symptom_texts(wiki_page_ids, max_workers=config.WIKIPEDIA_MAX_WORKERS, timeout=config.WIKIPEDIA_TIMEOUT):
+    """
+    Fetches the symptom sections of many Wikipedia pages concurrently.
+
+    At most `max_workers` pages are fetched at the same time, so the total time is bounded by
+    the slowest page instead of the sum of all pages. Pages that are still running after
+    `timeout` seconds are reported as timed out.
+
+    Args:
+    - wiki_page_ids (list): Wiki page IDs, None entries are reported as errors.
+    - max_workers (int): Maximum number of parallel requests.
+    - timeout (float): Timeout in seconds for each request.
+
+    Returns:
+    - list: One `SymptomText` per page ID, in input order. Failed pages have `error` set.
+    """
+    results = [SymptomText(x, None, None, "No wiki page ID") if x is None else None for x in wiki_page_ids]
+    for i, x in enumerate(wiki_page_ids):
+        stored = section_store.get(x) if x is not None else None
+        if stored is not None:
+            results[i] = SymptomText(x, *stored)
+    pending = [i for i, x in enumerate(results) if x is None]
+    if not pending:
+        return results
+
+    # All titles are resolved up front with one request per 50 pages
+    try:
+        titles = resolve_titles([wiki_page_ids[i] for i in pending], timeout)
+    except Exception as e:
+        print(f"An error occurred: {e}")
+        return [x or SymptomText(wiki_page_ids[i], None, None, str(e)) for i, x in enumerate(results)]
+    for i in pending:
+        if int(wiki_page_ids[i]) not in titles:
+            results[i] = SymptomText(wiki_page_ids[i], None, None, f"Wikipedia page {wiki_page_ids[i]} does not exist")
+    pending = [i for i in pending if results[i] is None]
+    if not pending:
+        return results
+
+    workers = max(1, min(max_workers, len(pending)))
+    executor = ThreadPoolExecutor(max_workers=workers)
+    futures = {executor.submit(fetch_symptom_text, wiki_page_ids[i], titles[int(wiki_page_ids[i])]): i
+               for i in pending}
+    # Requests wait in the queue while the pool is busy, so the overall deadline grows with the number of rounds
+    rounds = -(-len(pending) // workers)
+    done, not_done = wait(futures, timeout=timeout * rounds)
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    for future, i in futures.items():
+        if future in not_done:
+            results[i] = SymptomText(wiki_page_ids[i], None, None, f"Timed out after {timeout:g}s")
+        elif future.exception() is not None:
+            print(f"An error occurred: {future.exception()}")
+            results[i] = SymptomText(wiki_page_ids[i], None, None, str(future.exception()))
+        else:
+            title, text = future.result()
+            results[i] = SymptomText(wiki_page_ids[i], title, text)
+
+    return results
+
+
 def plausibility_check(wiki_page_id: int):
     def format_chat_history(history: List[Dict]) -> str:
         if not history:
@@ -44,7 +182,10 @@ def plausibility_check(wiki_page_id: int):
     disease_name, symptom_text = get_symptom_text(wiki_page_id)
 
     # Initialize the LLM with modern configuration
-    llm = OllamaLLM(model="gemma2:27b")
+    ollama = OllamaLLM(model="gemma2:27b")
+    session_id = f"plausibility_check-{wiki_page_id}"
+    llm = CachedLLM(ScheduledLLM(ollama, session_id, QUESTION))
+    assessment_llm = CachedLLM(ScheduledLLM(ollama, session_id, ASSESSMENT))
 
     # Modern prompt template using ChatPromptTemplate
     question_template = """Generate a single, clear yes/no question to further assess whether the patient has a specific 
@@ -116,7 +257,7 @@ def plausibility_check(wiki_page_id: int):
         template=assessment_template
     )
 
-    return llm.invoke(assessment_prompt_template.format(
+    return assessment_llm.invoke(assessment_prompt_template.format(
                 disease_name=disease_name,
                 symptom_text=symptom_text,
                 chat_history=format_chat_history(chat_history)
@@ -0,0 +1,278 @@
+"""
+Microbenchmarks of the backend hot paths on synthetic disease graphs and service responses.
+
+For every function and graph size the time per call (best of several timeit runs) and the
+peak memory allocated during one call (tracemalloc) are reported. The SPARQL result-dict
+building is measured by replaying bindings in place of the DBpedia queries; get_text and
+parse_article run on synthetic Wikipedia and MedlinePlus responses (see responses.py).
+No network access is needed.
+
+Results can be stored as a baseline and later runs compared against it. A function counts
+as regressed if its time or peak memory grew by more than the tolerance, in which case the
+exit status is 1.
+
+Usage:
+    python -m benchmarks.hot_paths [--sizes 1000,10000,100000] [--only NAME]
+                                   [--save-baseline] [--compare] [--baseline PATH]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import timeit
+import tracemalloc
+from collections import Counter
+from typing import Callable, NamedTuple, Optional
+
+from backend import config, dbpedia_handler, Entropy
+from backend.Entropy import EntropyTracker, calculate_entropy_for_all_symptoms, remove_and_check_symptoms
+from backend.entropy_matrix import DiseaseSymptomMatrix
+from backend.Matching_diseases_through_symptom_comparison import find_matching_diseases, find_subset_relations
+from backend.medline_handler import parse_article
+from backend.wikipedia_handler import get_text
+from benchmarks import responses
+from benchmarks.synthetic import disease_symptom_bindings, generate_disease_symptom_pairs, symptom_label_bindings
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_BASELINE = os.path.join(config.DATA_DIR, "benchmarks", "hot_paths.json")
+# Runs per measurement; the best one is reported.
+REPEAT = 3
+# Sessions scored at once by the batch cases; each has a random half of the diseases as candidates.
+SESSIONS = 8
+# The dense disease x symptom matrix grows quadratically with the synthetic graphs.
+MATRIX_MAX_SIZE = 10000
+
+
+class Case(NamedTuple):
+    name: str
+    # Returns the function to measure for a graph (or None for the response fixtures)
+    setup: Callable
+    # Largest graph the case is run on (the SPARQL replays hold all bindings in memory)
+    max_size: Optional[int] = None
+    fixture: bool = False
+
+
+class Graph:
+    """
+    A synthetic graph and the structures derived from it, built on first use.
+    """
+
+    def __init__(self, size, seed):
+        self.size = size
+        self.pairs = generate_disease_symptom_pairs(size, seed=seed)
+        self._derived = {}
+
+    def derived(self, name, build):
+        if name not in self._derived:
+            self._derived[name] = build()
+        return self._derived[name]
+
+    @property
+    def symptom_sets(self):
+        return self.derived("sets", lambda: {d: set(s) for d, s in self.pairs.items()})
+
+    @property
+    def common_symptoms(self):
+        # The five most frequent symptoms, as if the patient had excluded them
+        return self.derived("common", lambda: [s for s, _ in Counter(
+            s for symptoms in self.pairs.values() for s in symptoms).most_common(5)])
+
+    @property
+    def matrix(self):
+        return self.derived("matrix", lambda: DiseaseSymptomMatrix(self.pairs))
+
+    @property
+    def sessions(self):
+        # (candidate pairs, excluded symptoms) per session
+        def build():
+            rng = random.Random(self.size)
+            diseases = list(self.pairs)
+            return [({d: self.pairs[d] for d in rng.sample(diseases, len(diseases) // 2)}, self.common_symptoms)
+                    for _ in range(SESSIONS)]
+        return self.derived("sessions", build)
+
+
+def _score_sessions(sessions):
+    return [(calculate_entropy_for_all_symptoms(pairs), remove_and_check_symptoms(pairs, excluded))
+            for pairs, excluded in sessions]
+
+
+@contextlib.contextmanager
+def replay(bindings):
+    """
+    Answers every DBpedia query with the given bindings.
+    """
+    def query_dbpedia(query, query_type="generic", timeout=None, use_cache=True):
+        return bindings
+
+    originals = dbpedia_handler.query_dbpedia, Entropy.query_dbpedia
+    dbpedia_handler.query_dbpedia = Entropy.query_dbpedia = query_dbpedia
+    try:
+        yield
+    finally:
+        dbpedia_handler.query_dbpedia, Entropy.query_dbpedia = originals
+
+
+def _replayed(bindings, fn, *args):
+    def run():
+        with replay(bindings):
+            return fn(*args)
+    return run
+
+
+CASES = [
+    Case("calculate_entropy_for_all_symptoms",
+         lambda g: lambda: calculate_entropy_for_all_symptoms(g.pairs)),
+    Case("remove_and_check_symptoms",
+         lambda g: lambda: remove_and_check_symptoms(g.pairs, g.common_symptoms)),
+    Case("EntropyTracker",
+         lambda g: lambda: EntropyTracker(g.pairs, g.common_symptoms)),
+    Case("DiseaseSymptomMatrix",
+         lambda g: lambda: DiseaseSymptomMatrix(g.pairs), max_size=MATRIX_MAX_SIZE),
+    Case("DiseaseSymptomMatrix.entropies",
+         lambda g: g.matrix.entropies, max_size=MATRIX_MAX_SIZE),
+    Case("DiseaseSymptomMatrix.count_distinct_diseases",
+         lambda g: lambda: g.matrix.count_distinct_diseases(g.common_symptoms), max_size=MATRIX_MAX_SIZE),
+    Case(f"entropy + distinct diseases ({SESSIONS} sessions)",
+         lambda g: lambda: _score_sessions(g.sessions), max_size=MATRIX_MAX_SIZE),
+    Case(f"DiseaseSymptomMatrix.score_sessions ({SESSIONS} sessions)",
+         lambda g: (lambda sessions: lambda: g.matrix.score_sessions(sessions))(
+             [(list(pairs), excluded) for pairs, excluded in g.sessions]), max_size=MATRIX_MAX_SIZE),
+    Case("find_matching_diseases",
+         lambda g: lambda: find_matching_diseases(g.symptom_sets)),
+    Case("find_subset_relations",
+         lambda g: lambda: find_subset_relations(g.symptom_sets), max_size=10000),
+    Case("get_all_symptoms",
+         lambda g: _replayed(g.derived("labels", lambda: symptom_label_bindings(g.pairs)),
+                             dbpedia_handler.get_all_symptoms)),
+    Case("get_disease_symptom_pairs",
+         lambda g: _replayed(g.derived("bindings", lambda: disease_symptom_bindings(g.pairs)),
+                             Entropy.get_disease_symptom_pairs, list(g.pairs)), max_size=100000),
+    Case("get_all_symptoms (synthetic response)",
+         lambda _: _replayed(responses.load_sparql("sparql_all_symptoms.json"), dbpedia_handler.get_all_symptoms),
+         fixture=True),
+    Case("get_disease_symptom_pairs (synthetic response)",
+         lambda _: _replayed(responses.load_sparql("sparql_disease_symptom_pairs.json"),
+                             Entropy.get_disease_symptom_pairs, []), fixture=True),
+    Case("get_text (synthetic response)",
+         lambda _: (lambda section: lambda: get_text(section))(responses.load_wikipedia_section()), fixture=True),
+    Case("parse_article (synthetic response)",
+         lambda _: (lambda content: lambda: parse_article(content))(responses.load_medline_article()), fixture=True),
+]
+
+
+def measure(fn, repeat=REPEAT):
+    """
+    Returns (seconds per call, peak bytes allocated during one call).
+    """
+    # The handlers print progress messages, which are not part of the measurement
+    with contextlib.redirect_stdout(io.StringIO()):
+        timer = timeit.Timer(fn)
+        number, _ = timer.autorange()
+        seconds = min(timer.repeat(repeat=repeat, number=number)) / number
+
+        tracemalloc.start()
+        try:
+            fn()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return seconds, peak
+
+
+def run(sizes, only=None, seed=0):
+    """
+    Runs the selected cases.
+
+    Returns:
+    - dict: Case -> size ("fixture" for the response fixtures) -> {"seconds", "peak_bytes"}.
+    """
+    cases = [c for c in CASES if not only or any(x.lower() in c.name.lower() for x in only)]
+    results = {}
+
+    for case in cases:
+        if case.fixture:
+            seconds, peak = measure(case.setup(None))
+            results.setdefault(case.name, {})["fixture"] = {"seconds": seconds, "peak_bytes": peak}
+
+    for size in sizes:
+        graph = None
+        for case in cases:
+            if case.fixture or (case.max_size and size > case.max_size):
+                continue
+            graph = graph or Graph(size, seed)
+            seconds, peak = measure(case.setup(graph))
+            results.setdefault(case.name, {})[str(size)] = {"seconds": seconds, "peak_bytes": peak}
+
+    return results
+
+
+def _format_seconds(seconds):
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.1f} us"
+    if seconds < 1:
+        return f"{seconds * 1e3:.1f} ms"
+    return f"{seconds:.2f} s"
+
+
+def report(results, baseline=None, tolerance=0.2):
+    """
+    Prints the results, compared to the baseline if given.
+
+    Returns:
+    - list: (case, size) of all regressions.
+    """
+    regressions = []
+    print(f"{'function':<48}{'size':>10}{'time':>12}{'peak MiB':>10}" + (f"{'time':>9}{'peak':>9}" if baseline else ""))
+    for name, sizes in results.items():
+        for size, result in sizes.items():
+            line = (f"{name:<48}{size:>10}{_format_seconds(result['seconds']):>12}"
+                    f"{result['peak_bytes'] / 2 ** 20:>10.2f}")
+            previous = (baseline or {}).get(name, {}).get(size)
+            if previous:
+                time_ratio = result["seconds"] / previous["seconds"]
+                peak_ratio = result["peak_bytes"] / previous["peak_bytes"] if previous["peak_bytes"] else 1.0
+                line += f"{time_ratio - 1:>+9.0%}{peak_ratio - 1:>+9.0%}"
+                if time_ratio > 1 + tolerance or peak_ratio > 1 + tolerance:
+                    regressions.append((name, size))
+                    line += "  REGRESSION"
+            print(line)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=",".join(str(x) for x in DEFAULT_SIZES),
+                        help="Comma separated numbers of diseases (up to 1000000)")
+    parser.add_argument("--only", action="append", help="Only run functions containing this text")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline file")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the baseline")
+    parser.add_argument("--compare", action="store_true", help="Compare the results with the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed growth before a regression is reported")
+    args = parser.parse_args()
+
+    # Make sure the handlers do not answer from the offline snapshot
+    config.KNOWLEDGE_BACKEND = "sparql"
+
+    results = run([int(x) for x in args.sizes.split(",")], args.only, args.seed)
+
+    baseline = None
+    if args.compare:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    regressions = report(results, baseline, args.tolerance)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(), "results": results}, f, indent=1)
+        print(f"Baseline written to {args.baseline}")
+
+    if regressions:
+        print(f"{len(regressions)} regression(s) above {args.tolerance:.0%}")
+        sys.exit(1)
@@ -0,0 +1,852 @@
+"""
+Load test of Home.py: N simulated patients click through the app at the same time.
+
+Every patient runs the state machine of Home.py headlessly with Streamlit's AppTest
+("User Input" -> "Symptom Questions" -> "Plausibility Check" -> "Display Results", or the LLM
+assessment if the patient activates the LLM). All sessions run in this one process, so the
+shared catalog, caches and LLM scheduler are under the same load as on the server.
+
+DBpedia, Wikipedia and MedlinePlus are replaced by a transport adapter on the HTTP sessions of
+the backend, Ollama by a local HTTP server. Both answer from a cassette of recorded responses
+(`--record` fills it from the live services) and fall back to a synthetic disease graph for
+requests that were not recorded. Every replayed answer is delayed by the configured latency.
+
+For every number of concurrent users the throughput, the latency percentiles of the
+interactions per state and the memory per session are reported.
+
+Usage:
+    python -m benchmarks.load_test [--users 1,2,4,8,16] [--patients 2] [--llm-share 0.5]
+                                   [--latency dbpedia=0.3] [--think-time 1] [--slo 2]
+    python -m benchmarks.load_test --record --users 1 --patients 5
+"""
+import argparse
+import contextlib
+import gzip
+import hashlib
+import http.client
+import io
+import itertools
+import json
+import logging
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import types
+import urllib.request
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import NamedTuple, Optional
+from urllib.parse import parse_qs, parse_qsl, urlsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+# Only the configuration is imported here: the other backend modules read it when they are
+# imported, which happens after `configure` (see `main`).
+from backend import config
+from benchmarks.synthetic import (disease_symptom_bindings, generate_disease_symptom_pairs, label_binding,
+                                  symptom_label_bindings, uri_binding)
+
+HOME = os.path.join(config.BASE_DIR, "Home.py")
+DEFAULT_CASSETTE = os.path.join(config.DATA_DIR, "benchmarks", "load_test_cassette.json.gz")
+DEFAULT_USERS = (1, 2, 4, 8, 16)
+# Injected latency in seconds per service; for Ollama the time to the first token.
+DEFAULT_LATENCY = {"dbpedia": 0.3, "wikipedia": 0.2, "medlineplus": 0.2, "ollama": 0.5}
+DEFAULT_TOKEN_LATENCY = 0.02
+# Upper bound of interactions per patient, in case the state machine does not advance.
+MAX_STEPS = 200
+# Probability that a patient answers "Yes" to a symptom question / a disease of the plausibility check.
+P_YES_QUESTION = 0.3
+P_YES_DISEASE = 0.2
+# The LLM path of the plausibility check ends with the assessment after this many questions (see Home.py).
+LLM_QUESTIONS = 5
+
+
+def request_key(service, method, url, body=None):
+    """
+    Returns the cassette key of a request; the order of the query parameters does not matter.
+    """
+    parts = urlsplit(url)
+    if isinstance(body, bytes):
+        body = body.decode("utf-8")
+    payload = [method, parts.netloc + parts.path, sorted(parse_qsl(parts.query, keep_blank_values=True)), body]
+    return f"{service}:{hashlib.sha256(json.dumps(payload).encode('utf-8')).hexdigest()}"
+
+
+class Cassette:
+    """
+    Recorded responses of the external services, stored as gzipped JSON.
+
+    HTTP entries hold {"status", "content_type", "body"}, Ollama entries {"chunks"}.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def put(self, key, entry):
+        with self._lock:
+            self.entries[key] = entry
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with self._lock, gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+
+
+class SyntheticWorld:
+    """
+    Answers the requests of the backend from a synthetic disease graph (see synthetic.py).
+
+    The SPARQL queries are recognized by their SELECT clause, Wikipedia serves one page with a
+    "Signs and symptoms" section per disease and the LLM returns a question or an assessment
+    derived from the hash of the prompt.
+    """
+
+    def __init__(self, n_diseases, seed=0):
+        self.pairs = generate_disease_symptom_pairs(n_diseases, seed=seed)
+        self.diseases_of = defaultdict(set)
+        for disease, symptoms in self.pairs.items():
+            for symptom in symptoms:
+                self.diseases_of[symptom].add(disease)
+        self.page_ids = {disease: 1000 + i for i, disease in enumerate(self.pairs)}
+        self.titles = {page_id: label_binding(disease)["value"] for disease, page_id in self.page_ids.items()}
+        self.pages = {title: disease for disease, title in zip(self.pairs, self.titles.values())}
+        self.all_symptoms = symptom_label_bindings(self.pairs)
+        self.symptom_labels = [x["label"]["value"] for x in self.all_symptoms]
+
+    def _diseases_with_all(self, symptoms):
+        if not symptoms:
+            return []
+        return sorted(set.intersection(*(self.diseases_of.get(x, set()) for x in symptoms)))
+
+    def sparql(self, query):
+        uris = re.findall(r"<([^>]+)>", query)
+        select = re.search(r"SELECT\s+(?:DISTINCT\s+)?(.*?)\s+WHERE", query, re.S)
+        head = select.group(1).split() if select else []
+
+        if "?wikiPageID" in head:
+            return [{"disease": uri_binding(x), "wikiPageID": {"type": "literal", "value": str(self.page_ids[x])}}
+                    for x in uris if x in self.page_ids]
+        if "?medlineId" in head:
+            return []
+        if head == ["?symptom", "?label"]:
+            if "?inputSymptom" in query:
+                symptoms = {x for disease in self._diseases_with_all(uris) for x in self.pairs[disease]}
+            elif uris:
+                symptoms = set(self.pairs.get(uris[0], ()))
+            else:
+                return self.all_symptoms
+            return [{"symptom": uri_binding(x), "label": label_binding(x)} for x in sorted(symptoms)]
+        if head == ["?disease", "?label", "?symptom"]:
+            return disease_symptom_bindings({x: self.pairs[x] for x in uris if x in self.pairs})
+        if head == ["?disease", "?symptom", "?label"]:
+            return [{"disease": uri_binding(x), "symptom": uri_binding(s), "label": label_binding(s)}
+                    for x in uris if x in self.pairs for s in self.pairs[x]]
+        if head == ["?disease", "?label"]:
+            return [{"disease": uri_binding(x), "label": label_binding(x)} for x in self._diseases_with_all(uris)]
+        if head == ["?disease"]:
+            return [{"disease": uri_binding(x)} for x in self._diseases_with_all(uris)]
+
+        print(f"Synthetic world cannot answer query: {' '.join(query.split())[:200]}", file=sys.stderr)
+        return []
+
+    def wikipedia(self, params):
+        if "pageids" in params:
+            pages = {}
+            for x in params["pageids"].split("|"):
+                title = self.titles.get(int(x))
+                pages[x] = {"pageid": int(x), "ns": 0, "title": title} if title else {"pageid": int(x), "missing": ""}
+            return {"query": {"pages": pages}}
+
+        title = params.get("titles", "")
+        disease = self.pages.get(title)
+        if disease is None:
+            return {"query": {"pages": {"-1": {"ns": 0, "title": title, "missing": ""}}}}
+        symptoms = ", ".join(label_binding(x)["value"].lower() for x in self.pairs[disease])
+        extract = (f"{title} is a synthetic disease of the load test.\n\n"
+                   f"== Signs and symptoms ==\nPatients with {title} typically present with {symptoms}. "
+                   f"The symptoms develop over a few days and may vary in severity.\n\n"
+                   f"== Treatment ==\nTreatment is supportive.")
+        page_id = self.page_ids[disease]
+        return {"query": {"pages": {str(page_id): {"pageid": page_id, "ns": 0, "title": title, "extract": extract}}}}
+
+    def completion(self, prompt):
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).hexdigest())
+        if "Possible Diagnosis" in prompt:
+            disease = label_binding(rng.choice(list(self.pairs)))["value"]
+            text = (f"Possible Diagnosis: {disease}\n\n"
+                    + "The reported symptoms and the answers to the questions are consistent with this disease. " * 4
+                    + "\n\nDisease State: 3. Non-Critical, Visit a doctor")
+        else:
+            text = f"Do you also have {rng.choice(self.symptom_labels).lower()} since the symptoms started?"
+        return re.findall(r"\S+\s*", text)
+
+
+class Latency:
+    """
+    Injected delay of a stand-in, uniformly distributed within +-jitter around the mean.
+    """
+
+    def __init__(self, seconds, jitter=0.0):
+        self.seconds = seconds
+        self.jitter = jitter
+
+    def sleep(self):
+        if self.seconds > 0:
+            time.sleep(self.seconds * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+
+SERVICES = {"dbpedia.org": "dbpedia", "wikipedia.org": "wikipedia", "medlineplus.gov": "medlineplus"}
+
+
+def service_of(url):
+    host = urlsplit(url).hostname or ""
+    if host == urlsplit(config.DBPEDIA_ENDPOINT).hostname:
+        return "dbpedia"
+    for suffix, service in SERVICES.items():
+        if host == suffix or host.endswith("." + suffix):
+            return service
+    return "other"
+
+
+class StandIns:
+    """
+    Record/replay stand-ins of the external services.
+
+    Args:
+    - cassette (Cassette): Recorded responses.
+    - world (SyntheticWorld): Answers requests that are not in the cassette, None to answer them with 404.
+    - latency (dict): Service -> Latency of a replayed answer (for Ollama: until the first token).
+    - token_latency (Latency): Delay between two replayed LLM tokens.
+    - record (bool): Forward all requests to the live services and store the responses.
+    - ollama_upstream (str): URL of the live Ollama server for recording.
+    """
+
+    def __init__(self, cassette, world, latency, token_latency, record=False, ollama_upstream=None):
+        self.cassette = cassette
+        self.world = world
+        self.latency = latency
+        self.token_latency = token_latency
+        self.record = record
+        self.ollama_upstream = ollama_upstream
+        self.live = HTTPAdapter(pool_maxsize=32)
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def _count(self, service, outcome):
+        with self._lock:
+            self._counts[service, outcome] += 1
+
+    def get_stats(self):
+        """
+        Returns service -> outcome ("recorded", "replayed", "synthetic", "missing") -> count.
+        """
+        with self._lock:
+            counts = dict(self._counts)
+        stats = {}
+        for (service, outcome), count in sorted(counts.items()):
+            stats.setdefault(service, {})[outcome] = count
+        return stats
+
+    def send(self, request, **kwargs):
+        service = service_of(request.url)
+        key = request_key(service, request.method, request.url, request.body)
+        if self.record:
+            response = self.live.send(request, **kwargs)
+            self.cassette.put(key, {"status": response.status_code, "body": response.text,
+                                    "content_type": response.headers.get("Content-Type")})
+            self._count(service, "recorded")
+            return response
+
+        self.latency.get(service, Latency(0)).sleep()
+        entry = self.cassette.get(key)
+        if entry is not None:
+            self._count(service, "replayed")
+        else:
+            entry = self._synthetic(service, request)
+            self._count(service, "synthetic" if entry["status"] == 200 else "missing")
+        return _response(request, entry)
+
+    def _synthetic(self, service, request):
+        if self.world is not None and service == "dbpedia":
+            body = request.body.decode("utf-8") if isinstance(request.body, bytes) else request.body or ""
+            bindings = self.world.sparql(parse_qs(body).get("query", [""])[0])
+            return {"status": 200, "content_type": "application/sparql-results+json",
+                    "body": json.dumps({"head": {}, "results": {"bindings": bindings}})}
+        if self.world is not None and service == "wikipedia":
+            params = dict(parse_qsl(urlsplit(request.url).query, keep_blank_values=True))
+            return {"status": 200, "content_type": "application/json", "body": json.dumps(self.world.wikipedia(params))}
+        return {"status": 404, "content_type": "text/plain", "body": "Not recorded"}
+
+    def generate(self, model, prompt):
+        """
+        Yields the chunks of an LLM completion, from the cassette, the live server or the world.
+        """
+        key = request_key("ollama", "POST", "/api/generate", json.dumps({"model": model, "prompt": prompt}))
+        if self.record:
+            chunks = []
+            for chunk in _ollama_stream(self.ollama_upstream, model, prompt):
+                chunks.append(chunk)
+                yield chunk
+            # Only complete answers are stored
+            self.cassette.put(key, {"chunks": chunks})
+            self._count("ollama", "recorded")
+            return
+
+        entry = self.cassette.get(key)
+        if entry is not None:
+            chunks = entry["chunks"]
+            self._count("ollama", "replayed")
+        elif self.world is not None:
+            chunks = self.world.completion(prompt)
+            self._count("ollama", "synthetic")
+        else:
+            self._count("ollama", "missing")
+            raise LookupError("Completion not recorded")
+
+        self.latency.get("ollama", Latency(0)).sleep()
+        for i, chunk in enumerate(chunks):
+            if i:
+                self.token_latency.sleep()
+            yield chunk
+
+
+class StandInAdapter(BaseAdapter):
+    """
+    Transport adapter that routes the requests of a requests.Session to the stand-ins.
+    """
+
+    def __init__(self, stand_ins):
+        super().__init__()
+        self.stand_ins = stand_ins
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        return self.stand_ins.send(request, stream=stream, timeout=timeout, verify=verify, cert=cert, proxies=proxies)
+
+    def close(self):
+        pass
+
+
+def _response(request, entry):
+    response = requests.Response()
+    response.status_code = entry["status"]
+    response.reason = http.client.responses.get(entry["status"], "")
+    response.headers["Content-Type"] = entry.get("content_type") or "application/json"
+    response._content = entry["body"].encode("utf-8")
+    response.encoding = "utf-8"
+    response.url = request.url
+    response.request = request
+    return response
+
+
+def _ollama_stream(upstream, model, prompt):
+    request = urllib.request.Request(f"{upstream.rstrip('/')}/api/generate", method="POST",
+                                     data=json.dumps({"model": model, "prompt": prompt}).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request) as response:
+        for line in response:
+            part = json.loads(line)
+            if part.get("response"):
+                yield part["response"]
+
+
+class _OllamaHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path != "/api/generate":
+            self.send_error(404)
+            return
+        request = json.loads(body)
+        model, stream = request.get("model"), request.get("stream", True)
+        generation = self.server.stand_ins.generate(model, request.get("prompt", ""))
+
+        def message(text, done):
+            part = {"model": model, "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                    "response": text, "done": done}
+            if done:
+                part["done_reason"] = "stop"
+            return json.dumps(part).encode("utf-8") + b"\n"
+
+        try:
+            # The first chunk is taken before the headers, so a missing completion is still a 404
+            first = next(generation, None)
+            chunks = itertools.chain([] if first is None else [first], generation)
+            if not stream:
+                text = "".join(chunks)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson" if stream else "application/json")
+            self.end_headers()
+            if stream:
+                for chunk in chunks:
+                    self.wfile.write(message(chunk, False))
+                    self.wfile.flush()
+                self.wfile.write(message("", True))
+            else:
+                self.wfile.write(message(text, True))
+        except (BrokenPipeError, ConnectionResetError):
+            # The client cancelled the generation (e.g. a discarded speculative question)
+            generation.close()
+        except LookupError as e:
+            self.send_error(404, str(e))
+
+    def log_message(self, format, *args):
+        pass
+
+
+class OllamaStandIn:
+    """
+    Local HTTP server in place of Ollama (`/api/generate`), answering from the stand-ins.
+    """
+
+    def __init__(self, stand_ins):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _OllamaHandler)
+        self.server.daemon_threads = True
+        self.server.stand_ins = stand_ins
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def configure(workdir, cache=True):
+    """
+    Points the backend at the stand-ins and keeps its on-disk state in `workdir`.
+
+    Must run before the backend modules (other than config) are imported.
+    """
+    config.KNOWLEDGE_BACKEND = "sparql"
+    config.QUERY_CACHE_ENABLED = cache
+    config.QUERY_CACHE_PATH = os.path.join(workdir, "query_cache.sqlite")
+    config.LLM_CACHE_ENABLED = cache
+    config.LLM_CACHE_PATH = os.path.join(workdir, "llm_cache.sqlite")
+    config.WIKIPEDIA_STORE_PATH = os.path.join(workdir, "wikipedia_sections.sqlite")
+    config.MEDLINE_STORE_PATH = os.path.join(workdir, "medline_articles.sqlite")
+    config.MEDLINE_BULK_PATH = os.path.join(workdir, "medline_bulk.sqlite")
+    config.TRACING_METRICS_PATH = None
+    config.DEBUG_PANEL = False
+
+
+def install(stand_ins):
+    """
+    Mounts the stand-in adapter on all HTTP sessions of the backend.
+    """
+    from backend import medline_handler, sparql_client, wikipedia_handler
+
+    adapter = StandInAdapter(stand_ins)
+    for session in (sparql_client.client.session, wikipedia_handler._session,
+                    wikipedia_handler.wiki_wiki._session, medline_handler._session):
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+
+@contextlib.contextmanager
+def shared_runtime():
+    """
+    Lets several AppTests run at the same time.
+
+    AppTest installs a mock Streamlit runtime and the "global.appTest" option for every script
+    run and removes them afterwards, which breaks the runs of the other sessions. Within this
+    context all runs use one runtime and the option stays set. Like on the server, the script
+    is compiled once for all sessions (AppTest compiles it for every run, and concurrent
+    compile() calls can fail on Python 3.11).
+    """
+    from unittest.mock import MagicMock
+
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1.util import patch_config_options
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    script_cache = ScriptCache()
+    get_bytecode = ScriptCache.get_bytecode
+
+    originals = Runtime.__dict__["instance"], Runtime.__dict__["exists"]
+    Runtime.instance = classmethod(lambda cls: runtime)
+    Runtime.exists = classmethod(lambda cls: True)
+    ScriptCache.get_bytecode = lambda self, script_path: get_bytecode(script_cache, script_path)
+    try:
+        with patch_config_options({"global.appTest": True}):
+            yield runtime
+    finally:
+        Runtime.instance, Runtime.exists = originals
+        ScriptCache.get_bytecode = get_bytecode
+
+
+_SKIPPED_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType,
+                  threading.Thread, type(threading.Lock()), type(threading.RLock()))
+
+
+def deep_size(value, shared=()):
+    """
+    Approximate number of bytes reachable from a value, without the shared objects.
+    """
+    skipped = {id(x) for x in shared}
+    seen = set()
+    size = 0
+    stack = [value]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or id(obj) in skipped or isinstance(obj, _SKIPPED_TYPES):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+            stack.extend(obj)
+        elif not isinstance(obj, (str, bytes, int, float)):
+            attributes = getattr(obj, "__dict__", None)
+            if isinstance(attributes, dict):
+                stack.append(attributes)
+            for cls in type(obj).__mro__:
+                slots = cls.__dict__.get("__slots__", ())
+                for slot in (slots,) if isinstance(slots, str) else slots:
+                    if slot not in ("__dict__", "__weakref__"):
+                        stack.append(getattr(obj, slot, None))
+    return size
+
+
+def rss_bytes():
+    """
+    Resident set size of the process (the peak where the current one is not available).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class PatientResult(NamedTuple):
+    # (state before the interaction, seconds) per interaction
+    timings: list
+    completed: bool
+    llm: bool
+    state_bytes: int
+    error: Optional[str] = None
+
+
+def _rerun(at, timeout=None):
+    """
+    Reruns the script of an AppTest with the current widget values, like `AppTest.run`.
+
+    After a state change (st.rerun) AppTest still holds the elements of the previous state,
+    which the browser would remove. Their widgets no longer exist in the session state and
+    are left out instead of failing the run.
+    """
+    from streamlit.proto.WidgetStates_pb2 import WidgetStates
+    from streamlit.testing.v1.element_tree import get_widget_state
+
+    widget_states = WidgetStates()
+    for node in at._tree:
+        try:
+            widget_state = get_widget_state(node)
+        except KeyError:
+            continue
+        if widget_state is not None:
+            widget_states.widgets.append(widget_state)
+    at._run(widget_states, timeout=timeout)
+
+
+def _button(at, label):
+    return next((x for x in at.button if x.label == label), None)
+
+
+def run_patient(index, seed=0, llm_share=0.0, think_time=0.0, timeout=60):
+    """
+    Clicks through Home.py as one patient with seeded random answers.
+
+    The patient picks a symptom by typing its label into the search, answers the
+    symptom questions and then the plausibility check, with the LLM if it was activated.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    from backend.llm_cache import llm_cache
+    from backend.llm_scheduler import llm_scheduler
+    from backend.query_cache import query_cache
+    from backend.speculation import cancel_all
+    from backend.symptom_catalog import get_catalog
+    from backend.symptom_search import get_search_index
+    from backend.tracing import tracer
+
+    rng = random.Random(f"{seed}-{index}")
+    llm = rng.random() < llm_share
+    timings = []
+    at = AppTest.from_file(HOME, default_timeout=timeout)
+
+    def state(key, default=None):
+        return at.session_state[key] if key in at.session_state else default
+
+    def interact():
+        # The widget values of the click/selection are already set in the tree
+        status = state("status", "User Input")
+        start = time.perf_counter()
+        _rerun(at, timeout)
+        timings.append((status, time.perf_counter() - start))
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+        if think_time:
+            time.sleep(rng.uniform(0, 2 * think_time))
+
+    completed, error = False, None
+    try:
+        interact()
+        if llm:
+            at.checkbox(key="llm_active").check()
+            interact()
+
+        label = rng.choice(at.selectbox[0].options)
+        at.text_input[0].input(label)
+        interact()
+        at.selectbox[0].select(label)
+        interact()
+        _button(at, "Add Symptom").click()
+        interact()
+        _button(at, "Finish Input").click()
+        interact()
+
+        for _ in range(MAX_STEPS):
+            status = state("status")
+            if status == "Display Results" or (
+                    status == "Plausibility Check" and llm and len(state("chat_history", [])) >= LLM_QUESTIONS):
+                completed = True
+                break
+            if status == "Plausibility Check" and llm:
+                answer = rng.choice(("Yes", "No", "I don't know"))
+            else:
+                p_yes = P_YES_QUESTION if status == "Symptom Questions" else P_YES_DISEASE
+                answer = "Yes" if rng.random() < p_yes else "No"
+            button = _button(at, answer)
+            if button is None:
+                raise RuntimeError(f'No "{answer}" button in state "{status}"')
+            button.click()
+            interact()
+        else:
+            error = f"Not finished after {MAX_STEPS} interactions"
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+
+    # Stop the background generations of the session so they do not load the next patient
+    cancel_all(state("speculations", {}))
+    if state("question_generation") is not None:
+        state("question_generation").cancel()
+
+    shared = (get_catalog(), get_search_index(), llm_scheduler, llm_cache, query_cache, tracer)
+    state_bytes = deep_size(at.session_state.filtered_state, shared)
+    return PatientResult(timings, completed, llm, state_bytes, error)
+
+
+class LevelResult(NamedTuple):
+    users: int
+    seconds: float
+    patients: list
+    rss_before: int
+    rss_peak: int
+
+
+def run_level(users, patients_per_user, seed=0, llm_share=0.0, think_time=0.0, timeout=60):
+    """
+    Runs `users` concurrent users, each of which clicks through `patients_per_user` patients in a row.
+    """
+    def user(number):
+        return [run_patient(number * patients_per_user + i, seed, llm_share, think_time, timeout)
+                for i in range(patients_per_user)]
+
+    rss_before = rss_bytes()
+    rss_peak = [rss_before]
+    finished = threading.Event()
+
+    def sample_rss():
+        while not finished.wait(0.1):
+            rss_peak[0] = max(rss_peak[0], rss_bytes())
+
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=users) as executor:
+            patients = [x for results in executor.map(user, range(users)) for x in results]
+    finally:
+        seconds = time.perf_counter() - start
+        finished.set()
+        sampler.join()
+    return LevelResult(users, seconds, patients, rss_before, max(rss_peak[0], rss_bytes()))
+
+
+def _percentile(samples, q):
+    return samples[int(q * (len(samples) - 1))] if samples else 0.0
+
+
+def summarize(level):
+    """
+    Returns the key figures of a concurrency level as a dict (latencies in seconds).
+    """
+    timings = sorted(seconds for patient in level.patients for _, seconds in patient.timings)
+    states = {}
+    for patient in level.patients:
+        for status, seconds in patient.timings:
+            states.setdefault(status, []).append(seconds)
+    completed = [x for x in level.patients if x.completed]
+    return {
+        "users": level.users,
+        "patients": len(level.patients),
+        "completed": len(completed),
+        "llm": sum(x.llm for x in level.patients),
+        "errors": [x.error for x in level.patients if x.error],
+        "seconds": level.seconds,
+        "throughput": len(completed) / level.seconds if level.seconds else 0.0,
+        "interactions_per_second": len(timings) / level.seconds if level.seconds else 0.0,
+        "p50": _percentile(timings, 0.5),
+        "p95": _percentile(timings, 0.95),
+        "p99": _percentile(timings, 0.99),
+        "states": {
+            status: {"count": len(x), "p50": _percentile(x, 0.5), "p95": _percentile(x, 0.95),
+                     "p99": _percentile(x, 0.99), "max": x[-1]}
+            for status, x in ((status, sorted(samples)) for status, samples in states.items())
+        },
+        "state_bytes": sum(x.state_bytes for x in level.patients) / len(level.patients) if level.patients else 0,
+        "rss_growth_per_user": (level.rss_peak - level.rss_before) / level.users,
+    }
+
+
+def report(summaries, slo=None):
+    """
+    Prints one line per concurrency level and the latency percentiles per state.
+    """
+    print(f"{'users':>6}{'patients':>9}{'done':>6}{'errors':>7}{'wall s':>8}{'patients/s':>11}{'clicks/s':>9}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'state KiB':>10}{'RSS/user MiB':>13}")
+    for x in summaries:
+        print(f"{x['users']:>6}{x['patients']:>9}{x['completed']:>6}{len(x['errors']):>7}{x['seconds']:>8.1f}"
+              f"{x['throughput']:>11.2f}{x['interactions_per_second']:>9.1f}{x['p50'] * 1000:>9.0f}"
+              f"{x['p95'] * 1000:>9.0f}{x['p99'] * 1000:>9.0f}{x['state_bytes'] / 1024:>10.1f}"
+              f"{x['rss_growth_per_user'] / 2 ** 20:>13.1f}")
+
+    for x in summaries:
+        print(f"\n{x['users']} user(s):")
+        print(f"  {'state':<22}{'count':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+        for status, s in x["states"].items():
+            print(f"  {status:<22}{s['count']:>7}{s['p50'] * 1000:>9.0f}{s['p95'] * 1000:>9.0f}"
+                  f"{s['p99'] * 1000:>9.0f}{s['max'] * 1000:>9.0f}")
+        for error in Counter(x["errors"]).most_common(5):
+            print(f"  error ({error[1]}x): {error[0]}")
+
+    if slo:
+        held = [x["users"] for x in summaries if x["p95"] <= slo and not x["errors"]]
+        if held:
+            print(f"\np95 <= {slo:g} s without errors up to {max(held)} concurrent user(s)")
+        else:
+            print(f"\np95 <= {slo:g} s was not met at any level")
+
+
+def _parse_latency(values):
+    latency = dict(DEFAULT_LATENCY)
+    for value in values or ():
+        service, _, seconds = value.partition("=")
+        if service not in latency or not seconds:
+            raise argparse.ArgumentTypeError(f"Expected SERVICE=SECONDS with SERVICE in {', '.join(latency)}")
+        latency[service] = float(seconds)
+    return latency
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", default=",".join(str(x) for x in DEFAULT_USERS),
+                        help="Comma separated numbers of concurrent users, one run per number")
+    parser.add_argument("--patients", type=int, default=2, help="Patients per user and run")
+    parser.add_argument("--llm-share", type=float, default=0.0, help="Share of patients that activate the LLM")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean pause in seconds between two clicks")
+    parser.add_argument("--latency", action="append", metavar="SERVICE=SECONDS",
+                        help="Injected latency of dbpedia, wikipedia, medlineplus or ollama (first token)")
+    parser.add_argument("--token-latency", type=float, default=DEFAULT_TOKEN_LATENCY,
+                        help="Injected delay in seconds between two LLM tokens")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Relative spread of the injected latencies")
+    parser.add_argument("--cassette", default=DEFAULT_CASSETTE, help="File of recorded responses")
+    parser.add_argument("--record", action="store_true", help="Record the live services into the cassette")
+    parser.add_argument("--ollama-upstream", default=os.environ.get("OLLAMA_HOST", "http://localhost:11434"),
+                        help="Live Ollama server for --record")
+    parser.add_argument("--strict", action="store_true",
+                        help="Answer requests missing from the cassette with 404 instead of the synthetic graph")
+    parser.add_argument("--world-size", type=int, default=2000, help="Diseases of the synthetic graph")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the query and LLM caches")
+    parser.add_argument("--slo", type=float, default=2.0, help="p95 latency in seconds a level must meet")
+    parser.add_argument("--timeout", type=float, default=120, help="Timeout in seconds of one interaction")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the results as JSON to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show the output of the backend")
+    args = parser.parse_args()
+
+    try:
+        latency = {k: Latency(v, args.jitter) for k, v in _parse_latency(args.latency).items()}
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+
+    workdir = tempfile.mkdtemp(prefix="load_test_")
+    configure(workdir, cache=not args.no_cache)
+    cassette = Cassette(args.cassette)
+    world = None if args.strict else SyntheticWorld(args.world_size, args.seed)
+    stand_ins = StandIns(cassette, world, latency, Latency(args.token_latency, args.jitter),
+                         record=args.record, ollama_upstream=args.ollama_upstream)
+    ollama = OllamaStandIn(stand_ins)
+    os.environ["OLLAMA_HOST"] = ollama.url
+    install(stand_ins)
+    # Home.py loads its images relative to the repository root
+    os.chdir(config.BASE_DIR)
+    if not args.verbose:
+        # The sessions are driven from worker threads without a script run context. Streamlit
+        # resets the logger levels whenever its config changes, so the warning is filtered.
+        logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(
+            lambda record: record.levelno >= logging.ERROR)
+
+    from backend.llm_scheduler import llm_scheduler
+
+    summaries = []
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    try:
+        with shared_runtime():
+            for users in (int(x) for x in args.users.split(",")):
+                print(f"Running {users} user(s) x {args.patients} patient(s) ...", file=sys.stderr)
+                with output:
+                    level = run_level(users, args.patients, args.seed, args.llm_share, args.think_time, args.timeout)
+                summaries.append(summarize(level))
+    finally:
+        ollama.close()
+        if args.record:
+            cassette.save()
+            print(f"Cassette written to {args.cassette} ({len(cassette.entries)} responses)", file=sys.stderr)
+
+    report(summaries, args.slo)
+    print(f"\nStand-ins: {stand_ins.get_stats()}")
+    print(f"LLM scheduler: {llm_scheduler.get_stats()}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"arguments": vars(args), "levels": summaries, "stand_ins": stand_ins.get_stats()}, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Compares question-selection strategies by the number of questions needed to isolate a disease.
+
+Every disease of the graph (or a random sample, see --limit) is used once as the "true"
+disease. The simulated patient starts with one of its symptoms (as if entered on the
+"User Input" screen) and answers every question truthfully. Strategies:
+
+- home:          the current loop of Home.py (highest marginal entropy; "No" only excludes
+                 the symptom; stops when at most one distinct disease is left or after five
+                 exclusions with at most five distinct diseases)
+- home-eig:      the loop of Home.py with the question of `select_question` (expected
+                 information gain under Home's update rule, two-step lookahead); Home.py
+                 keeps the question of "home" until this needs fewer questions
+- eig:           expected information gain, one step, every answer narrows the candidates
+- eig-lookahead: expected information gain with two-step lookahead, every answer narrows
+
+A session counts as isolated when all diseases consistent with the answers have identical
+symptom sets.
+
+Usage:
+    python -m benchmarks.question_selection [--snapshot PATH | --synthetic N] [--limit N]
+"""
+import argparse
+import random
+import time
+
+from backend import config
+from backend.Entropy import EntropyTracker
+from backend.question_selection import EXCLUDE, NARROW, select_question
+from benchmarks.synthetic import generate_disease_symptom_pairs
+
+MAX_QUESTIONS = 30
+
+
+def load_snapshot_pairs(path):
+    from backend.snapshot import KnowledgeGraph
+
+    graph = KnowledgeGraph.load(path)
+    return {graph.resources[d]: graph.transitive_symptoms(d) for d in graph.disease_ids}
+
+
+def _isolated(rows, candidates):
+    return len({rows[d] for d in candidates}) <= 1
+
+
+def simulate_home(pairs, rows, truth, first_symptom, lookahead=False):
+    tracker = EntropyTracker({d: s for d, s in pairs.items() if first_symptom in rows[d]})
+    consistent = list(tracker.candidates)
+    no_symptom_list = []
+    questions = 0
+
+    while questions < MAX_QUESTIONS:
+        distinct = tracker.count_distinct_diseases()
+        if lookahead:
+            symptom = select_question(tracker.candidate_pairs(), tracker.excluded, rule=EXCLUDE)
+        else:
+            symptom = tracker.next_question()
+        if symptom is None or not (distinct > 1 and (distinct > 5 or len(no_symptom_list) < 5)):
+            break
+        questions += 1
+        has = symptom in rows[truth]
+        if has:
+            tracker.confirm(symptom)
+        else:
+            tracker.exclude(symptom)
+            no_symptom_list.append(symptom)
+        consistent = [d for d in consistent if (symptom in rows[d]) == has]
+
+    return questions, _isolated(rows, consistent)
+
+
+def simulate_eig(pairs, rows, truth, first_symptom, depth):
+    candidates = {d: s for d, s in pairs.items() if first_symptom in rows[d]}
+    asked = {first_symptom}
+    questions = 0
+
+    while questions < MAX_QUESTIONS and not _isolated(rows, candidates):
+        symptom = select_question(candidates, asked, depth=depth, rule=NARROW)
+        if symptom is None:
+            break
+        questions += 1
+        asked.add(symptom)
+        has = symptom in rows[truth]
+        candidates = {d: s for d, s in candidates.items() if (symptom in rows[d]) == has}
+
+    return questions, _isolated(rows, candidates)
+
+
+def run(pairs, limit, seed):
+    rows = {d: frozenset(s) for d, s in pairs.items()}
+    rng = random.Random(seed)
+    truths = [d for d in pairs if pairs[d]]
+    if limit and limit < len(truths):
+        truths = rng.sample(truths, limit)
+    starts = {d: rng.choice(sorted(rows[d])) for d in truths}
+
+    strategies = {
+        "home": lambda d: simulate_home(pairs, rows, d, starts[d]),
+        "home-eig": lambda d: simulate_home(pairs, rows, d, starts[d], lookahead=True),
+        "eig": lambda d: simulate_eig(pairs, rows, d, starts[d], depth=1),
+        "eig-lookahead": lambda d: simulate_eig(pairs, rows, d, starts[d], depth=2),
+    }
+
+    print(f"Diseases: {len(pairs)}, simulated patients: {len(truths)}")
+    print(f"{'strategy':<15}{'avg questions':>15}{'isolated':>10}{'avg q. to isolation':>22}{'time (s)':>10}")
+    for name, simulate in strategies.items():
+        start = time.perf_counter()
+        results = [simulate(d) for d in truths]
+        elapsed = time.perf_counter() - start
+
+        isolated = [q for q, ok in results if ok]
+        avg_questions = sum(q for q, _ in results) / len(results)
+        avg_isolated = sum(isolated) / len(isolated) if isolated else float("nan")
+        print(f"{name:<15}{avg_questions:>15.2f}{len(isolated) / len(results):>10.1%}"
+              f"{avg_isolated:>22.2f}{elapsed:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--snapshot", default=config.SNAPSHOT_PATH, help="Snapshot of the disease graph")
+    parser.add_argument("--synthetic", type=int, help="Use a synthetic graph with N diseases instead")
+    parser.add_argument("--limit", type=int, default=500, help="Number of simulated patients (0 = all)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        disease_symptom_pairs = generate_disease_symptom_pairs(args.synthetic, seed=args.seed)
+    else:
+        disease_symptom_pairs = load_snapshot_pairs(args.snapshot)
+
+    run(disease_symptom_pairs, args.limit, args.seed)
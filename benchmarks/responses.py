@@ -0,0 +1,115 @@
+"""
+Synthetic responses of DBpedia, Wikipedia and MedlinePlus used by the benchmarks.
+
+The files in benchmarks/fixtures are hand-written samples in the exact format of the
+services (SPARQL JSON results, the section tree of wikipediaapi, the MedlinePlus article
+HTML), so the parsing paths can be benchmarked without network access. Their content is
+not taken from the services. To replace them with live responses:
+
+    python -m benchmarks.responses --record
+"""
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+SPARQL_FIXTURES = {
+    "sparql_all_symptoms.json": """
+        SELECT DISTINCT ?symptom ?label
+        WHERE {
+            ?disease dbo:symptom ?symptom.
+            ?symptom rdfs:label ?label.
+            filter langMatches(lang(?label), "en")
+        }
+        LIMIT 200
+    """,
+    "sparql_disease_symptom_pairs.json": """
+        SELECT DISTINCT ?disease ?label ?symptom
+        WHERE {
+            ?disease dbo:symptom+ ?symptom.
+            ?disease rdfs:label ?label.
+            FILTER langMatches(lang(?label), "en")
+        }
+        LIMIT 200
+    """,
+}
+WIKIPEDIA_FIXTURE = "wikipedia_influenza_section.json"
+MEDLINE_FIXTURE = "medlineplus_000141.html"
+
+
+def _path(name):
+    return os.path.join(FIXTURE_DIR, name)
+
+
+def load_sparql(name):
+    """
+    Returns the bindings of a SPARQL response fixture.
+    """
+    with open(_path(name), encoding="utf-8") as f:
+        return json.load(f)["results"]["bindings"]
+
+
+def _to_section(data):
+    return SimpleNamespace(title=data["title"], text=data["text"],
+                           sections=[_to_section(x) for x in data["sections"]])
+
+
+def _from_section(section):
+    return {"title": section.title, "text": section.text,
+            "sections": [_from_section(x) for x in section.sections]}
+
+
+def load_wikipedia_section():
+    """
+    Returns the section fixture as an object with the attributes of a wikipediaapi section.
+    """
+    with open(_path(WIKIPEDIA_FIXTURE), encoding="utf-8") as f:
+        return _to_section(json.load(f)["section"])
+
+
+def load_medline_article():
+    with open(_path(MEDLINE_FIXTURE), "rb") as f:
+        return f.read()
+
+
+def record():
+    """
+    Replaces the fixtures with fresh responses of the live services.
+    """
+    import requests
+
+    from backend import config
+    from backend.wikipedia_handler import wiki_wiki
+
+    for name, query in SPARQL_FIXTURES.items():
+        response = requests.post(config.DBPEDIA_ENDPOINT, data={"query": query},
+                                 headers={"Accept": "application/sparql-results+json"},
+                                 timeout=config.SPARQL_TIMEOUT)
+        response.raise_for_status()
+        with open(_path(name), "w", encoding="utf-8") as f:
+            json.dump(response.json(), f, indent=1)
+        print(f"Recorded {name}")
+
+    with open(_path(WIKIPEDIA_FIXTURE), encoding="utf-8") as f:
+        title = json.load(f)["title"]
+    page = wiki_wiki.page(title)
+    section = page.section_by_title("Signs and symptoms")
+    with open(_path(WIKIPEDIA_FIXTURE), "w", encoding="utf-8") as f:
+        json.dump({"page_id": page.pageid, "title": page.title, "section": _from_section(section)}, f, indent=1)
+    print(f"Recorded {WIKIPEDIA_FIXTURE}")
+
+    medline_id = MEDLINE_FIXTURE.split("_")[1].split(".")[0]
+    response = requests.get(f"https://medlineplus.gov/ency/article/{medline_id}.htm", timeout=config.MEDLINE_TIMEOUT)
+    response.raise_for_status()
+    with open(_path(MEDLINE_FIXTURE), "wb") as f:
+        f.write(response.content)
+    print(f"Recorded {MEDLINE_FIXTURE}")
+
+
+if __name__ == "__main__":
+    if "--record" in sys.argv:
+        record()
+    else:
+        print(__doc__)
@@ -0,0 +1,67 @@
+import bisect
+import itertools
+import random
+
+
+def generate_disease_symptom_pairs(n_diseases, n_symptoms=None, mean_degree=6, skew=1.1, seed=0):
+    """
+    Generates a synthetic disease-symptom graph in the shape of `get_disease_symptom_pairs`.
+
+    Symptom popularity follows a Zipf distribution (a few symptoms like "Fever" occur in
+    many diseases, most occur in few) and the number of symptoms per disease is geometric
+    around `mean_degree`.
+
+    Args:
+    - n_diseases (int): Number of diseases.
+    - n_symptoms (int): Number of distinct symptoms, defaults to half the number of diseases.
+    - mean_degree (int): Average number of symptoms per disease.
+    - skew (float): Zipf exponent of the symptom popularity.
+    - seed (int): Random seed, the same arguments always give the same graph.
+
+    Returns:
+    - dict: Disease URI -> list of symptom URIs.
+    """
+    rng = random.Random(seed)
+    n_symptoms = n_symptoms or max(10, n_diseases // 2)
+    symptoms = [f"http://dbpedia.org/resource/Symptom_{i}" for i in range(n_symptoms)]
+    cumulative = list(itertools.accumulate(1 / (rank + 1) ** skew for rank in range(n_symptoms)))
+    total = cumulative[-1]
+
+    pairs = {}
+    for i in range(n_diseases):
+        degree = 1
+        while degree < n_symptoms and rng.random() > 1 / mean_degree:
+            degree += 1
+        chosen = set()
+        while len(chosen) < degree:
+            chosen.add(min(bisect.bisect_left(cumulative, rng.random() * total), n_symptoms - 1))
+        pairs[f"http://dbpedia.org/resource/Disease_{i}"] = [symptoms[x] for x in sorted(chosen)]
+    return pairs
+
+
+def uri_binding(value):
+    return {"type": "uri", "value": value}
+
+
+def label_binding(uri):
+    return {"type": "literal", "xml:lang": "en", "value": uri.rsplit("/", 1)[-1].replace("_", " ")}
+
+
+def symptom_label_bindings(disease_symptom_pairs):
+    """
+    SPARQL result bindings (?symptom ?label) for all symptoms of a synthetic graph, in the
+    shape of the "all symptoms" and "possible symptoms" queries.
+    """
+    symptoms = sorted({s for symptoms in disease_symptom_pairs.values() for s in symptoms})
+    return [{"symptom": uri_binding(s), "label": label_binding(s)} for s in symptoms]
+
+
+def disease_symptom_bindings(disease_symptom_pairs):
+    """
+    SPARQL result bindings (?disease ?label ?symptom) of a synthetic graph, in the shape of
+    the query of `get_disease_symptom_pairs`.
+    """
+    return [
+        {"disease": uri_binding(d), "label": label_binding(d), "symptom": uri_binding(s)}
+        for d, symptoms in disease_symptom_pairs.items() for s in symptoms
+    ]